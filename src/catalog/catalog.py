@@ -7,17 +7,26 @@ import threading
 import catalog.catalog_pb2 as catalog_pb2
 import catalog.catalog_pb2_grpc as catalog_pb2_grpc
 import grpc
-from readerwriterlock import rwlock
 import time
 import os
-import requests
+from catalog.stripes import StripedLocks
+from catalog.invalidation import InvalidationDispatcher
+from catalog.watch import WatchHub
 
 class CatalogServicer(catalog_pb2_grpc.CatalogServiceServicer):
-    def __init__(self):
-        #use fair lock so don't starve readers and writers, don't priortize anyone 
-        self.lock  = rwlock.RWLockFair()
-        self.read_lock = self.lock.gen_rlock()
-        self.write_lock = self.lock.gen_wlock()
+    def __init__(self, invalidator, watch_hub, lock_stripes=64):
+        #one lock per stripe of symbols instead of one lock for the whole catalog, a trade only blocks its own symbol's stripe
+        self.locks = StripedLocks(lock_stripes)
+        #queues frontend cache invalidations, sent in the background
+        self.invalidator = invalidator
+        #open WatchCatalog streams, every trade is pushed to them
+        self.watch_hub = watch_hub
+
+    #copy of the whole catalog taken with every stripe held, consistent across symbols
+    #callers do their slow work (e.g. writing the csv) on the copy without holding any lock
+    def snapshot(self):
+        with self.locks.all():
+            return {name: dict(data) for name, data in catalog.items()}
     
     # Returns the stock price and trading volume for a given stock
     def Lookup(self, request, context):
@@ -25,16 +34,62 @@ class CatalogServicer(catalog_pb2_grpc.CatalogServiceServicer):
         print("Lookup Request Received")
         print(request)
 
-        #prevent writes but reads can happen
-        with self.read_lock:
+        #prevent writes to this symbol while it is read
+        with self.locks.symbol(request.stock_name):
             if request.stock_name not in catalog:
                 lookup_res = catalog_pb2.LookupResponse(code = 404, message = "stock not found")
             else:
-                lookup_res = catalog_pb2.LookupResponse(code = 200, name = request.stock_name, price = catalog[request.stock_name]["price"], quantity = catalog[request.stock_name]["quantity"])
+                lookup_res = catalog_pb2.LookupResponse(code = 200, name = request.stock_name, price = catalog[request.stock_name]["price"], quantity = catalog[request.stock_name]["quantity"], version = catalog[request.stock_name]["version"])
 
         print(lookup_res)
         return lookup_res
     
+    # Returns price, quantity and version of every requested stock, read together
+    def BatchLookup(self, request, context):
+        print(f"[{threading.current_thread().name}] is running")
+        print(f"Batch Lookup Request Received for {len(request.stock_names)} stocks")
+
+        stocks = []
+        #one acquisition of the batch's stripes, no trade on these symbols runs in between so they are read at one point in time
+        with self.locks.symbols(request.stock_names):
+            for name in request.stock_names:
+                if name not in catalog:
+                    stocks.append(catalog_pb2.LookupResponse(code = 404, name = name, message = "stock not found"))
+                else:
+                    stocks.append(catalog_pb2.LookupResponse(code = 200, name = name, price = catalog[name]["price"], quantity = catalog[name]["quantity"], version = catalog[name]["version"]))
+
+        return catalog_pb2.BatchLookupResponse(stocks = stocks)
+
+    # Applies several trades in request order, each one succeeds or fails on its own like Trade
+    def TradeBatch(self, request, context):
+        print(f"[{threading.current_thread().name}] is running")
+        print(f"Trade Batch Request Received for {len(request.trades)} trades")
+
+        results = []
+        #newest version of every traded stock, invalidated once per stock after the batch
+        versions = {}
+        #one acquisition of the stripes of every traded symbol for the whole batch
+        with self.locks.symbols(trade.name for trade in request.trades):
+            for trade in request.trades:
+                stock = catalog.get(trade.name)
+                if stock is None or (trade.type == "buy" and trade.number_of_items > stock["quantity"]):
+                    results.append(catalog_pb2.TradeResponse(code = 404))
+                    continue
+                if trade.type == "buy":
+                    stock["quantity"]-=trade.number_of_items
+                else:
+                    stock["quantity"]+=trade.number_of_items
+                stock["volume"]+=trade.number_of_items
+                stock["version"]+=1
+                versions[trade.name] = stock["version"]
+                self.watch_hub.publish((trade.name, stock["price"], stock["quantity"], stock["volume"], stock["version"]))
+                results.append(catalog_pb2.TradeResponse(code = 200))
+
+        for name, version in versions.items():
+            self.invalidator.invalidate(name, version)
+
+        return catalog_pb2.TradeBatchResponse(results = results)
+
     # Updates the inmemory catalog dictionary fields : quantity and volume
     def Trade(self, request, context):
     
@@ -48,7 +103,7 @@ class CatalogServicer(catalog_pb2_grpc.CatalogServiceServicer):
         no_of_items= request.number_of_items
 
 
-        with self.write_lock:
+        with self.locks.symbol(tradeName):
             if tradeType == "buy":
                 #buy request suceeds only when the requested quantity of stock is less than the quantity of stock in catalog
                 if no_of_items <= catalog[tradeName]["quantity"]:
@@ -61,35 +116,66 @@ class CatalogServicer(catalog_pb2_grpc.CatalogServiceServicer):
                 #in case of sell increment both quantity and volume
                 catalog[tradeName]["quantity"]+=no_of_items
                 catalog[tradeName]["volume"]+=no_of_items
+            catalog[tradeName]["version"]+=1
+            stock = catalog[tradeName]
+            version = stock["version"]
+            self.watch_hub.publish((tradeName, stock["price"], stock["quantity"], stock["volume"], version))
         
-        try:
-            response = requests.delete(url_delete + tradeName).json()
-            print(response)
-        except requests.RequestException as e:
-            print(f"Cache invalidation failed due to {e}")
+        #frontends drop cached entries older than this version shortly after, the trade does not wait for them
+        self.invalidator.invalidate(tradeName, version)
         
         return catalog_pb2.TradeResponse(code = 200) 
 
+    #stream of versioned stock changes: a snapshot of every stock first, then each change as it happens
+    #a subscriber that reconnects gets a new snapshot, so nothing missed while it was away stays stale
+    def WatchCatalog(self, request, context):
+        watcher = self.watch_hub.subscribe(request.subscriber)
+        if watcher is None:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "too many catalog watchers")
+        print(f"{request.subscriber} is watching the catalog")
+        try:
+            #subscribed before the snapshot is taken, changes made meanwhile arrive again afterwards with their versions
+            snapshot = self.snapshot()
+            yield catalog_pb2.CatalogUpdates(snapshot=True, updates=[
+                catalog_pb2.StockUpdate(name=name, price=data["price"], quantity=data["quantity"], volume=data["volume"], version=data["version"])
+                for name, data in snapshot.items()
+            ])
+            while context.is_active():
+                updates = watcher.take(timeout=1)
+                if watcher.overflowed:
+                    context.abort(grpc.StatusCode.ABORTED, "watcher fell behind, resubscribe for a new snapshot")
+                if updates:
+                    yield catalog_pb2.CatalogUpdates(updates=[
+                        catalog_pb2.StockUpdate(name=name, price=price, quantity=quantity, volume=volume, version=version)
+                        for name, price, quantity, volume, version in updates
+                    ])
+        finally:
+            self.watch_hub.unsubscribe(watcher)
+            print(f"{request.subscriber} stopped watching the catalog")
+
 
 # BEGIN AI CODE: ChatGPT 4o. Prompt: Write a Python daemon thread that periodically writes a shared catalog dictionary to a CSV file every few seconds.
-def write_to_disk(lock):
+def write_to_disk(servicer):
     while True:
         #write to disk every 1 second using the background thread 
         time.sleep(1)
-        with lock.gen_rlock():
-            with open('catalog/catalog.csv', mode='w', newline='') as csvfile:
-                fieldnames = ['Name', 'Price', 'Quantity', 'Volume']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for name, data in catalog.items():
-                    writer.writerow({
-                        'Name': name,
-                        'Price': data['price'],
-                        'Quantity': data['quantity'],
-                        'Volume': data['volume']
-                    })
-
-            print(f"[{threading.current_thread().name}] catalog written to CSV.")
+        #trades continue while the snapshot is written
+        snapshot = servicer.snapshot()
+        #written next to the csv and renamed over it, so readers never see a half written file
+        with open('catalog/catalog.csv.tmp', mode='w', newline='') as csvfile:
+            fieldnames = ['Name', 'Price', 'Quantity', 'Volume']
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            for name, data in snapshot.items():
+                writer.writerow({
+                    'Name': name,
+                    'Price': data['price'],
+                    'Quantity': data['quantity'],
+                    'Volume': data['volume']
+                })
+        os.replace('catalog/catalog.csv.tmp', 'catalog/catalog.csv')
+
+        print(f"[{threading.current_thread().name}] catalog written to CSV.")
 
 # END AI CODE: ChatGPT 4o. Prompt: Write a Python daemon thread that periodically writes a shared catalog dictionary to a CSV file every few seconds
 
@@ -121,18 +207,39 @@ if __name__ == "__main__":
     PORT = int(os.getenv("CATALOG_PORT", 8092))
     FRONTEND_HOST = os.getenv("FRONTEND_HOST", "localhost")
     FRONTEND_PORT = int(os.getenv("FRONTEND_PORT", 8091))
-    url_delete = f"http://{FRONTEND_HOST}:{FRONTEND_PORT}/delete/"
+    #every frontend whose cache has to be invalidated, "host:port,host:port"
+    FRONTEND_TARGETS = os.getenv("FRONTEND_TARGETS", f"{FRONTEND_HOST}:{FRONTEND_PORT}").split(",")
+    #how long repeated invalidations are merged, names per request, request timeout and attempts before giving up
+    INVALIDATION_WINDOW = float(os.getenv("CATALOG_INVALIDATION_WINDOW_MS", 5)) / 1000
+    INVALIDATION_BATCH = int(os.getenv("CATALOG_INVALIDATION_BATCH", 256))
+    INVALIDATION_TIMEOUT = float(os.getenv("CATALOG_INVALIDATION_TIMEOUT", 1))
+    INVALIDATION_ATTEMPTS = int(os.getenv("CATALOG_INVALIDATION_ATTEMPTS", 5))
 
     #inmemory dictionary of stocks
     catalog = read_from_disk()
-
-    servicer = CatalogServicer()
-    write_to_disk_thread = threading.Thread(target=write_to_disk, args=(servicer.lock,), daemon=True)
+    #per stock version, bumped by every trade; starting from the startup time in microseconds keeps versions increasing across restarts
+    start_version = time.time_ns() // 1000
+    for data in catalog.values():
+        data["version"] = start_version
+
+    #number of lock stripes the symbols are spread over
+    LOCK_STRIPES = int(os.getenv("CATALOG_LOCK_STRIPES", 64))
+    invalidator = InvalidationDispatcher([f"http://{target}" for target in FRONTEND_TARGETS], INVALIDATION_WINDOW,
+                                         INVALIDATION_BATCH, INVALIDATION_TIMEOUT, INVALIDATION_ATTEMPTS)
+    #every WatchCatalog stream holds a server thread for as long as it is open
+    MAX_WATCHERS = int(os.getenv("CATALOG_MAX_WATCHERS", 4))
+    watch_hub = WatchHub(MAX_WATCHERS)
+    servicer = CatalogServicer(invalidator, watch_hub, LOCK_STRIPES)
+    write_to_disk_thread = threading.Thread(target=write_to_disk, args=(servicer,), daemon=True)
     
     # run a separate thread in background to log the current state of catalog to disk
     write_to_disk_thread.start()
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=3))
+    #accept the keepalive pings clients send on their long lived channels
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=3 + MAX_WATCHERS), options=[
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.min_recv_ping_interval_without_data_ms", 20000),
+    ])
     catalog_pb2_grpc.add_CatalogServiceServicer_to_server(servicer, server)
     server.add_insecure_port(f'[::]:{PORT}')
     server.start()
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rcatalog.proto\"#\n\rLookupRequest\x12\x12\n\nstock_name\x18\x01 \x01(\t\"^\n\x0eLookupResponse\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05price\x18\x02 \x01(\x02\x12\x10\n\x08quantity\x18\x03 \x01(\x05\x12\x0c\n\x04\x63ode\x18\x04 \x01(\x05\x12\x0f\n\x07message\x18\x05 \x01(\t\"C\n\x0cTradeRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x17\n\x0fnumber_of_items\x18\x02 \x01(\x05\x12\x0c\n\x04type\x18\x03 \x01(\t\"\x1d\n\rTradeResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x32\x63\n\x0e\x43\x61talogService\x12)\n\x06Lookup\x12\x0e.LookupRequest\x1a\x0f.LookupResponse\x12&\n\x05Trade\x12\r.TradeRequest\x1a\x0e.TradeResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rcatalog.proto\"#\n\rLookupRequest\x12\x12\n\nstock_name\x18\x01 \x01(\t\"o\n\x0eLookupResponse\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05price\x18\x02 \x01(\x02\x12\x10\n\x08quantity\x18\x03 \x01(\x05\x12\x0c\n\x04\x63ode\x18\x04 \x01(\x05\x12\x0f\n\x07message\x18\x05 \x01(\t\x12\x0f\n\x07version\x18\x06 \x01(\x03\"C\n\x0cTradeRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x17\n\x0fnumber_of_items\x18\x02 \x01(\x05\x12\x0c\n\x04type\x18\x03 \x01(\t\"\x1d\n\rTradeResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\"\"\n\x0cWatchRequest\x12\x12\n\nsubscriber\x18\x01 \x01(\t\"]\n\x0bStockUpdate\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05price\x18\x02 \x01(\x02\x12\x10\n\x08quantity\x18\x03 \x01(\x05\x12\x0e\n\x06volume\x18\x04 \x01(\x05\x12\x0f\n\x07version\x18\x05 \x01(\x03\"A\n\x0e\x43\x61talogUpdates\x12\x1d\n\x07updates\x18\x01 \x03(\x0b\x32\x0c.StockUpdate\x12\x10\n\x08snapshot\x18\x02 \x01(\x08\")\n\x12\x42\x61tchLookupRequest\x12\x13\n\x0bstock_names\x18\x01 \x03(\t\"6\n\x13\x42\x61tchLookupResponse\x12\x1f\n\x06stocks\x18\x01 \x03(\x0b\x32\x0f.LookupResponse\"2\n\x11TradeBatchRequest\x12\x1d\n\x06trades\x18\x01 \x03(\x0b\x32\r.TradeRequest\"5\n\x12TradeBatchResponse\x12\x1f\n\x07results\x18\x01 \x03(\x0b\x32\x0e.TradeResponse2\x86\x02\n\x0e\x43\x61talogService\x12)\n\x06Lookup\x12\x0e.LookupRequest\x1a\x0f.LookupResponse\x12&\n\x05Trade\x12\r.TradeRequest\x1a\x0e.TradeResponse\x12\x30\n\x0cWatchCatalog\x12\r.WatchRequest\x1a\x0f.CatalogUpdates0\x01\x12\x38\n\x0b\x42\x61tchLookup\x12\x13.BatchLookupRequest\x1a\x14.BatchLookupResponse\x12\x35\n\nTradeBatch\x12\x12.TradeBatchRequest\x1a\x13.TradeBatchResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,11 +34,25 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_LOOKUPREQUEST']._serialized_start=17
   _globals['_LOOKUPREQUEST']._serialized_end=52
   _globals['_LOOKUPRESPONSE']._serialized_start=54
-  _globals['_LOOKUPRESPONSE']._serialized_end=148
-  _globals['_TRADEREQUEST']._serialized_start=150
-  _globals['_TRADEREQUEST']._serialized_end=217
-  _globals['_TRADERESPONSE']._serialized_start=219
-  _globals['_TRADERESPONSE']._serialized_end=248
-  _globals['_CATALOGSERVICE']._serialized_start=250
-  _globals['_CATALOGSERVICE']._serialized_end=349
+  _globals['_LOOKUPRESPONSE']._serialized_end=165
+  _globals['_TRADEREQUEST']._serialized_start=167
+  _globals['_TRADEREQUEST']._serialized_end=234
+  _globals['_TRADERESPONSE']._serialized_start=236
+  _globals['_TRADERESPONSE']._serialized_end=265
+  _globals['_WATCHREQUEST']._serialized_start=267
+  _globals['_WATCHREQUEST']._serialized_end=301
+  _globals['_STOCKUPDATE']._serialized_start=303
+  _globals['_STOCKUPDATE']._serialized_end=396
+  _globals['_CATALOGUPDATES']._serialized_start=398
+  _globals['_CATALOGUPDATES']._serialized_end=463
+  _globals['_BATCHLOOKUPREQUEST']._serialized_start=465
+  _globals['_BATCHLOOKUPREQUEST']._serialized_end=506
+  _globals['_BATCHLOOKUPRESPONSE']._serialized_start=508
+  _globals['_BATCHLOOKUPRESPONSE']._serialized_end=562
+  _globals['_TRADEBATCHREQUEST']._serialized_start=564
+  _globals['_TRADEBATCHREQUEST']._serialized_end=614
+  _globals['_TRADEBATCHRESPONSE']._serialized_start=616
+  _globals['_TRADEBATCHRESPONSE']._serialized_end=669
+  _globals['_CATALOGSERVICE']._serialized_start=672
+  _globals['_CATALOGSERVICE']._serialized_end=934
 # @@protoc_insertion_point(module_scope)
@@ -44,6 +44,21 @@ class CatalogServiceStub(object):
                 request_serializer=catalog__pb2.TradeRequest.SerializeToString,
                 response_deserializer=catalog__pb2.TradeResponse.FromString,
                 _registered_method=True)
+        self.WatchCatalog = channel.unary_stream(
+                '/CatalogService/WatchCatalog',
+                request_serializer=catalog__pb2.WatchRequest.SerializeToString,
+                response_deserializer=catalog__pb2.CatalogUpdates.FromString,
+                _registered_method=True)
+        self.BatchLookup = channel.unary_unary(
+                '/CatalogService/BatchLookup',
+                request_serializer=catalog__pb2.BatchLookupRequest.SerializeToString,
+                response_deserializer=catalog__pb2.BatchLookupResponse.FromString,
+                _registered_method=True)
+        self.TradeBatch = channel.unary_unary(
+                '/CatalogService/TradeBatch',
+                request_serializer=catalog__pb2.TradeBatchRequest.SerializeToString,
+                response_deserializer=catalog__pb2.TradeBatchResponse.FromString,
+                _registered_method=True)
 
 
 class CatalogServiceServicer(object):
@@ -61,6 +76,24 @@ class CatalogServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchCatalog(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchLookup(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def TradeBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_CatalogServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -74,6 +107,21 @@ def add_CatalogServiceServicer_to_server(servicer, server):
                     request_deserializer=catalog__pb2.TradeRequest.FromString,
                     response_serializer=catalog__pb2.TradeResponse.SerializeToString,
             ),
+            'WatchCatalog': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchCatalog,
+                    request_deserializer=catalog__pb2.WatchRequest.FromString,
+                    response_serializer=catalog__pb2.CatalogUpdates.SerializeToString,
+            ),
+            'BatchLookup': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchLookup,
+                    request_deserializer=catalog__pb2.BatchLookupRequest.FromString,
+                    response_serializer=catalog__pb2.BatchLookupResponse.SerializeToString,
+            ),
+            'TradeBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.TradeBatch,
+                    request_deserializer=catalog__pb2.TradeBatchRequest.FromString,
+                    response_serializer=catalog__pb2.TradeBatchResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'CatalogService', rpc_method_handlers)
@@ -138,3 +186,84 @@ class CatalogService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def WatchCatalog(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/CatalogService/WatchCatalog',
+            catalog__pb2.WatchRequest.SerializeToString,
+            catalog__pb2.CatalogUpdates.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchLookup(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/CatalogService/BatchLookup',
+            catalog__pb2.BatchLookupRequest.SerializeToString,
+            catalog__pb2.BatchLookupResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def TradeBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/CatalogService/TradeBatch',
+            catalog__pb2.TradeBatchRequest.SerializeToString,
+            catalog__pb2.TradeBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
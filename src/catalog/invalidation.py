@@ -0,0 +1,93 @@
+import threading
+import time
+import requests
+
+
+#cache invalidations for one frontend, sent by a background thread so Trade never waits on HTTP
+#symbols invalidated again before they are sent are merged into their newest version, a batch goes out as one POST /invalidate
+class InvalidationTarget:
+    def __init__(self, base_url, dispatcher):
+        self.base_url = base_url
+        self.dispatcher = dispatcher
+        #{name: newest version invalidated}
+        self.pending = {}
+        self.cond = threading.Condition()
+        #POST /invalidate, turned off if the frontend does not implement it
+        self.batching = True
+        self.session = requests.Session()
+        self.sent = 0
+        self.failures = 0
+        self.thread = threading.Thread(target=self.run, name=f"invalidate-{base_url}", daemon=True)
+
+    def add(self, name, version):
+        with self.cond:
+            self.pending[name] = max(version, self.pending.get(name, version))
+            self.cond.notify()
+
+    #wait for the first name, then give the same trade burst coalesce_window to add more
+    def next_batch(self):
+        with self.cond:
+            while not self.pending:
+                self.cond.wait()
+        time.sleep(self.dispatcher.coalesce_window)
+        with self.cond:
+            names = sorted(self.pending)[:self.dispatcher.max_batch]
+            batch = {name: self.pending.pop(name) for name in names}
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            attempt = 0
+            while True:
+                try:
+                    self.send(batch)
+                    self.sent += len(batch)
+                    break
+                except requests.RequestException as e:
+                    attempt += 1
+                    self.failures += 1
+                    if attempt >= self.dispatcher.max_attempts:
+                        print(f"Cache invalidation of {list(batch)} at {self.base_url} failed {attempt} times, dropping: {e}")
+                        break
+                    backoff = min(self.dispatcher.max_backoff, self.dispatcher.backoff * 2 ** (attempt - 1))
+                    print(f"Cache invalidation at {self.base_url} failed due to {e}, retrying in {backoff:.2f}s")
+                    time.sleep(backoff)
+
+    def send(self, batch):
+        timeout = self.dispatcher.timeout
+        if self.batching:
+            response = self.session.post(f"{self.base_url}/invalidate", json={"names": list(batch), "versions": batch}, timeout=timeout)
+            if response.status_code != 404:
+                response.raise_for_status()
+                print(f"Invalidated {list(batch)} at {self.base_url}")
+                return
+            #older frontend, fall back to one DELETE per symbol
+            print(f"{self.base_url} does not support batch invalidation, sending one request per symbol")
+            self.batching = False
+        for name, version in batch.items():
+            self.session.delete(f"{self.base_url}/delete/{name}", params={"version": version}, timeout=timeout).raise_for_status()
+        print(f"Invalidated {list(batch)} at {self.base_url}")
+
+
+#fans invalidations out to every frontend, each one with its own queue so a slow frontend only delays itself
+class InvalidationDispatcher:
+    def __init__(self, base_urls, coalesce_window=0.005, max_batch=256, timeout=1.0, max_attempts=5, backoff=0.05, max_backoff=2.0):
+        self.coalesce_window = coalesce_window
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.targets = [InvalidationTarget(base_url, self) for base_url in base_urls]
+        for target in self.targets:
+            target.thread.start()
+
+    #never blocks on the network
+    def invalidate(self, name, version):
+        for target in self.targets:
+            target.add(name, version)
+
+    #{base url: (names waiting, names sent, failed attempts)}
+    def stats(self):
+        return {target.base_url: (len(target.pending), target.sent, target.failures) for target in self.targets}
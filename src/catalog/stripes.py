@@ -0,0 +1,33 @@
+import threading
+import zlib
+from contextlib import ExitStack, contextmanager
+
+
+#fixed set of locks, every symbol maps to one of them so trades and lookups on unrelated symbols do not contend
+#operations over several symbols take their stripes in index order, so they cannot deadlock with each other
+class StripedLocks:
+    def __init__(self, stripes=64):
+        self.stripes = [threading.Lock() for _ in range(max(1, stripes))]
+
+    def index(self, name):
+        #crc32 rather than hash() so a symbol maps to the same stripe in every process
+        return zlib.crc32(name.encode("utf-8")) % len(self.stripes)
+
+    def symbol(self, name):
+        return self.stripes[self.index(name)]
+
+    #holds the stripes of all the given symbols
+    @contextmanager
+    def symbols(self, names):
+        with ExitStack() as stack:
+            for index in sorted({self.index(name) for name in names}):
+                stack.enter_context(self.stripes[index])
+            yield
+
+    #holds every stripe, for a consistent view of the whole catalog
+    @contextmanager
+    def all(self):
+        with ExitStack() as stack:
+            for lock in self.stripes:
+                stack.enter_context(lock)
+            yield
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+
+#changes waiting to be streamed to one WatchCatalog subscriber
+#only the newest change per symbol is kept, a subscriber that falls too far behind is cut off and resyncs from a snapshot
+class Watcher:
+    def __init__(self, subscriber, max_pending):
+        self.subscriber = subscriber
+        self.max_pending = max_pending
+        #{name: (name, price, quantity, volume, version)}
+        self.pending = OrderedDict()
+        self.cond = threading.Condition()
+        self.overflowed = False
+
+    def put(self, update):
+        with self.cond:
+            self.pending.pop(update[0], None)
+            self.pending[update[0]] = update
+            if len(self.pending) > self.max_pending:
+                self.overflowed = True
+            self.cond.notify()
+
+    #everything pending, waiting up to timeout for the first change
+    def take(self, timeout):
+        with self.cond:
+            if not self.pending:
+                self.cond.wait(timeout)
+            updates = list(self.pending.values())
+            self.pending.clear()
+            return updates
+
+
+#fan-out of catalog changes to every open WatchCatalog stream
+class WatchHub:
+    def __init__(self, max_watchers=4, max_pending=10000):
+        self.max_watchers = max_watchers
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.watchers = []
+
+    #None when max_watchers streams are already open, each stream holds a server thread
+    def subscribe(self, subscriber):
+        with self.lock:
+            if len(self.watchers) >= self.max_watchers:
+                return None
+            watcher = Watcher(subscriber, self.max_pending)
+            self.watchers.append(watcher)
+            return watcher
+
+    def unsubscribe(self, watcher):
+        with self.lock:
+            if watcher in self.watchers:
+                self.watchers.remove(watcher)
+
+    #called with the symbol's stripe held, so the changes of one symbol reach every watcher in version order
+    def publish(self, update):
+        with self.lock:
+            watchers = list(self.watchers)
+        for watcher in watchers:
+            watcher.put(update)
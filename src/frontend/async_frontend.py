@@ -0,0 +1,379 @@
+import asyncio
+import json
+import os
+import sys
+from urllib.parse import urlsplit, parse_qs
+import grpc
+import catalog.catalog_pb2 as catalog_pb2
+import order.order_pb2 as order_pb2
+from google.protobuf.empty_pb2 import Empty
+from frontend.channels import AioChannelManager, ChannelManager
+from frontend.watch import CatalogWatcher
+from frontend.singleflight import AsyncSingleFlight
+from frontend.replies import cached_stock_reply, date_header
+
+
+#the frontend REST API on an asyncio event loop: one coroutine per keep-alive connection instead of one thread,
+#grpc.aio stubs to the catalog and order replicas, and the same stock cache as the threaded server
+
+
+SERVER = f"AsyncFrontend Python/{sys.version.split()[0]}"
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Request Entity Too Large", 500: "Internal Server Error"}
+#largest request body read (order and invalidation bodies are a few hundred bytes)
+MAX_BODY = 1 << 20
+#most symbols one GET /stocks?names= may ask for, and most orders one POST /orders/batch may place
+MAX_BATCH_NAMES = 256
+MAX_BATCH_ORDERS = 256
+
+
+def reply(code, response):
+    body = json.dumps(response).encode('utf-8')
+    head = f"HTTP/1.1 {code} {REASONS.get(code, '')}\r\nServer: {SERVER}\r\n".encode("latin-1")
+    tail = f"Content-type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1")
+    return head + date_header() + tail + body
+
+
+def invalid_path():
+    return 404, {"error": {"code": 404, "message": "Invalid path sent"}}
+
+
+class AsyncFrontend:
+    def __init__(self, cache, channels, lookups, shared_leader=None, broadcast=None):
+        self.cache = cache
+        self.channels = channels
+        self.lookups = lookups
+        #one leader election at a time, requests that failed on the same leader wait for it
+        self.election_lock = asyncio.Lock()
+        #pre-forked workers also hold the lock shared by all workers and pass invalidations on to each other
+        self.shared_leader = shared_leader
+        self.broadcast = broadcast
+        self.connections = 0
+
+    #serves one client connection for as long as it is kept alive
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    writer.write(reply(400, {"error": {"code": 400, "message": "Request header too large"}}))
+                    await writer.drain()
+                    return
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split()
+                except ValueError:
+                    writer.write(reply(400, {"error": {"code": 400, "message": "Bad request line"}}))
+                    await writer.drain()
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0) or 0)
+                if length > MAX_BODY:
+                    writer.write(reply(413, {"error": {"code": 413, "message": "Request body too large"}}))
+                    await writer.drain()
+                    return
+                try:
+                    body = await reader.readexactly(length) if length else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+
+                writer.write(await self.dispatch(method, path, body))
+                await writer.drain()
+
+                #HTTP/1.1 keeps the connection open unless the client asks to close it, HTTP/1.0 only if it asks to keep it
+                connection = headers.get("connection", "").lower()
+                if connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive"):
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    #full reply bytes for one request, a handler that fails is answered with 500 and the connection stays open
+    async def dispatch(self, method, path, body):
+        try:
+            return await self.route(method, path, body)
+        except Exception as e:
+            print(f"(Frontend): {method} {path} failed: {e!r}")
+            return reply(500, {"error": {"code": 500, "message": "Internal server error"}})
+
+    async def route(self, method, path, body):
+        if method == "GET":
+            if path.startswith("/stocks/"):
+                return await self.get_stock(path.split("/")[-1])
+            if path.startswith("/stocks?"):
+                return reply(*await self.get_stocks(urlsplit(path).query))
+            if path == "/cache/stats":
+                return reply(200, {"data": {"shards": self.cache.stats(), "lookups": self.lookups.stats(), "connections": self.connections, "pid": os.getpid()}})
+            if path.startswith("/orders/"):
+                try:
+                    transaction_num = int(path.split("/")[-1])
+                except ValueError:
+                    return reply(*invalid_path())
+                return reply(*await self.get_order(transaction_num))
+            return reply(*invalid_path())
+        if method == "POST":
+            if path == "/invalidate":
+                return reply(*self.invalidate(body))
+            if path == "/orders/batch":
+                return reply(*await self.post_order_batch(body))
+            if path.startswith("/orders/"):
+                return reply(*await self.post_order(body))
+            return reply(*invalid_path())
+        if method == "DELETE":
+            return reply(*self.delete(path))
+        return reply(404, {"error": {"code": 404, "message": "Invalid path sent"}})
+
+    async def get_stock(self, stockName):
+        cached = self.cache.get(stockName)
+        if cached is not None:
+            print(f"Fetched {stockName} from cache")
+            return cached_stock_reply(stockName, cached, SERVER)
+
+        print(f"Could not find {stockName} in cache calling catalog microservice\n")
+        lookup_req = catalog_pb2.LookupRequest(stock_name = stockName)
+        #only the first of the concurrent misses calls the catalog, a failure is raised in every waiting request
+        lookup_reply, shared = await self.lookups.do(stockName, lambda: self.lookup_catalog(lookup_req))
+        if shared:
+            print(f"Shared an in-flight catalog lookup of {stockName}")
+
+        if lookup_reply.code == 404:
+            return reply(404, {"error": {"code": lookup_reply.code, "message": lookup_reply.message}})
+
+        if not shared and not self.cache.put(lookup_reply.name, {"price": lookup_reply.price, "quantity": lookup_reply.quantity}, lookup_reply.version):
+            print(f"Not caching {lookup_reply.name} version {lookup_reply.version}, a newer version is already known")
+        return reply(200, {"data": {"name": lookup_reply.name, "price": lookup_reply.price, "quantity": lookup_reply.quantity}})
+
+    #several stocks in one request, hits come from the cache and all misses go to the catalog in one BatchLookup
+    async def get_stocks(self, query):
+        names = list(dict.fromkeys(name for value in parse_qs(query).get("names", []) for name in value.split(",") if name))
+        if not names or len(names) > MAX_BATCH_NAMES:
+            return 400, {"error": {"code": 400, "message": f"names must list 1 to {MAX_BATCH_NAMES} stocks"}}
+
+        found = {}
+        misses = []
+        for name in names:
+            cached = self.cache.get(name)
+            if cached is not None:
+                found[name] = {"name": name, "price": cached["price"], "quantity": cached["quantity"]}
+            else:
+                misses.append(name)
+        print(f"Fetched {len(found)} of {len(names)} stocks from cache")
+
+        if misses:
+            print(f"Could not find {misses} in cache calling catalog microservice\n")
+            for lookup_reply in await self.lookup_catalog_batch(misses):
+                if lookup_reply.code == 404:
+                    continue
+                found[lookup_reply.name] = {"name": lookup_reply.name, "price": lookup_reply.price, "quantity": lookup_reply.quantity}
+                if not self.cache.put(lookup_reply.name, {"price": lookup_reply.price, "quantity": lookup_reply.quantity}, lookup_reply.version):
+                    print(f"Not caching {lookup_reply.name} version {lookup_reply.version}, a newer version is already known")
+
+        return 200, {"data": {"stocks": [found[name] for name in names if name in found], "not_found": [name for name in names if name not in found]}}
+
+    async def get_order(self, transaction_num):
+        details_req = order_pb2.GetOrderDetailsRequest(transaction_num = transaction_num)
+        details_reply = await self.call_order_leader("GetOrderDetails", details_req)
+        if details_reply is None:
+            return 404, {"error": {"code": 404, "message": "Order service temporarily unavailable"}}
+        if details_reply.code == 404:
+            return 404, {"error": {"code": details_reply.code, "message": details_reply.message}}
+        return 200, {"data": {"order_num": details_reply.transaction_num, "name": details_reply.name, "type": details_reply.type, "quantity": details_reply.volume_traded}}
+
+    async def post_order(self, body):
+        try:
+            message = json.loads(body.decode('utf-8'))
+            order_req = order_pb2.OrderRequest(name = message["name"], number_of_items = message["quantity"], type = message["type"])
+        except (ValueError, KeyError, TypeError):
+            return invalid_path()
+
+        order_reply = await self.call_order_leader("Order", order_req)
+        if order_reply is None:
+            return 404, {"error": {"code": 404, "message": "Order service temporarily unavailable"}}
+        if order_reply.code != 200:
+            return order_reply.code, {"error": {"code": order_reply.code, "message": order_reply.message}}
+        return 200, {"data": {"transaction_number": order_reply.transaction_num}}
+
+    #several orders in one request, sent to the order leader in one OrderBatch, one result per order in request order
+    async def post_order_batch(self, body):
+        try:
+            orders = json.loads(body.decode('utf-8'))["orders"]
+            if not orders or len(orders) > MAX_BATCH_ORDERS:
+                raise ValueError(f"orders must list 1 to {MAX_BATCH_ORDERS} orders")
+            batch_req = order_pb2.OrderBatchRequest(orders = [
+                order_pb2.OrderRequest(name = order["name"], number_of_items = order["quantity"], type = order["type"]) for order in orders
+            ])
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": {"code": 400, "message": "Invalid order batch"}}
+
+        batch_reply = await self.call_order_leader("OrderBatch", batch_req)
+        if batch_reply is None:
+            return 404, {"error": {"code": 404, "message": "Order service temporarily unavailable"}}
+        return 200, {"data": {"results": [
+            {"transaction_number": result.transaction_num} if result.code == 200 else {"error": {"code": result.code, "message": result.message}}
+            for result in batch_reply.results
+        ]}}
+
+    #batch of cache invalidations from the catalog, body {"names": [...], "versions": {...}}
+    def invalidate(self, body):
+        try:
+            message = json.loads(body.decode('utf-8'))
+            names = message["names"]
+            versions = message.get("versions", {})
+            print(f"Deleting {names} from cache \n")
+            for stock_name in names:
+                self.cache.invalidate(stock_name, versions.get(stock_name))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return 400, {"code": 400, "message": "Invalid invalidation request"}
+        if self.broadcast is not None:
+            self.broadcast.send(names, versions)
+        return 200, {"code": 200, "message": "Cache invalidated"}
+
+    def delete(self, path):
+        url = urlsplit(path)
+        if not url.path.startswith("/delete/"):
+            return 404, {"code": 404, "message": "Invalid path"}
+        stock_name = url.path.split("/")[-1]
+        version = parse_qs(url.query).get("version")
+        try:
+            version = int(version[0]) if version else None
+        except ValueError:
+            return 400, {"code": 400, "message": "Invalid version"}
+        print(f"Deleting {stock_name} from cache \n")
+        self.cache.invalidate(stock_name, version)
+        if self.broadcast is not None:
+            self.broadcast.send([stock_name], {stock_name: version})
+        return 200, {"code": 200, "message": "Cache invalidated"}
+
+    #lookup over the pooled catalog channel, redialing once if the connection was lost
+    async def lookup_catalog(self, lookup_req):
+        try:
+            return await self.channels.catalog_stub().Lookup(lookup_req)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.UNAVAILABLE:
+                raise
+            print(f"(Frontend): Catalog connection lost, reconnecting: {e.code()}")
+            self.channels.reset_catalog()
+            return await self.channels.catalog_stub().Lookup(lookup_req)
+
+    #lookup of several stocks in one BatchLookup, a catalog without it is asked one Lookup per name
+    async def lookup_catalog_batch(self, names):
+        batch_req = catalog_pb2.BatchLookupRequest(stock_names = names)
+        try:
+            return (await self.channels.catalog_stub().BatchLookup(batch_req)).stocks
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                return [await self.lookup_catalog(catalog_pb2.LookupRequest(stock_name = name)) for name in names]
+            if e.code() != grpc.StatusCode.UNAVAILABLE:
+                raise
+            print(f"(Frontend): Catalog connection lost, reconnecting: {e.code()}")
+            self.channels.reset_catalog()
+            return (await self.channels.catalog_stub().BatchLookup(batch_req)).stocks
+
+    #ping the order replicas from the highest id down, the first healthy one becomes leader and the others are told
+    async def find_leader(self):
+        async def check_health(s_id):
+            try:
+                order_reply = await self.channels.order_stub(s_id).Heartbeat(Empty(), timeout=2)
+                return order_reply.code == 200
+            except grpc.RpcError as e:
+                print(f"(Frontend): Replica {s_id} unreachable: {e.code()}")
+                return False
+
+        for s_id in sorted(self.channels.orders, reverse=True):
+            if await check_health(s_id):
+                for other in self.channels.orders:
+                    if other == s_id:
+                        continue
+                    try:
+                        notify_req = order_pb2.NotifyReplicaRequest(leader_id=s_id)
+                        await self.channels.order_stub(other).NotifyReplica(notify_req, timeout=2)
+                        print(f"(Frontend): Notified replica {other} about leader {s_id}")
+                    except grpc.RpcError as e:
+                        print(f"(Frontend): Failed to notify replica {other}: {e.code()}")
+                self.channels.set_leader(s_id)
+                return s_id
+        return None
+
+    #the workers' election lock is a blocking multiprocessing lock, waiting for it must not stall the event loop
+    async def acquire_shared_lock(self):
+        if self.shared_leader is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.shared_leader.lock.acquire)
+
+    def release_shared_lock(self):
+        if self.shared_leader is not None:
+            self.shared_leader.lock.release()
+
+    #send a request to the order leader, if it does not respond re-elect a leader and retry once
+    #returns None when the new leader also fails
+    async def call_order_leader(self, method, request):
+        lid, stub = self.channels.leader()
+        try:
+            return await getattr(stub, method)(request)
+        except grpc.RpcError:
+            print(f"(Frontend): Order Leader {lid} not responding, re-electing leader")
+
+        async with self.election_lock:
+            await self.acquire_shared_lock()
+            try:
+                #another request or worker may already have replaced this leader
+                if self.channels.current_leader() == lid:
+                    self.channels.reset_order(lid)
+                    if await self.find_leader() is None:
+                        print("No Order Replicas are responding, shutting down the system")
+                        sys.exit(1)
+            finally:
+                self.release_shared_lock()
+
+        lid, stub = self.channels.leader()
+        try:
+            return await getattr(stub, method)(request)
+        except grpc.RpcError as e2:
+            print(f"(Frontend): New leader {lid} also failed due to {e2.code()}")
+            return None
+
+
+async def run(port, catalog_target, order_targets, channels_per_backend, cache, lookup_wait_timeout, watch, backlog, shared_leader, broadcast):
+    channels = AioChannelManager(catalog_target, order_targets, channels_per_backend, shared_leader)
+    frontend = AsyncFrontend(cache, channels, AsyncSingleFlight(lookup_wait_timeout), shared_leader, broadcast)
+
+    #the change stream runs on its own thread with a blocking channel, the cache is safe to update from it
+    if watch:
+        def apply_catalog_updates(updates, snapshot):
+            applied = sum(1 for update in updates if cache.apply(update.name, {"price": update.price, "quantity": update.quantity}, update.version))
+            if applied:
+                print(f"(Frontend): Updated {applied} cached stocks from the catalog")
+        CatalogWatcher(ChannelManager(catalog_target, {}, 1), apply_catalog_updates, f"frontend:{port}").start()
+
+    #the first worker elects the leader, the others adopt it
+    await frontend.acquire_shared_lock()
+    try:
+        leader_id = channels.current_leader()
+        if leader_id is None:
+            leader_id = await frontend.find_leader()
+    finally:
+        frontend.release_shared_lock()
+    if leader_id is None:
+        print("No Order Replicas are responding, shutting down the system")
+        sys.exit(1)
+    print(f"(Frontend): Order leader is {leader_id}")
+
+    #pre-forked workers all listen on the port, the kernel spreads connections over them
+    server = await asyncio.start_server(frontend.handle_connection, "0.0.0.0", port, backlog=backlog, reuse_port=shared_leader is not None)
+    print("Server running (asyncio) ... \n")
+    async with server:
+        await server.serve_forever()
+
+
+def serve(port, catalog_target, order_targets, channels_per_backend, cache, lookup_wait_timeout=5.0, watch=True, backlog=1024, shared_leader=None, broadcast=None):
+    asyncio.run(run(port, catalog_target, order_targets, channels_per_backend, cache, lookup_wait_timeout, watch, backlog, shared_leader, broadcast))
@@ -0,0 +1,271 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+#entries per shard below which a cache is not split further, small caches keep exact LRU in a single shard
+MIN_SHARD_CAPACITY = 64
+MAX_SHARDS = 16
+
+
+#plain least recently used eviction
+class LruPolicy:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.order = OrderedDict()
+
+    def record(self, name):
+        pass
+
+    def on_hit(self, name):
+        self.order.move_to_end(name)
+
+    #returns the names evicted to make room, a new name is always admitted
+    def on_insert(self, name):
+        self.order[name] = None
+        evicted = []
+        while len(self.order) > self.capacity:
+            evicted.append(self.order.popitem(last=False)[0])
+        return evicted
+
+    def on_remove(self, name):
+        self.order.pop(name, None)
+
+
+#byte translation table that halves every counter
+HALVE = bytes(count >> 1 for count in range(256))
+
+
+#approximate access counts in 4 rows of 4 bit style counters (saturating at 15)
+#all counters are halved after sample_size increments so that old popularity fades
+class CountMinSketch:
+    ROWS = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity):
+        width = 16
+        while width < capacity * 4:
+            width *= 2
+        self.mask = width - 1
+        self.rows = [bytearray(width) for _ in range(self.ROWS)]
+        self.sample_size = max(10 * capacity, 100)
+        self.additions = 0
+
+    #row i uses counter (h + i * step) & mask, double hashing from one hash() call
+    def increment(self, name):
+        h = hash(name)
+        step = (h >> 17) | 1
+        for row in self.rows:
+            index = h & self.mask
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+            h += step
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+
+    def estimate(self, name):
+        h = hash(name)
+        step = (h >> 17) | 1
+        count = self.MAX_COUNT
+        for row in self.rows:
+            count = min(count, row[h & self.mask])
+            h += step
+        return count
+
+    def reset(self):
+        for row in self.rows:
+            row[:] = row.translate(HALVE)
+        self.additions //= 2
+
+
+#W-TinyLFU: new entries go to a small LRU window, entries leaving the window compete with the main cache's victim
+#and only get in if the sketch says they are used more often, so a sweep over many cold stocks cannot flush hot ones
+#the main cache is a segmented LRU, entries hit again in probation move to the protected segment
+class TinyLfuPolicy:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.window_capacity = max(1, capacity // 100)
+        main_capacity = max(0, capacity - self.window_capacity)
+        self.protected_capacity = main_capacity * 4 // 5
+        self.main_capacity = main_capacity
+        self.window = OrderedDict()
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.sketch = CountMinSketch(capacity)
+
+    #every lookup counts towards the stock's popularity, hits and misses alike
+    def record(self, name):
+        self.sketch.increment(name)
+
+    def on_hit(self, name):
+        if name in self.window:
+            self.window.move_to_end(name)
+        elif name in self.protected:
+            self.protected.move_to_end(name)
+        elif name in self.probation:
+            del self.probation[name]
+            self.protected[name] = None
+            #the protected segment overflows into probation, where it competes for eviction again
+            if len(self.protected) > self.protected_capacity:
+                demoted, _ = self.protected.popitem(last=False)
+                self.probation[demoted] = None
+
+    def on_insert(self, name):
+        self.window[name] = None
+        if len(self.window) <= self.window_capacity:
+            return []
+        candidate, _ = self.window.popitem(last=False)
+        if len(self.probation) + len(self.protected) < self.main_capacity:
+            self.probation[candidate] = None
+            return []
+        victims = self.probation or self.protected
+        if not victims:
+            return [candidate]
+        victim = next(iter(victims))
+        if self.sketch.estimate(candidate) > self.sketch.estimate(victim):
+            del victims[victim]
+            self.probation[candidate] = None
+            return [victim]
+        return [candidate]
+
+    def on_remove(self, name):
+        for segment in (self.window, self.probation, self.protected):
+            if name in segment:
+                del segment[name]
+                return
+
+
+POLICIES = {"lru": LruPolicy, "tinylfu": TinyLfuPolicy}
+
+
+#one independently locked part of the cache, holding the stocks whose name hashes to it
+class CacheShard:
+    def __init__(self, capacity, ttl, policy="lru"):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        #{name: (value, version, expires at or None)}, which entries stay is decided by the eviction policy
+        self.entries = {}
+        self.policy = POLICIES[policy](capacity)
+        #newest catalog version seen per stock through invalidations and pushed changes
+        self.seen_versions = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    # caller holds the lock
+    def live_entry(self, name):
+        entry = self.entries.get(name)
+        if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+            self.remove(name)
+            self.expirations += 1
+            return None
+        return entry
+
+    # caller holds the lock
+    def remove(self, name):
+        if self.entries.pop(name, None) is not None:
+            self.policy.on_remove(name)
+
+    def get(self, name):
+        with self.lock:
+            self.policy.record(name)
+            entry = self.live_entry(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            #recency update is a pointer move inside this shard only
+            self.policy.on_hit(name)
+            return entry[0]
+
+    #cache a lookup reply, returns False when a newer version of the stock is already known
+    #the policy may still decline to keep a new entry (TinyLFU admission), that is not a refusal
+    def put(self, name, value, version):
+        with self.lock:
+            if version < self.seen_versions.get(name, version):
+                self.rejections += 1
+                return False
+            entry = self.live_entry(name)
+            if entry is not None:
+                if entry[1] > version:
+                    return False
+                self.entries[name] = (value, version, entry[2])
+                return True
+            self.entries[name] = (value, version, time.monotonic() + self.ttl if self.ttl else None)
+            for evicted in self.policy.on_insert(name):
+                del self.entries[evicted]
+                self.evictions += 1
+            return True
+
+    #drop the stock unless it is already at least at version, without a version it is always dropped
+    def invalidate(self, name, version=None):
+        with self.lock:
+            if version is None:
+                self.remove(name)
+                return
+            self.seen_versions[name] = max(version, self.seen_versions.get(name, version))
+            entry = self.entries.get(name)
+            if entry is not None and entry[1] < version:
+                self.remove(name)
+
+    #update a cached stock in place to a pushed version, stocks that are not cached are not added
+    def apply(self, name, value, version):
+        with self.lock:
+            self.seen_versions[name] = max(version, self.seen_versions.get(name, version))
+            entry = self.entries.get(name)
+            #a change can arrive twice (around a snapshot), never go back to an older version
+            if entry is None or entry[1] > version:
+                return False
+            self.entries[name] = (value, version, entry[2])
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "expirations": self.expirations, "rejected_stale": self.rejections}
+
+
+#stock cache split into shards with their own locks, so lookups of different stocks do not serialize on one lock
+#every shard evicts within its share of the capacity by policy ("lru" or "tinylfu"), entries older than ttl seconds are dropped (0 = no expiry)
+class ShardedCache:
+    def __init__(self, capacity=5, shards=None, ttl=0, policy="lru"):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown cache policy {policy}, expected one of {list(POLICIES)}")
+        capacity = max(1, capacity)
+        if not shards:
+            shards = min(MAX_SHARDS, max(1, capacity // MIN_SHARD_CAPACITY))
+        shards = min(shards, capacity)
+        self.capacity = capacity
+        self.ttl = ttl
+        self.policy = policy
+        #capacity split as evenly as possible
+        self.shards = [CacheShard(capacity // shards + (1 if i < capacity % shards else 0), ttl, policy) for i in range(shards)]
+
+    def shard(self, name):
+        if len(self.shards) == 1:
+            return self.shards[0]
+        return self.shards[zlib.crc32(name.encode("utf-8")) % len(self.shards)]
+
+    #cached {"price", "quantity", "version"} or None
+    def get(self, name):
+        return self.shard(name).get(name)
+
+    def put(self, name, value, version):
+        return self.shard(name).put(name, value, version)
+
+    def invalidate(self, name, version=None):
+        self.shard(name).invalidate(name, version)
+
+    def apply(self, name, value, version):
+        return self.shard(name).apply(name, value, version)
+
+    def stats(self):
+        return [shard.stats() for shard in self.shards]
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self.shards)
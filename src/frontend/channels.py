@@ -0,0 +1,194 @@
+import asyncio
+import itertools
+import threading
+import grpc
+import catalog.catalog_pb2_grpc as catalog_pb2_grpc
+import order.order_pb2_grpc as order_pb2_grpc
+
+
+#options shared by every long lived channel the frontend opens
+CHANNEL_OPTIONS = [
+    #ping idle connections so dead peers are noticed before a request is sent on them
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    #reconnect within a couple of seconds once a crashed replica comes back instead of backing off for minutes
+    ("grpc.initial_reconnect_backoff_ms", 200),
+    ("grpc.min_reconnect_backoff_ms", 200),
+    ("grpc.max_reconnect_backoff_ms", 2000),
+    #without this grpc shares one subchannel (one TCP connection) between all channels with the same target
+    ("grpc.use_local_subchannel_pool", 1),
+]
+#seconds the channels replaced by a reset stay open for the calls still running on them
+RESET_GRACE = 10
+
+
+#fixed number of multiplexed channels to one backend, stubs are handed out round robin
+class ChannelPool:
+    def __init__(self, target, size, stub_class):
+        self.target = target
+        self.size = max(1, size)
+        self.stub_class = stub_class
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+        self.channels = []
+        self.stubs = []
+        for _ in range(self.size):
+            channel = grpc.insecure_channel(self.target, options=CHANNEL_OPTIONS)
+            self.channels.append(channel)
+            self.stubs.append(self.stub_class(channel))
+
+    def stub(self):
+        return self.stubs[next(self.counter) % self.size]
+
+    #called after an UNAVAILABLE error, replaces the channels so the next call dials immediately
+    #the old channels are closed after RESET_GRACE seconds, calls still running on them finish first
+    def reset(self):
+        with self.lock:
+            old = self.channels
+            channels = [grpc.insecure_channel(self.target, options=CHANNEL_OPTIONS) for _ in range(self.size)]
+            self.stubs = [self.stub_class(channel) for channel in channels]
+            self.channels = channels
+        timer = threading.Timer(RESET_GRACE, close_channels, args=(old,))
+        timer.daemon = True
+        timer.start()
+        print(f"(Frontend): Reconnected {self.size} channel(s) to {self.target}")
+
+    def close(self):
+        with self.lock:
+            for channel in self.channels:
+                channel.close()
+
+
+def close_channels(channels):
+    for channel in channels:
+        channel.close()
+
+
+#owns every channel from the frontend to the backends
+#channels to all order replicas are opened up front so a leader change only switches pools
+#with pre-forked workers the leader id lives in shared memory (frontend.prefork.SharedLeader) so all workers use the same one
+class ChannelManager:
+    def __init__(self, catalog_target, order_targets, channels_per_backend=2, shared_leader=None):
+        self.catalog = ChannelPool(catalog_target, channels_per_backend, catalog_pb2_grpc.CatalogServiceStub)
+        #order_targets = {service_id: "host:port"}
+        self.orders = {
+            service_id: ChannelPool(target, channels_per_backend, order_pb2_grpc.OrderServiceStub)
+            for service_id, target in order_targets.items()
+        }
+        self.leader_lock = threading.Lock()
+        self.leader_id = None
+        self.shared_leader = shared_leader
+
+    def catalog_stub(self):
+        return self.catalog.stub()
+
+    def order_stub(self, service_id):
+        return self.orders[service_id].stub()
+
+    def set_leader(self, leader_id):
+        with self.leader_lock:
+            self.leader_id = leader_id
+        if self.shared_leader is not None:
+            self.shared_leader.set(leader_id)
+
+    #None until a leader is elected
+    def current_leader(self):
+        if self.shared_leader is not None:
+            return self.shared_leader.get()
+        with self.leader_lock:
+            return self.leader_id
+
+    #returns the current leader id together with a stub on its pooled channel
+    def leader(self):
+        leader_id = self.current_leader()
+        return leader_id, self.orders[leader_id].stub()
+
+    def reset_catalog(self):
+        self.catalog.reset()
+
+    def reset_order(self, service_id):
+        if service_id in self.orders:
+            self.orders[service_id].reset()
+
+    def close(self):
+        self.catalog.close()
+        for pool in self.orders.values():
+            pool.close()
+
+
+#grpc.aio version of ChannelPool for the asyncio runtime, must be created inside the running event loop
+class AioChannelPool:
+    def __init__(self, target, size, stub_class):
+        self.target = target
+        self.size = max(1, size)
+        self.stub_class = stub_class
+        self.counter = itertools.count()
+        self.channels = [grpc.aio.insecure_channel(self.target, options=CHANNEL_OPTIONS) for _ in range(self.size)]
+        self.stubs = [self.stub_class(channel) for channel in self.channels]
+        #close tasks of replaced channels, referenced until they finish
+        self.closing = set()
+
+    def stub(self):
+        return self.stubs[next(self.counter) % self.size]
+
+    #everything runs on the event loop thread, replacing the lists needs no lock
+    #the old channels close once their calls finish, or are cancelled after RESET_GRACE seconds
+    def reset(self):
+        old = self.channels
+        self.channels = [grpc.aio.insecure_channel(self.target, options=CHANNEL_OPTIONS) for _ in range(self.size)]
+        self.stubs = [self.stub_class(channel) for channel in self.channels]
+        for channel in old:
+            task = asyncio.get_running_loop().create_task(channel.close(grace=RESET_GRACE))
+            self.closing.add(task)
+            task.add_done_callback(self.closing.discard)
+        print(f"(Frontend): Reconnected {self.size} channel(s) to {self.target}")
+
+    async def close(self):
+        for channel in self.channels:
+            await channel.close()
+
+
+#ChannelManager for the asyncio runtime, same interface with grpc.aio stubs whose calls are awaited
+class AioChannelManager:
+    def __init__(self, catalog_target, order_targets, channels_per_backend=2, shared_leader=None):
+        self.catalog = AioChannelPool(catalog_target, channels_per_backend, catalog_pb2_grpc.CatalogServiceStub)
+        self.orders = {
+            service_id: AioChannelPool(target, channels_per_backend, order_pb2_grpc.OrderServiceStub)
+            for service_id, target in order_targets.items()
+        }
+        self.leader_id = None
+        self.shared_leader = shared_leader
+
+    def catalog_stub(self):
+        return self.catalog.stub()
+
+    def order_stub(self, service_id):
+        return self.orders[service_id].stub()
+
+    def set_leader(self, leader_id):
+        self.leader_id = leader_id
+        if self.shared_leader is not None:
+            self.shared_leader.set(leader_id)
+
+    def current_leader(self):
+        if self.shared_leader is not None:
+            return self.shared_leader.get()
+        return self.leader_id
+
+    def leader(self):
+        leader_id = self.current_leader()
+        return leader_id, self.orders[leader_id].stub()
+
+    def reset_catalog(self):
+        self.catalog.reset()
+
+    def reset_order(self, service_id):
+        if service_id in self.orders:
+            self.orders[service_id].reset()
+
+    async def close(self):
+        await self.catalog.close()
+        for pool in self.orders.values():
+            await pool.close()
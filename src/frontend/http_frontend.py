@@ -4,23 +4,30 @@ import threading
 from socketserver import ThreadingMixIn
 import grpc
 import catalog.catalog_pb2 as catalog_pb2
-import catalog.catalog_pb2_grpc as catalog_pb2_grpc
 import order.order_pb2 as order_pb2
-import order.order_pb2_grpc as order_pb2_grpc
+from frontend.channels import ChannelManager
+from frontend.watch import CatalogWatcher
+from frontend.cache import ShardedCache
+from frontend.singleflight import SingleFlight
+from frontend.replies import cached_stock_reply
 from google.protobuf.empty_pb2 import Empty
 import os
-from collections import OrderedDict
-from readerwriterlock import rwlock
+from urllib.parse import urlsplit, parse_qs
 import sys
-import time 
 
 
 
-cache = OrderedDict()
-cache_size = 5
-lock = rwlock.RWLockFair()
-read_lock = lock.gen_rlock()
-write_lock = lock.gen_wlock()
+#stock cache with its own per shard locks, replaced in __main__ with the configured capacity, shards and ttl
+cache = ShardedCache(capacity=5)
+#concurrent misses on the same stock share one catalog Lookup
+lookups = SingleFlight()
+#held while re-electing the order leader, the shared SharedLeader lock when running pre-forked workers
+election_lock = threading.Lock()
+#WorkerBroadcast passing invalidations to the other workers, None with a single process
+broadcast = None
+#most symbols one GET /stocks?names= may ask for, and most orders one POST /orders/batch may place
+MAX_BATCH_NAMES = 256
+MAX_BATCH_ORDERS = 256
     
 
 #Handler class run by each thread
@@ -44,25 +51,24 @@ class FrontendServer(BaseHTTPRequestHandler):
             print("Connection:", self.connection)
             print(f"GET [{threading.current_thread().name}] is running to serve {self.client_address}")
 
-            #check if the stock exists in cache 
-            with write_lock:
-                if is_cache and stockName in cache:
-                    print(f"Fetched {stockName} from cache")
-                    code = 200
-                    response = {"data": {"name": stockName, "price": cache[stockName]["price"], "quantity": cache[stockName]["quantity"]}}
-                    #move this stockname to the end as recently used in cache 
-                    cache.move_to_end(stockName)
-                else:
-                    #call catalog microservice
-                    cache_miss = 1
+            #check if the stock exists in cache, only this stock's shard is locked
+            cached = cache.get(stockName) if is_cache else None
+            if cached is not None:
+                print(f"Fetched {stockName} from cache")
+                code = 200
+                response = cached_stock_reply(stockName, cached, self.version_string())
+            else:
+                #call catalog microservice
+                cache_miss = 1
             
             if cache_miss:
                 print(f"Could not find {stockName} in cache calling catalog microservice\n")
 
-                with grpc.insecure_channel(f'{CATALOG_HOST}:{CATALOG_PORT}') as channel:
-                    stub = catalog_pb2_grpc.CatalogServiceStub(channel)
-                    lookup_req = catalog_pb2.LookupRequest(stock_name = stockName)
-                    lookup_reply = stub.Lookup(lookup_req)
+                lookup_req = catalog_pb2.LookupRequest(stock_name = stockName)
+                #only the first of the concurrent misses calls the catalog, a failure is raised in every waiting thread
+                lookup_reply, shared = lookups.do(stockName, lambda: lookup_catalog(lookup_req))
+                if shared:
+                    print(f"Shared an in-flight catalog lookup of {stockName}")
 
                 print(lookup_reply)
                 #if incorrect stock name sent
@@ -79,61 +85,63 @@ class FrontendServer(BaseHTTPRequestHandler):
                     code = 200
                     response = {"data": {"name": lookup_reply.name, "price": lookup_reply.price, "quantity": lookup_reply.quantity}}
             
-                    #check cache size before adding to cache 
-                    with write_lock:
-                        if len(cache) == cache_size:
-                            #remove the oldest added item
-                            cache.popitem(last=False)
-                        
-                        #add this item to cache for future
-                        cache[lookup_reply.name] = {"price": lookup_reply.price, "quantity": lookup_reply.quantity}
+                    #add this item to cache for future, the shard evicts its least recently used stock when full
+                    #refused when the stock changed while the lookup was in flight (invalidation or push with a newer version)
+                    #the caller that made the lookup caches it, threads that shared the reply do not repeat that
+                    if not shared and not cache.put(lookup_reply.name, {"price": lookup_reply.price, "quantity": lookup_reply.quantity}, lookup_reply.version):
+                        print(f"Not caching {lookup_reply.name} version {lookup_reply.version}, a newer version is already known")
+
+            return code, response
+
+        #several stocks in one request, hits come from the cache and all misses go to the catalog in one BatchLookup
+        def handle_get_stocks(query):
+
+            print("Handling batch stock lookup request")
 
+            names = list(dict.fromkeys(name for value in parse_qs(query).get("names", []) for name in value.split(",") if name))
+            if not names or len(names) > MAX_BATCH_NAMES:
+                code = 400
+                response = {"error": {"code": code, "message": f"names must list 1 to {MAX_BATCH_NAMES} stocks"}}
+                return code, response
+
+            found = {}
+            misses = []
+            for name in names:
+                cached = cache.get(name)
+                if cached is not None:
+                    found[name] = {"name": name, "price": cached["price"], "quantity": cached["quantity"]}
+                else:
+                    misses.append(name)
+            print(f"Fetched {len(found)} of {len(names)} stocks from cache")
+
+            if misses:
+                print(f"Could not find {misses} in cache calling catalog microservice\n")
+                for lookup_reply in lookup_catalog_batch(misses):
+                    if lookup_reply.code == 404:
+                        continue
+                    found[lookup_reply.name] = {"name": lookup_reply.name, "price": lookup_reply.price, "quantity": lookup_reply.quantity}
+                    if not cache.put(lookup_reply.name, {"price": lookup_reply.price, "quantity": lookup_reply.quantity}, lookup_reply.version):
+                        print(f"Not caching {lookup_reply.name} version {lookup_reply.version}, a newer version is already known")
+
+            code = 200
+            response = {"data": {"stocks": [found[name] for name in names if name in found], "not_found": [name for name in names if name not in found]}}
             return code, response
 
         def handle_get_order(transaction_num):
 
-            global leader_id, ORDER_HOST, ORDER_PORT
             print("Handling get order requests")
 
-            try: 
-                with read_lock:
-                    lid = leader_id
-                    host = ORDER_HOST
-                    port = ORDER_PORT
-                
-                with grpc.insecure_channel(f'{host}:{port}') as channel:
-                    stub = order_pb2_grpc.OrderServiceStub(channel)
-                    details_req = order_pb2.GetOrderDetailsRequest(transaction_num = transaction_num)
-                    details_reply = stub.GetOrderDetails(details_req)
-            except Exception as e: 
-                print(f"(Frontend): Order Leader {lid} not responding, re-electing leader")
-                #redo leader election, (also handles notification of replicas about new leader)
-                leader_add = find_leader()
-                if leader_add is None:
-                    print("No Order Replicas are responding, shutting down the system")
-                    sys.exit(1)
-                
-                with write_lock: 
-                    leader_id, (ORDER_HOST, ORDER_PORT) = leader_add
-                    lid = leader_id
-                    host = ORDER_HOST
-                    port = ORDER_PORT
-                
-                try:
-                    with grpc.insecure_channel(f'{host}:{port}') as channel:
-                        stub = order_pb2_grpc.OrderServiceStub(channel)
-                        details_req = order_pb2.GetOrderDetailsRequest(transaction_num = transaction_num)
-                        details_reply = stub.GetOrderDetails(details_req)
-                except Exception as e2:
-                    print(f"(Frontend): New leader {lid} also failed due to {e2}")
-                    code = 404
-                    response = {
-                        "error": {
-                            "code": code,
-                            "message": "Order service temporarily unavailable"
-                        }
+            details_req = order_pb2.GetOrderDetailsRequest(transaction_num = transaction_num)
+            details_reply = call_order_leader("GetOrderDetails", details_req)
+            if details_reply is None:
+                code = 404
+                response = {
+                    "error": {
+                        "code": code,
+                        "message": "Order service temporarily unavailable"
                     }
-                    return code, response
+                }
+                return code, response
 
             if details_reply.code == 404:
                 code=404
@@ -155,6 +163,16 @@ class FrontendServer(BaseHTTPRequestHandler):
             if self.path.startswith("/stocks/"):
                 stockName=self.path.split("/")[-1]
                 code, response = handle_get_stock(stockName)
+                if isinstance(response, bytes):
+                    #cache hit, the whole reply is already encoded
+                    self.log_request(code)
+                    self.wfile.write(response)
+                    return
+            elif self.path.startswith("/stocks?"):
+                code, response = handle_get_stocks(urlsplit(self.path).query)
+            elif self.path == "/cache/stats":
+                #per shard counters of the stock cache
+                code, response = 200, {"data": {"shards": cache.stats(), "lookups": lookups.stats(), "pid": os.getpid()}}
             elif self.path.startswith("/orders/"):
                 transaction_num = int(self.path.split("/")[-1])
                 code, response = handle_get_order(transaction_num)
@@ -184,7 +202,12 @@ class FrontendServer(BaseHTTPRequestHandler):
 
     #this method is run in POST request
     def do_POST(self):
-        global leader_id, ORDER_HOST, ORDER_PORT
+        if self.path == "/invalidate":
+            self.handle_invalidate()
+            return
+        if self.path == "/orders/batch":
+            self.handle_order_batch()
+            return
         try:
             if not self.path.startswith("/orders/") :
                 raise ValueError("Invalid URL path")
@@ -200,50 +223,18 @@ class FrontendServer(BaseHTTPRequestHandler):
             quantity = message["quantity"]
 
             #call order microservice
-
-            try:
-                with read_lock:
-                    lid = leader_id
-                    host = ORDER_HOST
-                    port = ORDER_PORT
-
-                with grpc.insecure_channel(f'{host}:{port}') as channel:
-                    stub = order_pb2_grpc.OrderServiceStub(channel)
-                    order_req = order_pb2.OrderRequest(name = stock_name,number_of_items=quantity, type=order_type)
-                    order_reply = stub.Order(order_req)
-            except Exception as e:
-                print(f"(Frontend): Order Leader {lid} not responding, re-electing leader")
-
-                leader_add = find_leader()
-                if leader_add is None:
-                    print("No Order Replicas are responding, shutting down the system")
-                    sys.exit(1)
-                
-                with write_lock: 
-                    leader_id, (ORDER_HOST, ORDER_PORT) = leader_add
-                    lid = leader_id
-                    host = ORDER_HOST
-                    port = ORDER_PORT
-                
-                try:
-                    with grpc.insecure_channel(f'{host}:{port}') as channel:
-                        stub = order_pb2_grpc.OrderServiceStub(channel)
-                        order_req = order_pb2.OrderRequest(name = stock_name,number_of_items=quantity, type=order_type)
-                        order_reply = stub.Order(order_req)
-                except Exception as e2:
-                    print(f"(Frontend): New leader {lid} also failed due to {e2}")
-                    code = 404
-                    response = {
-                        "error": {
-                            "code": code,
-                            "message": "Order service temporarily unavailable"
-                        }
+            order_req = order_pb2.OrderRequest(name = stock_name,number_of_items=quantity, type=order_type)
+            order_reply = call_order_leader("Order", order_req)
+            if order_reply is None:
+                code = 404
+                response = {
+                    "error": {
+                        "code": code,
+                        "message": "Order service temporarily unavailable"
                     }
-            
-                    return code, response
-            
-            if order_reply.code == 404:
-                code=404
+                }
+            elif order_reply.code != 200:
+                code = order_reply.code
                 response = {
                     "error": {
                         "code": order_reply.code,
@@ -268,16 +259,83 @@ class FrontendServer(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(response)
 
-    def do_DELETE(self):
-        if self.path.startswith("/delete/"):
-            stock_name = self.path.split("/")[-1]
-            print(f"Deleting {stock_name} from cache \n")
+    #several orders in one request, body {"orders": [{"name", "quantity", "type"}, ...]}
+    #sent to the order leader in one OrderBatch, the reply has one result per order in request order
+    def handle_order_batch(self):
+        print(f"POST [{threading.current_thread().name}] is running to serve {self.client_address}")
+        try:
+            length = int(self.headers.get('content-length'))
+            orders = json.loads(self.rfile.read(length).decode('utf-8'))["orders"]
+            if not orders or len(orders) > MAX_BATCH_ORDERS:
+                raise ValueError(f"orders must list 1 to {MAX_BATCH_ORDERS} orders")
+            batch_req = order_pb2.OrderBatchRequest(orders = [
+                order_pb2.OrderRequest(name = order["name"], number_of_items = order["quantity"], type = order["type"]) for order in orders
+            ])
+        except (ValueError, KeyError, TypeError):
+            code = 400
+            response = {"error": {"code": code, "message": "Invalid order batch"}}
+        else:
+            batch_reply = call_order_leader("OrderBatch", batch_req)
+            if batch_reply is None:
+                code = 404
+                response = {"error": {"code": code, "message": "Order service temporarily unavailable"}}
+            else:
+                code = 200
+                response = {"data": {"results": [
+                    {"transaction_number": result.transaction_num} if result.code == 200 else {"error": {"code": result.code, "message": result.message}}
+                    for result in batch_reply.results
+                ]}}
+        response = json.dumps(response).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    #batch of cache invalidations from the catalog, body {"names": [...]}
+    def handle_invalidate(self):
+        try:
+            length = int(self.headers.get('content-length'))
+            message = json.loads(self.rfile.read(length).decode('utf-8'))
+            names = message["names"]
+            print(f"Deleting {names} from cache \n")
 
-            with write_lock:
-                cache.pop(stock_name, None)
+            versions = message.get("versions", {})
+            for stock_name in names:
+                cache.invalidate(stock_name, versions.get(stock_name))
+            if broadcast is not None:
+                broadcast.send(names, versions)
 
             response = json.dumps({"code": 200, "message": "Cache invalidated"}).encode('utf-8')
             code=200
+        except (ValueError, KeyError, TypeError, AttributeError):
+            response = json.dumps({"code": 400, "message": "Invalid invalidation request"}).encode('utf-8')
+            code=400
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def do_DELETE(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/delete/"):
+            stock_name = url.path.split("/")[-1]
+            #the catalog sends the version of the trade, a manual delete has none
+            version = parse_qs(url.query).get("version")
+            try:
+                version = int(version[0]) if version else None
+                print(f"Deleting {stock_name} from cache \n")
+
+                cache.invalidate(stock_name, version)
+                if broadcast is not None:
+                    broadcast.send([stock_name], {stock_name: version})
+
+                response = json.dumps({"code": 200, "message": "Cache invalidated"}).encode('utf-8')
+                code=200
+            except ValueError:
+                response = json.dumps({"code": 400, "message": "Invalid version"}).encode('utf-8')
+                code=400
 
         else:
             response = json.dumps({"code": 404, "message": "Invalid path"}).encode('utf-8')
@@ -293,56 +351,127 @@ class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
 
 
-def find_leader():
+#pre-forked workers each bind the port with SO_REUSEPORT and the kernel spreads new connections over them
+class ReusePortHTTPServer(ThreadedHTTPServer):
+    allow_reuse_port = True
+    request_queue_size = 1024
 
+
+#order_services = {1: (host_add, port), 2:(host_add, port)}
+def order_service_addresses():
     order_services = {}
+    for i in range(3):
+        service_id = int(os.getenv(f"ORDER_ID_{i+1}", i+1))
+        order_services[service_id] = (os.getenv(f"ORDER_HOST_{i+1}", "localhost"), int(os.getenv(f"ORDER_PORT_{i+1}",8093+i)))
+    return order_services
+
+
+def find_leader():
 
-    def check_health(s_id, order_services):
-        host, port = order_services[s_id]
+    order_services = order_service_addresses()
 
+    def check_health(s_id):
         try:
-            with grpc.insecure_channel(f'{host}:{port}') as channel:
-                stub = order_pb2_grpc.OrderServiceStub(channel)
-                order_reply = stub.Heartbeat(Empty())
-                return order_reply.code == 200
+            stub = channels.order_stub(s_id)
+            order_reply = stub.Heartbeat(Empty(), timeout=2)
+            return order_reply.code == 200
         except grpc.RpcError as e:
             print(f"(Frontend): Replica {s_id} unreachable: {e}")
             return False
     
-    def notify_replicas(leader_id, order_services):
+    def notify_replicas(leader_id):
 
-
-        for s_id, add in order_services.items():
-            host, port = add
+        for s_id in order_services:
             if s_id == leader_id:
                 continue
             try:
-                with grpc.insecure_channel(f'{host}:{port}') as channel:
-                    stub = order_pb2_grpc.OrderServiceStub(channel)
-                    notify_req = order_pb2.NotifyReplicaRequest(leader_id=leader_id)
-                    stub.NotifyReplica(notify_req)
-                    print(f"(Frontend): Notified replica {s_id} about leader {leader_id}")
+                stub = channels.order_stub(s_id)
+                notify_req = order_pb2.NotifyReplicaRequest(leader_id=leader_id)
+                stub.NotifyReplica(notify_req, timeout=2)
+                print(f"(Frontend): Notified replica {s_id} about leader {leader_id}")
             except grpc.RpcError as e:
                 print(f"(Frontend): Failed to notify replica {s_id}: {e}")
 
 
-    #order_services = {1: (host_add, port), 2:(host_add, port)}
-    for i in range(3):
-        service_id = int(os.getenv(f"ORDER_ID_{i+1}", i+1))
-        order_services[service_id] = (os.getenv(f"ORDER_HOST_{i+1}", "localhost"), int(os.getenv(f"ORDER_PORT_{i+1}",8093+i)))
-
-
     #ping the order service with the highest id number 
     service_ids = sorted(list(order_services.keys()), reverse=True)
     for s_id in service_ids:
-        if check_health(s_id, order_services):
-            notify_replicas(s_id, order_services)
+        if check_health(s_id):
+            notify_replicas(s_id)
+            #the channels to the new leader are already open so switching is free
+            channels.set_leader(s_id)
             return s_id, order_services[s_id]
 
     #no order replicas are available   
     return None
 
 
+#changes pushed by the catalog over WatchCatalog, cached stocks are updated in place so they stay cache hits
+#stocks that are not cached are left out, the pushes do not change what the LRU holds
+def apply_catalog_updates(updates, snapshot):
+    applied = 0
+    for update in updates:
+        if cache.apply(update.name, {"price": update.price, "quantity": update.quantity}, update.version):
+            applied += 1
+    if applied:
+        print(f"(Frontend): Updated {applied} cached stocks from the catalog")
+
+
+#lookup over the pooled catalog channel, redialing once if the connection was lost
+def lookup_catalog(lookup_req):
+    try:
+        return channels.catalog_stub().Lookup(lookup_req)
+    except grpc.RpcError as e:
+        if e.code() != grpc.StatusCode.UNAVAILABLE:
+            raise
+        print(f"(Frontend): Catalog connection lost, reconnecting: {e.code()}")
+        channels.reset_catalog()
+        return channels.catalog_stub().Lookup(lookup_req)
+
+
+#lookup of several stocks in one BatchLookup, one LookupResponse per name in order
+#a catalog without BatchLookup is asked one Lookup per name
+def lookup_catalog_batch(names):
+    batch_req = catalog_pb2.BatchLookupRequest(stock_names = names)
+    try:
+        return channels.catalog_stub().BatchLookup(batch_req).stocks
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+            return [lookup_catalog(catalog_pb2.LookupRequest(stock_name = name)) for name in names]
+        if e.code() != grpc.StatusCode.UNAVAILABLE:
+            raise
+        print(f"(Frontend): Catalog connection lost, reconnecting: {e.code()}")
+        channels.reset_catalog()
+        return channels.catalog_stub().BatchLookup(batch_req).stocks
+
+
+#send a request to the order leader, if it does not respond re-elect a leader and retry once
+#returns None when the new leader also fails
+def call_order_leader(method, request):
+    lid, stub = channels.leader()
+    try:
+        return getattr(stub, method)(request)
+    except grpc.RpcError:
+        print(f"(Frontend): Order Leader {lid} not responding, re-electing leader")
+
+    #redo leader election, (also handles notification of replicas about new leader)
+    #one election at a time, a request whose failed leader was already replaced by another thread or worker just retries
+    with election_lock:
+        if channels.current_leader() == lid:
+            channels.reset_order(lid)
+            leader_add = find_leader()
+            if leader_add is None:
+                print("No Order Replicas are responding, shutting down the system")
+                sys.exit(1)
+
+    lid, stub = channels.leader()
+    try:
+        return getattr(stub, method)(request)
+    except grpc.RpcError as e2:
+        print(f"(Frontend): New leader {lid} also failed due to {e2}")
+        return None
+
+
     
 
 if __name__ == "__main__":
@@ -351,20 +480,77 @@ if __name__ == "__main__":
     FRONTEND_PORT = int(os.getenv("FRONTEND_PORT", 8091))
     CATALOG_HOST =  os.getenv("CATALOG_HOST", "localhost")
     CATALOG_PORT = int(os.getenv("CATALOG_PORT", 8092))
-    leader_add = find_leader()
-    
-    if leader_add is None:
-        print("No Order Replicas are responding, shutting down the system")
+    CHANNELS_PER_BACKEND = int(os.getenv("FRONTEND_CHANNELS_PER_BACKEND", 2))
+    #cached stocks, number of independently locked shards (0 = derived from the size) and seconds an entry stays valid (0 = until invalidated)
+    CACHE_SIZE = int(os.getenv("FRONTEND_CACHE_SIZE", 5))
+    CACHE_SHARDS = int(os.getenv("FRONTEND_CACHE_SHARDS", 0))
+    CACHE_TTL = float(os.getenv("FRONTEND_CACHE_TTL", 0))
+    #lru | tinylfu (frequency based admission, keeps popular stocks cached when clients sweep through many symbols)
+    CACHE_POLICY = os.getenv("FRONTEND_CACHE_POLICY", "lru")
+    WORKERS = int(os.getenv("FRONTEND_WORKERS", 1))
+    #local: a private ShardedCache per process | shared: one SharedMemoryCache read by every worker on the host
+    CACHE_BACKEND = os.getenv("FRONTEND_CACHE_BACKEND", "local")
+    if CACHE_BACKEND == "shared":
+        from frontend.shm_cache import SharedMemoryCache
+        cache = SharedMemoryCache(CACHE_SIZE, CACHE_TTL, WORKERS)
+    else:
+        cache = ShardedCache(CACHE_SIZE, CACHE_SHARDS, CACHE_TTL, CACHE_POLICY)
+    #seconds a miss waits for another thread's Lookup of the same stock before calling the catalog itself
+    lookups = SingleFlight(float(os.getenv("FRONTEND_LOOKUP_WAIT_TIMEOUT", 5)))
+
+    order_targets = {s_id: f"{host}:{port}" for s_id, (host, port) in order_service_addresses().items()}
+
+    #FRONTEND_WORKERS > 1 forks that many processes sharing the port, forked before any grpc channel or thread exists
+    #every worker runs the rest of this block with its own channels, catalog watch and (unless the cache is shared) cache
+    shared_leader = None
+    worker_id = 0
+    if WORKERS > 1:
+        from frontend.prefork import SharedLeader, WorkerBroadcast, fork_workers
+        shared_leader = SharedLeader()
+        election_lock = shared_leader.lock
+        worker_id = fork_workers(WORKERS, cache.unlink if CACHE_BACKEND == "shared" else None)
+        #the shared cache is updated once by whichever worker gets an invalidation, private caches need every worker told
+        if CACHE_BACKEND == "shared":
+            cache.worker = worker_id
+        else:
+            broadcast = WorkerBroadcast(FRONTEND_PORT, worker_id, WORKERS)
+            broadcast.listen(lambda names, versions: [cache.invalidate(name, versions.get(name)) for name in names])
+        print(f"(Frontend): Worker {worker_id} started")
+    #with the shared cache only the first worker applies the catalog's pushed changes
+    WATCH_CATALOG = os.getenv("FRONTEND_WATCH_CATALOG", "1") == "1" and (worker_id == 0 or CACHE_BACKEND != "shared")
+
+    #threads: one thread per client connection (default) | asyncio: one event loop serving every connection with grpc.aio stubs
+    RUNTIME = os.getenv("FRONTEND_RUNTIME", "threads")
+    if RUNTIME == "asyncio":
+        from frontend.async_frontend import serve
+        serve(FRONTEND_PORT, f"{CATALOG_HOST}:{CATALOG_PORT}", order_targets, CHANNELS_PER_BACKEND, cache,
+              float(os.getenv("FRONTEND_LOOKUP_WAIT_TIMEOUT", 5)), WATCH_CATALOG,
+              int(os.getenv("FRONTEND_BACKLOG", 1024)), shared_leader, broadcast)
+        sys.exit(0)
+    elif RUNTIME != "threads":
+        print(f"Unknown FRONTEND_RUNTIME {RUNTIME}, expected threads or asyncio")
         sys.exit(1)
-    
-    #leader host and port 
-    leader_id, (ORDER_HOST, ORDER_PORT) = leader_add
-    # print("aaaa", leader_id, ORDER_HOST, ORDER_PORT)
-    # ORDER_HOST = os.getenv("ORDER_HOST", "localhost")
-    # ORDER_PORT = int(os.getenv("ORDER_PORT", 8093))
+
+    #long lived channels to the catalog and every order replica, shared by all handler threads
+    channels = ChannelManager(f"{CATALOG_HOST}:{CATALOG_PORT}", order_targets, CHANNELS_PER_BACKEND, shared_leader)
+
+    #with FRONTEND_WATCH_CATALOG=1 cached stocks are kept up to date by the catalog's change stream
+    if WATCH_CATALOG:
+        CatalogWatcher(channels, apply_catalog_updates, f"frontend:{FRONTEND_PORT}").start()
+
+    #the first worker elects the leader, the others adopt it
+    with election_lock:
+        leader_id = channels.current_leader()
+        if leader_id is None:
+            leader_add = find_leader()
+            if leader_add is None:
+                print("No Order Replicas are responding, shutting down the system")
+                sys.exit(1)
+            leader_id, _ = leader_add
+    print(f"(Frontend): Order leader is {leader_id}")
 
     #listen on all interfaces 
-    httpd = ThreadedHTTPServer(('0.0.0.0', FRONTEND_PORT),FrontendServer)
+    httpd = (ReusePortHTTPServer if WORKERS > 1 else ThreadedHTTPServer)(('0.0.0.0', FRONTEND_PORT),FrontendServer)
     print("Server running ... \n")
 
     #start the main server which will forward new client connection to a new thread running FrontendServer Handler 
@@ -0,0 +1,96 @@
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import threading
+
+
+#state for FRONTEND_WORKERS > 1: the frontend forks worker processes that all accept on the same port (SO_REUSEPORT)
+#each worker has its own cache and channels, they share the order leader and pass cache invalidations to each other
+
+
+#order leader id in shared memory (0 = not elected yet) and the lock every worker holds while electing
+#created before the fork so all workers map the same memory
+class SharedLeader:
+    def __init__(self):
+        self.value = multiprocessing.Value("i", 0, lock=False)
+        #a plain Lock (not RLock) so the asyncio runtime can acquire it on an executor thread and release it on the loop
+        self.lock = multiprocessing.Lock()
+
+    def get(self):
+        return self.value.value or None
+
+    def set(self, leader_id):
+        self.value.value = leader_id
+
+
+#fork workers processes, returns the worker index in each child
+#the parent stays behind to forward SIGTERM/SIGINT to the workers, and stops all of them once one exits
+#cleanup() runs in the parent after the workers were told to stop
+def fork_workers(workers, cleanup=None):
+    pids = {}
+    for worker_id in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            return worker_id
+        pids[pid] = worker_id
+    print(f"(Frontend): Started {workers} workers {list(pids)}")
+
+    def stop(signum, frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        if cleanup is not None:
+            cleanup()
+        os._exit(0)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    pid, status = os.wait()
+    print(f"(Frontend): Worker {pids.pop(pid)} exited with status {os.waitstatus_to_exitcode(status)}, stopping the others")
+    stop(None, None)
+
+
+#cache invalidations received by one worker are sent to every other worker over unix datagram sockets
+#the catalog invalidates through the shared port, so only one worker gets each request
+class WorkerBroadcast:
+    def __init__(self, port, worker_id, workers):
+        self.worker_id = worker_id
+        self.paths = [os.path.join(tempfile.gettempdir(), f"frontend-{port}-{i}.sock") for i in range(workers)]
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        #a worker that crashed leaves its socket file behind
+        try:
+            os.unlink(self.paths[worker_id])
+        except FileNotFoundError:
+            pass
+        self.sock.bind(self.paths[worker_id])
+        self.out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.out.settimeout(1.0)
+        self.received = 0
+        self.sent = 0
+
+    #apply_invalidations(names, versions) is called on a background thread for every batch a sibling received
+    def listen(self, apply_invalidations):
+        def run():
+            while True:
+                message = json.loads(self.sock.recv(1 << 20))
+                self.received += 1
+                apply_invalidations(message["names"], message["versions"])
+        threading.Thread(target=run, name="worker-invalidations", daemon=True).start()
+
+    #versions = {name: version or None}
+    def send(self, names, versions):
+        payload = json.dumps({"names": names, "versions": versions}).encode("utf-8")
+        for i, path in enumerate(self.paths):
+            if i == self.worker_id:
+                continue
+            try:
+                self.out.sendto(payload, path)
+                self.sent += 1
+            except OSError as e:
+                #the worker is not up (yet), it starts with an empty cache anyway
+                print(f"(Frontend): Could not pass invalidation of {names} to worker {i}: {e}")
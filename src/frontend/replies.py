@@ -0,0 +1,30 @@
+import json
+import time
+from email.utils import formatdate
+
+
+#(second, b"Date: ...\r\n"), the Date header only changes once a second
+http_date = (0, b"")
+
+
+def date_header():
+    global http_date
+    now = int(time.time())
+    if http_date[0] != now:
+        http_date = (now, f"Date: {formatdate(now, usegmt=True)}\r\n".encode("latin-1"))
+    return http_date[1]
+
+
+#full HTTP reply for a cached stock, the same bytes send_response/send_header/json.dumps would produce
+#the status line, headers and body are encoded once per cache entry and kept in it, so they go away with the entry
+#when the stock is invalidated or updated to a newer version, only the Date header is filled in per request
+def cached_stock_reply(stockName, cached, server):
+    encoded = cached.get("encoded")
+    if encoded is None:
+        body = json.dumps({"data": {"name": stockName, "price": cached["price"], "quantity": cached["quantity"]}}).encode('utf-8')
+        head = f"HTTP/1.1 200 OK\r\nServer: {server}\r\n".encode("latin-1")
+        tail = f"Content-type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        encoded = (head, tail)
+        #two threads may both encode a fresh entry, they store the same bytes
+        cached["encoded"] = encoded
+    return encoded[0] + date_header() + encoded[1]
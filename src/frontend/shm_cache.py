@@ -0,0 +1,238 @@
+import multiprocessing
+import struct
+import threading
+import time
+import zlib
+from multiprocessing import shared_memory
+
+
+#stock cache in one shared memory segment, created before FRONTEND_WORKERS are forked so every worker on the host
+#reads and fills the same table: one warm cache per host instead of one per process
+#fixed slots, each one guarded by a sequence counter (seqlock): a writer makes it odd, writes the slot and makes it even again,
+#a reader copies the slot and retries if the counter was odd or changed meanwhile, so readers never wait on a lock
+#writers (miss fills, invalidations, pushed updates) serialize on one lock shared by the workers
+
+
+#seq, version, newest version seen, price, quantity, expires at (0 = never), state, name length, name
+SLOT = struct.Struct("<QqqdqdBB64s14x")
+SEQ = struct.Struct("<Q")
+TIME = struct.Struct("<d")
+NAME_MAX = 64
+EMPTY, CACHED, SEEN = 0, 1, 2
+#slots a name can live in, starting at its hash
+WINDOW = 8
+#seqlock retries before a read gives up and counts as a miss
+MAX_RETRIES = 100
+#per worker counters, each worker only writes its own row
+COUNTERS = struct.Struct("<6Q")
+HITS, MISSES, EVICTIONS, EXPIRATIONS, REJECTIONS, RETRIES = range(6)
+
+
+class SharedMemoryCache:
+    def __init__(self, capacity=5, ttl=0, workers=1):
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+        self.window = min(WINDOW, self.capacity)
+        self.workers = max(1, workers)
+        #set to the worker index after the fork
+        self.worker = 0
+        #slots, one referenced byte per slot set by readers on a hit (second chance eviction),
+        #when a version kept for a name hashing to each slot was last dropped, then the counter rows
+        self.refs = self.capacity * SLOT.size
+        self.drops = (self.refs + self.capacity + 7) // 8 * 8
+        self.counters = self.drops + self.capacity * TIME.size
+        self.shm = shared_memory.SharedMemory(create=True, size=self.counters + self.workers * COUNTERS.size)
+        #a new segment is zero filled: every slot starts EMPTY with an even sequence
+        self.buf = self.shm.buf
+        self.lock = multiprocessing.Lock()
+        #only this worker's threads update its counter row, so a process local lock keeps their increments from being lost
+        self.counter_lock = threading.Lock()
+        #per process copies of cached values, {name: (version, value)}, so a hit returns the same dict (and its encoded reply)
+        self.values = {}
+        #per process {name: when its first pending miss happened}, the lookups that follow start no earlier
+        self.missed_at = {}
+
+    def count(self, counter, n=1):
+        offset = self.counters + self.worker * COUNTERS.size + counter * 8
+        with self.counter_lock:
+            SEQ.pack_into(self.buf, offset, SEQ.unpack_from(self.buf, offset)[0] + n)
+
+    def slots(self, key):
+        start = zlib.crc32(key) % self.capacity
+        return [(start + i) % self.capacity for i in range(self.window)]
+
+    #consistent copy of a slot, None if a writer kept it busy for too long
+    def read(self, slot):
+        offset = slot * SLOT.size
+        for _ in range(MAX_RETRIES):
+            seq = SEQ.unpack_from(self.buf, offset)[0]
+            if seq & 1:
+                self.count(RETRIES)
+                continue
+            fields = SLOT.unpack_from(self.buf, offset)
+            if SEQ.unpack_from(self.buf, offset)[0] == seq:
+                return fields
+            self.count(RETRIES)
+        return None
+
+    # caller holds the lock
+    def write(self, slot, version, seen, price, quantity, expires, state, key):
+        offset = slot * SLOT.size
+        seq = SEQ.unpack_from(self.buf, offset)[0]
+        SEQ.pack_into(self.buf, offset, seq + 1)
+        SLOT.pack_into(self.buf, offset, seq + 1, version, seen, price, quantity, expires, state, len(key), key)
+        SEQ.pack_into(self.buf, offset, seq + 2)
+
+    # caller holds the lock, slot holding the name and its fields, or (None, None)
+    def find(self, key):
+        for slot in self.slots(key):
+            fields = SLOT.unpack_from(self.buf, slot * SLOT.size)
+            if fields[6] != EMPTY and fields[8][:fields[7]] == key:
+                return slot, fields
+        return None, None
+
+    def live(self, fields):
+        return fields[6] == CACHED and (fields[5] == 0 or fields[5] > time.monotonic())
+
+    # caller holds the lock, the newest version seen for the name is about to be lost (its slot is reused or a marker
+    #finds no room): lookups of names hashing to the same slot that started before now may return an older version
+    def dropped(self, key):
+        TIME.pack_into(self.buf, self.drops + zlib.crc32(key) % self.capacity * TIME.size, time.monotonic())
+
+    # caller holds the lock, slot for a new name: an empty one, then one only remembering a version or expired,
+    #then the first not hit since the last pass (clearing referenced bytes on the way), else the first one
+    def victim(self, key, only_free=False):
+        slots = self.slots(key)
+        states = [SLOT.unpack_from(self.buf, slot * SLOT.size) for slot in slots]
+        for slot, fields in zip(slots, states):
+            if fields[6] == EMPTY:
+                return slot
+        for slot, fields in zip(slots, states):
+            if not self.live(fields):
+                self.dropped(fields[8][:fields[7]])
+                return slot
+        if only_free:
+            return None
+        self.count(EVICTIONS)
+        for slot, fields in zip(slots, states):
+            if not self.buf[self.refs + slot]:
+                self.dropped(fields[8][:fields[7]])
+                return slot
+            self.buf[self.refs + slot] = 0
+        self.dropped(states[0][8][:states[0][7]])
+        return slots[0]
+
+    #cached {"price", "quantity"} or None, never blocks
+    def get(self, name):
+        key = name.encode("utf-8")
+        if len(key) <= NAME_MAX:
+            for slot in self.slots(key):
+                fields = self.read(slot)
+                if fields is None or fields[6] != CACHED or fields[8][:fields[7]] != key:
+                    continue
+                if fields[5] and fields[5] <= time.monotonic():
+                    self.count(EXPIRATIONS)
+                    break
+                self.count(HITS)
+                self.buf[self.refs + slot] = 1
+                version = fields[1]
+                known = self.values.get(name)
+                if known is not None and known[0] == version:
+                    return known[1]
+                if len(self.values) >= 2 * self.capacity:
+                    self.values.clear()
+                value = {"price": fields[3], "quantity": fields[4]}
+                self.values[name] = (version, value)
+                return value
+        self.count(MISSES)
+        if len(self.missed_at) >= max(1024, 2 * self.capacity):
+            self.missed_at.clear()
+        self.missed_at.setdefault(name, time.monotonic())
+        return None
+
+    #cache a lookup reply, returns False when a newer version of the stock is already known
+    #or may have been: the stock has no slot and a version kept for it could have been dropped during the lookup
+    def put(self, name, value, version):
+        key = name.encode("utf-8")
+        if len(key) > NAME_MAX:
+            return True
+        started = self.missed_at.pop(name, None)
+        with self.lock:
+            slot, fields = self.find(key)
+            if fields is None:
+                #0 if no version was ever dropped there, without a recorded miss the lookup is taken to be as old as any drop
+                dropped = TIME.unpack_from(self.buf, self.drops + zlib.crc32(key) % self.capacity * TIME.size)[0]
+                if dropped and (started is None or started <= dropped):
+                    self.count(REJECTIONS)
+                    return False
+                slot = self.victim(key)
+            else:
+                if version < fields[2]:
+                    self.count(REJECTIONS)
+                    return False
+                if self.live(fields):
+                    if fields[1] > version:
+                        return False
+                    self.write(slot, version, max(version, fields[2]), value["price"], value["quantity"], fields[5], CACHED, key)
+                    return True
+            expires = time.monotonic() + self.ttl if self.ttl else 0
+            self.write(slot, version, max(version, fields[2]) if fields else version, value["price"], value["quantity"], expires, CACHED, key)
+            self.buf[self.refs + slot] = 0
+            return True
+
+    #drop the stock unless it is already at least at version, without a version it is always dropped
+    #the version is remembered in the stock's slot, or in a free one in its window, if the window is full the drop is recorded instead
+    def invalidate(self, name, version=None):
+        key = name.encode("utf-8")
+        if len(key) > NAME_MAX:
+            return
+        with self.lock:
+            slot, fields = self.find(key)
+            if fields is None:
+                if version is not None:
+                    slot = self.victim(key, only_free=True)
+                    if slot is not None:
+                        self.write(slot, 0, version, 0.0, 0, 0, SEEN, key)
+                    else:
+                        self.dropped(key)
+                return
+            seen = fields[2] if version is None else max(version, fields[2])
+            if version is None or fields[1] < version:
+                self.write(slot, 0, seen, 0.0, 0, 0, SEEN, key)
+            else:
+                self.write(slot, fields[1], seen, fields[3], fields[4], fields[5], fields[6], key)
+
+    #update a cached stock in place to a pushed version, stocks that are not cached are not added
+    def apply(self, name, value, version):
+        key = name.encode("utf-8")
+        if len(key) > NAME_MAX:
+            return False
+        with self.lock:
+            slot, fields = self.find(key)
+            if fields is None:
+                slot = self.victim(key, only_free=True)
+                if slot is not None:
+                    self.write(slot, 0, version, 0.0, 0, 0, SEEN, key)
+                else:
+                    self.dropped(key)
+                return False
+            seen = max(version, fields[2])
+            if not self.live(fields) or fields[1] > version:
+                self.write(slot, fields[1], seen, fields[3], fields[4], fields[5], fields[6], key)
+                return False
+            self.write(slot, version, seen, value["price"], value["quantity"], fields[5], CACHED, key)
+            return True
+
+    #summed over every worker on the host
+    def stats(self):
+        totals = [sum(column) for column in zip(*(COUNTERS.unpack_from(self.buf, self.counters + w * COUNTERS.size) for w in range(self.workers)))]
+        return [{"size": len(self), "capacity": self.capacity, "hits": totals[HITS], "misses": totals[MISSES],
+                 "evictions": totals[EVICTIONS], "expirations": totals[EXPIRATIONS], "rejected_stale": totals[REJECTIONS],
+                 "seqlock_retries": totals[RETRIES], "workers": self.workers, "backend": "shared"}]
+
+    def __len__(self):
+        return sum(1 for slot in range(self.capacity) if (self.read(slot) or (0,) * 7)[6] == CACHED)
+
+    #the creating process removes the segment when the frontend stops
+    def unlink(self):
+        self.shm.unlink()
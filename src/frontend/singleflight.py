@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+
+#one in-flight call and the outcome every caller waiting on it receives
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+#concurrent calls for the same key share one execution: the first caller runs it, the others wait for its result
+#or get its exception raised in their own thread, so a burst of misses on one stock sends a single catalog Lookup
+class SingleFlight:
+    def __init__(self, timeout=5.0):
+        #how long a waiting caller waits before running the call itself
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    #returns (result, shared), shared is True for callers that reused another caller's result
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = Call()
+                self.calls[key] = call
+                self.executed += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call.done.set()
+
+        if not call.done.wait(self.timeout):
+            #the shared call is stuck, do not hold this request hostage to it
+            with self.lock:
+                self.timeouts += 1
+            return fn(), False
+        with self.lock:
+            self.shared += 1
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def stats(self):
+        with self.lock:
+            in_flight = len(self.calls)
+        return {"executed": self.executed, "shared": self.shared, "timeouts": self.timeouts, "in_flight": in_flight}
+
+
+#SingleFlight for the asyncio runtime, fn is a coroutine function and waiters await the first caller's future
+#everything runs on the event loop thread so the table needs no lock
+class AsyncSingleFlight:
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self.calls = {}
+        self.executed = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    async def do(self, key, fn):
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.calls[key] = future
+            self.executed += 1
+            try:
+                result = await fn()
+                future.set_result(result)
+                return result, False
+            except asyncio.CancelledError:
+                #the client went away, waiters run the call themselves
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                #nobody may be waiting, keep asyncio from reporting the error as never retrieved
+                future.exception()
+                raise
+            finally:
+                del self.calls[key]
+
+        try:
+            #shield so that a waiter timing out does not cancel the shared call
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return await fn(), False
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            return await fn(), False
+        self.shared += 1
+        return result, True
+
+    def stats(self):
+        return {"executed": self.executed, "shared": self.shared, "timeouts": self.timeouts, "in_flight": len(self.calls)}
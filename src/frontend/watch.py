@@ -0,0 +1,44 @@
+import threading
+import time
+import grpc
+import catalog.catalog_pb2 as catalog_pb2
+
+
+#keeps a WatchCatalog stream open and hands every pushed batch to apply_updates(updates, snapshot)
+#a broken stream is reopened with backoff, the catalog starts every new stream with a full snapshot
+class CatalogWatcher:
+    def __init__(self, channels, apply_updates, subscriber, min_backoff=0.2, max_backoff=2.0):
+        self.channels = channels
+        self.apply_updates = apply_updates
+        self.subscriber = subscriber
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.updates = 0
+        self.resyncs = 0
+        self.thread = threading.Thread(target=self.run, name="catalog-watch", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        backoff = self.min_backoff
+        while True:
+            try:
+                watch_req = catalog_pb2.WatchRequest(subscriber=self.subscriber)
+                for message in self.channels.catalog_stub().WatchCatalog(watch_req):
+                    if message.snapshot:
+                        self.resyncs += 1
+                        print(f"(Frontend): Catalog snapshot of {len(message.updates)} stocks received")
+                    self.apply_updates(message.updates, message.snapshot)
+                    self.updates += len(message.updates)
+                    self.connected = True
+                    backoff = self.min_backoff
+                print("(Frontend): Catalog watch stream closed by the catalog")
+            except grpc.RpcError as e:
+                print(f"(Frontend): Catalog watch stream failed: {e.code()}, resubscribing in {backoff:.1f}s")
+                if e.code() == grpc.StatusCode.UNAVAILABLE:
+                    self.channels.reset_catalog()
+            self.connected = False
+            time.sleep(backoff)
+            backoff = min(self.max_backoff, backoff * 2)
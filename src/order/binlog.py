@@ -0,0 +1,172 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+from order.order_store import OrderStore, HEADER, parse_row, encode_rows
+
+
+MAGIC = b"ORDLOG\x00\x01"
+
+#every record is a 2 byte length followed by a fixed layout part and the stock name:
+#length (bytes after the prefix), transaction number, volume, type code, name length, then the utf-8 name
+RECORD = struct.Struct("<HqiBB")
+#byte offset of the transaction number inside a record, read on its own when only the number is needed
+TXN = struct.Struct("<q")
+TXN_OFFSET = 2
+
+TYPES = ("buy", "sell")
+TYPE_CODES = {trade_type: code for code, trade_type in enumerate(TYPES)}
+
+
+def encode_record(txn, name, trade_type, volume):
+    name_bytes = name.encode("utf-8")
+    return RECORD.pack(RECORD.size - 2 + len(name_bytes), txn, volume, TYPE_CODES[trade_type], len(name_bytes)) + name_bytes
+
+
+#order log in length prefixed binary records (order_log_N.bin) with the same offset index as the csv log
+#reads decode straight out of a memory map of the file, no line splitting or csv parsing
+class BinaryOrderStore(OrderStore):
+    EXTENSION = ".bin"
+    HEADER = MAGIC
+
+    def __init__(self, path, cache_size=10000, base_txn=0):
+        self.map = None
+        self.map_lock = threading.Lock()
+        #stock names decoded once, records of the same stock share the str
+        self.names = {}
+        super().__init__(path, cache_size, base_txn)
+
+    #order_log_N.bin.idx, so a csv and a binary log of the same replica never share an index
+    def companion_path(self, suffix):
+        return self.csv_path + suffix
+
+    def close(self):
+        with self.map_lock:
+            self.map = None
+        super().close()
+
+    #memory map covering at least end bytes, remapped as the file grows
+    #a replaced map stays valid for the readers still holding it and is released with its last reference
+    def mapped(self, end):
+        current = self.map
+        if current is not None and len(current) >= end:
+            return current
+        with self.map_lock:
+            if self.map is None or len(self.map) < end:
+                size = os.fstat(self.csv_fd).st_size
+                if size < end:
+                    return None
+                self.map = mmap.mmap(self.csv_fd, size, access=mmap.ACCESS_READ)
+            return self.map
+
+    def encode(self, order_logs):
+        return [(num, encode_record(num, data["Name"], data["Type"], data["VolumeTraded"])) for num, data in order_logs.items()]
+
+    def decode(self, view, offset):
+        length, txn, volume, type_code, name_length = RECORD.unpack_from(view, offset)
+        start = offset + RECORD.size
+        name_bytes = view[start:start + name_length]
+        name = self.names.get(name_bytes)
+        if name is None:
+            name = self.names.setdefault(name_bytes, name_bytes.decode("utf-8"))
+        return (txn, name, TYPES[type_code], volume), length + 2
+
+    def read_row(self, offset):
+        view = self.mapped(offset + RECORD.size)
+        if view is None:
+            return None
+        length = struct.unpack_from("<H", view, offset)[0]
+        if len(view) < offset + length + 2:
+            view = self.mapped(offset + length + 2)
+            if view is None:
+                return None
+        return self.decode(view, offset)
+
+    def rows_at(self, offsets):
+        view = self.mapped(max(offsets) + RECORD.size)
+        for offset in offsets:
+            row = self.decode(view, offset) if view is not None and offset + RECORD.size <= len(view) else self.read_row(offset)
+            if row is not None:
+                yield row[0]
+
+    #index the records after offset, only the transaction number of each one is decoded
+    #a record cut short by a crash is truncated so the next append starts on a record boundary
+    def index_tail(self, offset):
+        indexed = 0
+        size = self.size
+        view = self.mapped(size) if size > len(self.HEADER) else None
+        offset = max(offset, len(self.HEADER))
+        #consecutive transaction numbers share one index write
+        run_start, run_slots = None, []
+        while offset + 2 <= size:
+            length = struct.unpack_from("<H", view, offset)[0]
+            if offset + 2 + length > size:
+                break
+            txn = TXN.unpack_from(view, offset + TXN_OFFSET)[0]
+            if run_slots and txn != run_start + len(run_slots):
+                self.write_slots(run_start, run_slots)
+                run_slots = []
+            if not run_slots:
+                run_start = txn
+            run_slots.append(offset)
+            offset += 2 + length
+            indexed += 1
+        if run_slots:
+            self.write_slots(run_start, run_slots)
+        if offset < size:
+            print(f"Truncating {size - offset} bytes of a torn record at the end of {self.csv_path}")
+            os.ftruncate(self.csv_fd, offset)
+            self.size = offset
+        print(f"Indexed {indexed} order log records from {self.csv_path}")
+
+
+#(txn, name, type, volume) for every record of a binary order log, in file order
+def iter_binary(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if view[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a binary order log")
+            offset = len(MAGIC)
+            while offset + RECORD.size <= len(view):
+                length, txn, volume, type_code, name_length = RECORD.unpack_from(view, offset)
+                if offset + 2 + length > len(view):
+                    break
+                start = offset + RECORD.size
+                yield txn, view[start:start + name_length].decode("utf-8"), TYPES[type_code], volume
+                offset += 2 + length
+
+
+def binary_to_csv(bin_path, csv_path):
+    count = 0
+    with open(csv_path, "wb") as out:
+        out.write(HEADER)
+        for txn, name, trade_type, volume in iter_binary(bin_path):
+            out.write(encode_rows({txn: {"Name": name, "Type": trade_type, "VolumeTraded": volume}})[0][1])
+            count += 1
+    return count
+
+
+def csv_to_binary(csv_path, bin_path):
+    count = 0
+    with open(csv_path, "rb") as f, open(bin_path, "wb") as out:
+        out.write(MAGIC)
+        for line in f:
+            #header and blank lines
+            if not line[:1].isdigit():
+                continue
+            out.write(encode_record(*parse_row(line)))
+            count += 1
+    return count
+
+
+#python -m order.binlog to-csv order/order_log_1.bin order/order_log_1.csv
+#python -m order.binlog to-binary order/order_log_1.csv order/order_log_1.bin
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-csv", "to-binary"):
+        print("usage: python -m order.binlog to-csv|to-binary <source> <destination>")
+        sys.exit(1)
+    convert = binary_to_csv if sys.argv[1] == "to-csv" else csv_to_binary
+    print(f"Converted {convert(sys.argv[2], sys.argv[3])} orders from {sys.argv[2]} to {sys.argv[3]}")
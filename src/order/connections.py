@@ -0,0 +1,122 @@
+import threading
+import time
+import grpc
+import catalog.catalog_pb2_grpc as catalog_pb2_grpc
+import order.order_pb2_grpc as order_pb2_grpc
+
+
+#options for the long lived channels from an order replica to the catalog and its peers
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    #a restarted peer should be reachable again within a couple of seconds
+    ("grpc.initial_reconnect_backoff_ms", 200),
+    ("grpc.min_reconnect_backoff_ms", 200),
+    ("grpc.max_reconnect_backoff_ms", 2000),
+]
+
+#do not redial the same peer more often than this after failures
+RECONNECT_INTERVAL = 1.0
+
+
+#one persistent channel to a peer together with its health
+class PeerConnection:
+    def __init__(self, name, target, stub_class):
+        self.name = name
+        self.target = target
+        self.stub_class = stub_class
+        self.lock = threading.Lock()
+        self.healthy = False
+        self.state = None
+        self.failures = 0
+        self.last_success = None
+        self.last_reconnect = 0.0
+        self._connect()
+
+    def _connect(self):
+        channel = grpc.insecure_channel(self.target, options=CHANNEL_OPTIONS)
+
+        #connectivity callbacks arrive on a grpc thread, ignore the ones from a replaced channel
+        def on_state_change(state):
+            with self.lock:
+                if channel is not self.channel:
+                    return
+                self.state = state
+                if state == grpc.ChannelConnectivity.READY:
+                    self.healthy = True
+                elif state in (grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN):
+                    self.healthy = False
+
+        with self.lock:
+            old_channel, old_callback = getattr(self, "channel", None), getattr(self, "on_state_change", None)
+            self.channel = channel
+            self.on_state_change = on_state_change
+            self.stub = self.stub_class(channel)
+        channel.subscribe(on_state_change, try_to_connect=True)
+        #stop polling the replaced channel so it can be collected once its in-flight calls are done
+        if old_channel is not None:
+            old_channel.unsubscribe(old_callback)
+
+    def report_success(self):
+        with self.lock:
+            self.healthy = True
+            self.failures = 0
+            self.last_success = time.time()
+
+    #mark the peer down and redial if the channel itself looks broken
+    #calls still in flight on the old channel hold their own reference to it and finish normally
+    def report_failure(self, error):
+        reconnect = False
+        with self.lock:
+            self.healthy = False
+            self.failures += 1
+            now = time.time()
+            if isinstance(error, grpc.RpcError) and error.code() == grpc.StatusCode.UNAVAILABLE \
+                    and now - self.last_reconnect >= RECONNECT_INTERVAL:
+                self.last_reconnect = now
+                reconnect = True
+        if reconnect:
+            print(f"Reconnecting to {self.name} at {self.target} after {self.failures} failure(s)")
+            self._connect()
+
+
+#persistent connections from an order replica to the catalog and every other replica, built once at startup
+class ConnectionRegistry:
+    def __init__(self, catalog_target, replicas):
+        self.catalog = PeerConnection("catalog", catalog_target, catalog_pb2_grpc.CatalogServiceStub)
+        #replicas = [(rid, host, port)] of the other order replicas
+        self.peers = {
+            rid: PeerConnection(f"replica {rid}", f"{host}:{port}", order_pb2_grpc.OrderServiceStub)
+            for (rid, host, port) in replicas
+        }
+
+    #"catalog" or a replica id
+    def _connection(self, name):
+        return self.catalog if name == "catalog" else self.peers[name]
+
+    def catalog_stub(self):
+        return self.catalog.stub
+
+    def peer_stub(self, rid):
+        return self.peers[rid].stub
+
+    def peer_ids(self):
+        return list(self.peers.keys())
+
+    def is_healthy(self, name):
+        return self._connection(name).healthy
+
+    def report_success(self, name):
+        self._connection(name).report_success()
+
+    def report_failure(self, name, error):
+        self._connection(name).report_failure(error)
+
+    #snapshot used for logging {name: (healthy, consecutive failures)}
+    def health(self):
+        status = {"catalog": (self.catalog.healthy, self.catalog.failures)}
+        for rid, peer in self.peers.items():
+            status[rid] = (peer.healthy, peer.failures)
+        return status
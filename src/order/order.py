@@ -1,30 +1,62 @@
-import csv 
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn
 from concurrent import futures
 import threading
 import order.order_pb2 as order_pb2
 import order.order_pb2_grpc as order_pb2_grpc
+from google.protobuf.empty_pb2 import Empty
 import grpc
 import catalog.catalog_pb2 as catalog_pb2
-import catalog.catalog_pb2_grpc as catalog_pb2_grpc
 from readerwriterlock import rwlock
 import time
 import os 
 from dotenv import load_dotenv
+from order.connections import ConnectionRegistry
+from order.replication import Replicator
+from order.order_store import OrderStore
+from order.segments import SegmentedOrderStore
+from order.binlog import BinaryOrderStore, csv_to_binary
+from order.wal import GroupCommitLog, replay_wal
 
 
 
 class OrderServicer(order_pb2_grpc.OrderServiceServicer):
-    def __init__(self, replicas, transaction_num):
+    def __init__(self, replicas, transaction_num, connections, replicator, store, wal=None):
         #use fair lock so don't starve readers and writers, don't priortize anyone 
         self.lock  = rwlock.RWLockFair()
         self.read_lock = self.lock.gen_rlock()
         self.write_lock = self.lock.gen_wlock()
+        #orders not yet written to disk, the store holds everything already flushed
         self.order_logs = {}
+        #buffer swapped out by the flusher and being written to the store, still readable until it is on disk
+        self.flushing = {}
+        #entries pulled by a catch-up and being appended to the store, readable the same way until they are on disk
+        self.syncing = {}
+        #when the oldest order in order_logs was buffered, None while it is empty
+        self.buffered_since = None
+        #(orders, seconds) of the last flush and the worst values seen so far, served by FlushStats
+        self.last_flush = (0, 0.0)
+        self.max_flush_duration = 0.0
+        self.max_flush_backlog = 0
+        self.max_flush_age = 0.0
+        self.flushes = 0
+        self.slow_flushes = 0
+        self.store = store
+        #write-ahead log, when set orders are acknowledged only once they are durable in it
+        self.wal = wal
         self.leader_id = None
         self.transaction_num = transaction_num
+        #highest transaction number up to which this replica holds every entry, and the entries received above it
+        #starts from the watermark persisted with the order log
+        self.contiguous_txn = store.watermark
+        self.out_of_order_txns = set()
+        #set while a catch-up from the other replicas is running
+        self.catching_up = False
         self.replicas = replicas
+        #persistent channels to the catalog and the other replicas
+        self.connections = connections
+        #parallel fan-out of committed trades to the followers
+        self.replicator = replicator
 
     
     def Order(self, request, context):
@@ -36,58 +68,131 @@ class OrderServicer(order_pb2_grpc.OrderServiceServicer):
         tradeName=request.name
         no_of_items= request.number_of_items
 
-        # if stock name is wrong
-        if tradeName not in ["GameStart", "RottenFishCo", "BoarCo", "MenhirCo","AAPL","AMZN","GOOGL","META","NVDA","NFLX"]:
-            return order_pb2.OrderResponse(code = 404, message = "invalid stock name")
-
-
-        #if type is not buy/sell 
-        if tradeType not in ["buy", "sell"]:
-            return order_pb2.OrderResponse(code = 404, message = "invalid transaction type")
-
-        #if quantity is negative
-        if no_of_items < 0:
-            return order_pb2.OrderResponse(code = 404, message = "num stocks traded should be non negative")
+        error = validate_order(request)
+        if error is not None:
+            return order_pb2.OrderResponse(code = 404, message = error)
         
         #send increment/decrement request to catalog
-        with grpc.insecure_channel(f'{CATALOG_HOST}:{CATALOG_PORT}') as channel:
-            stub = catalog_pb2_grpc.CatalogServiceStub(channel)
-            trade_req = catalog_pb2.TradeRequest(name = tradeName,number_of_items=no_of_items, type=tradeType)
-            trade_reply = stub.Trade(trade_req)
+        trade_req = catalog_pb2.TradeRequest(name = tradeName,number_of_items=no_of_items, type=tradeType)
+        try:
+            trade_reply = self.connections.catalog_stub().Trade(trade_req)
+            self.connections.report_success("catalog")
+        except grpc.RpcError as e:
+            self.connections.report_failure("catalog", e)
+            raise
 
         if trade_reply.code == 200:
             with self.write_lock:
                 self.transaction_num += 1
                 trade_res = order_pb2.OrderResponse(code = 200, transaction_num=self.transaction_num)
-                self.order_logs[self.transaction_num] = {
+                self.buffer_order(self.transaction_num, {
                     "Name": tradeName, 
                     "Type": tradeType, 
                     "VolumeTraded": no_of_items
-                }
+                })
                 # keep a local thread copy of transaction number in this thread so that self.transaction number if changes does not inconsistent trade updates to replicas
                 transaction_num = self.transaction_num
-            
-            #update other replicas about this trade 
-            for (rid,host,port) in self.replicas:
-                with grpc.insecure_channel(f'{host}:{port}') as channel:
-                    stub = order_pb2_grpc.OrderServiceStub(channel)
-                    replicate_req = order_pb2.ReplicateOrderRequest(transaction_num = transaction_num, name = tradeName, number_of_items = no_of_items, type = tradeType, leader_id = SERVICE_ID)
-                    try:
-                        replicate_reply = stub.ReplicateOrder(replicate_req, timeout=2)
-                    except grpc.RpcError as e:
-                        print(f"[WARN] Failed to replicate to {rid}: {e}")
+                self.advance_watermark(transaction_num)
+                #update other replicas about this trade, queued under the lock so followers see the same order as the leader
+                pending = self.replicator.replicate((transaction_num, tradeName, tradeType, no_of_items))
+                #logged in transaction order too, the fsync is shared with the other orders arriving meanwhile
+                durable = self.wal.append({transaction_num: self.order_logs[transaction_num]}) if self.wal else None
+
+            #the client only learns the transaction number once the order survives a crash
+            error = durable.wait() if durable is not None else None
+            if error is not None:
+                print(f"[ERROR] Transaction {transaction_num} is not durable: {error}")
+                return order_pb2.OrderResponse(code = 500, message = error)
+
+            #all followers are sent to in parallel, only wait for as many acks as the policy asks for
+            if not pending.wait(self.replicator.timeout):
+                print(f"[WARN] Transaction {transaction_num} not acknowledged by {self.replicator.ack_policy} of followers, lag {self.replicator.lag()}")
         else:
             trade_res = order_pb2.OrderResponse(code = 404, message="not enough stocks left to buy")
 
         # print(trade_res)
         return trade_res
     
+    #several orders in one call: one TradeBatch to the catalog, one write lock acquisition for a contiguous block of
+    #transaction numbers, and one replicated unit, with a result per order in request order
+    def OrderBatch(self, request, context):
+        print(f"[{threading.current_thread().name}] is running")
+        print(f"(Order {SERVICE_ID}): Batch of {len(request.orders)} Trade Requests Received")
+
+        results = [None] * len(request.orders)
+        valid = []
+        for i, order in enumerate(request.orders):
+            error = validate_order(order)
+            if error is not None:
+                results[i] = order_pb2.OrderResponse(code = 404, message = error)
+            else:
+                valid.append(i)
+
+        trade_replies = []
+        if valid:
+            trade_batch_req = catalog_pb2.TradeBatchRequest(trades = [
+                catalog_pb2.TradeRequest(name = request.orders[i].name, number_of_items = request.orders[i].number_of_items, type = request.orders[i].type)
+                for i in valid
+            ])
+            try:
+                trade_replies = self.connections.catalog_stub().TradeBatch(trade_batch_req).results
+                self.connections.report_success("catalog")
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                    self.connections.report_failure("catalog", e)
+                    raise
+                #older catalog, one Trade per order
+                trade_replies = [self.connections.catalog_stub().Trade(trade_req) for trade_req in trade_batch_req.trades]
+
+        accepted = []
+        for i, trade_reply in zip(valid, trade_replies):
+            if trade_reply.code == 200:
+                accepted.append(i)
+            else:
+                results[i] = order_pb2.OrderResponse(code = 404, message="not enough stocks left to buy")
+
+        if accepted:
+            with self.write_lock:
+                entries = []
+                block = {}
+                for i in accepted:
+                    order = request.orders[i]
+                    self.transaction_num += 1
+                    self.buffer_order(self.transaction_num, {
+                        "Name": order.name,
+                        "Type": order.type,
+                        "VolumeTraded": order.number_of_items
+                    })
+                    block[self.transaction_num] = self.order_logs[self.transaction_num]
+                    self.advance_watermark(self.transaction_num)
+                    entries.append((self.transaction_num, order.name, order.type, order.number_of_items))
+                    results[i] = order_pb2.OrderResponse(code = 200, transaction_num=self.transaction_num)
+                #the block goes to every follower in one ReplicateBatch and into the write-ahead log in one append
+                pending = self.replicator.replicate_block(entries)
+                durable = self.wal.append(block) if self.wal else None
+
+            error = durable.wait() if durable is not None else None
+            if error is not None:
+                print(f"[ERROR] Transactions {entries[0][0]}..{entries[-1][0]} are not durable: {error}")
+                for i in accepted:
+                    results[i] = order_pb2.OrderResponse(code = 500, message = error)
+                return order_pb2.OrderBatchResponse(results = results)
+
+            if not pending.wait(self.replicator.timeout):
+                print(f"[WARN] Transactions {entries[0][0]}..{entries[-1][0]} not acknowledged by {self.replicator.ack_policy} of followers, lag {self.replicator.lag()}")
+
+        return order_pb2.OrderBatchResponse(results = results)
+
     def GetOrderDetails(self, request, context):
 
         print(f"(Order {SERVICE_ID}): Get Order Details Request receieved")
         transaction_num=request.transaction_num
         with self.read_lock:
-            order_details = self.order_logs.get(transaction_num)
+            order_details = self.order_logs.get(transaction_num) or self.flushing.get(transaction_num) or self.syncing.get(transaction_num)
+
+        #older orders were flushed to disk, found through the offset index
+        if order_details is None:
+            order_details = self.store.get(transaction_num)
 
         if order_details:
             return order_pb2.GetOrderDetailsResponse(
@@ -106,7 +211,9 @@ class OrderServicer(order_pb2_grpc.OrderServiceServicer):
     def Heartbeat(self, request, context):
         
         print(f"(Order {SERVICE_ID}): Checking heartbeat of order service id {SERVICE_ID}")
-        return order_pb2.HeartbeatResponse(code=200)
+        with self.read_lock:
+            transaction_num = self.transaction_num
+        return order_pb2.HeartbeatResponse(code=200, transaction_num=transaction_num)
     
     def NotifyReplica(self, request, context):
         #if this order service got this request then this is not a leader
@@ -120,156 +227,346 @@ class OrderServicer(order_pb2_grpc.OrderServiceServicer):
         # write the items to file in disk 
         print(f"(Order {SERVICE_ID}): Received request to replicate order from the leader with id {request.leader_id}")
         with self.write_lock:
-            self.order_logs[request.transaction_num] = {
-                "Name": request.name,
-                "Type": request.type,
-                "VolumeTraded": request.number_of_items  # matches proto field name
-            }
-
-            self.transaction_num = max(self.transaction_num, request.transaction_num)
-            #replica should follow the leader rather than setting its own transaction num
-            #self.transaction_num = request.transaction_num is wrong because if older transactions come and later this is the leader it will add numbers 
-            # self.transaction_num += 1
+            durable = self.apply_replicated(request.transaction_num, request.name, request.type, request.number_of_items)
 
+        #acknowledge to the leader only once the entry is durable here
+        error = durable.wait() if durable is not None else None
+        if error is not None:
+            return order_pb2.ReplicateOrderResponse(code=500)
         return order_pb2.ReplicateOrderResponse(code=200)
-    
-    def SyncUp(self, request, context):
-
-        print(f"(Order {SERVICE_ID}): Syncup Request received from {request.service_id}")
-
-        #find all entries after request.transaction_num
-        replica_transaction_num = request.transaction_num
-        filepath = f"order/order_log_{SERVICE_ID}.csv"
-
-        #BEGIN AI CODE: ChatGPT 4o. Prompt: Return all order log entries with transaction number greater than a given value via gRPC.
-
-        missing_logs = []
 
+    def ReplicateBatch(self, request, context):
+        # batch of consecutive log entries from the leader, applied under a single lock acquisition
+        print(f"(Order {SERVICE_ID}): Received batch of {len(request.orders)} orders to replicate from the leader with id {request.leader_id}")
+        durable = None
+        with self.write_lock:
+            for order in request.orders:
+                self.apply_replicated(order.transaction_num, order.name, order.type, order.volume_traded, log=False)
+            last_transaction_num = self.contiguous_txn
+            if self.wal:
+                durable = self.wal.append({order.transaction_num: self.order_logs[order.transaction_num] for order in request.orders
+                                           if order.transaction_num in self.order_logs})
+
+        error = durable.wait() if durable is not None else None
+        if error is not None:
+            return order_pb2.ReplicateBatchResponse(code=500)
+
+        return order_pb2.ReplicateBatchResponse(code=200, last_transaction_num=last_transaction_num)
+
+    # caller holds the write lock, returns the write-ahead log event to wait on (None without a log)
+    def apply_replicated(self, transaction_num, name, trade_type, volume, log=True):
+        #a retried batch or a catch-up overlap can resend an entry that was already flushed, writing it again
+        #would add a second row to the order log that the offset index does not point to
+        if transaction_num in self.flushing or transaction_num in self.syncing or transaction_num in self.store:
+            self.transaction_num = max(self.transaction_num, transaction_num)
+            self.advance_watermark(transaction_num)
+            return None
+        self.buffer_order(transaction_num, {
+            "Name": name,
+            "Type": trade_type,
+            "VolumeTraded": volume  # matches proto field name
+        })
+        durable = self.wal.append({transaction_num: self.order_logs[transaction_num]}) if self.wal and log else None
+
+        self.transaction_num = max(self.transaction_num, transaction_num)
+        #replica should follow the leader rather than setting its own transaction num
+        #self.transaction_num = request.transaction_num is wrong because if older transactions come and later this is the leader it will add numbers 
+        # self.transaction_num += 1
+        self.advance_watermark(transaction_num)
+        #a hole below this entry means trades were missed (e.g. while this replica was down), fill it in the background
+        if self.out_of_order_txns and not self.catching_up:
+            self.catching_up = True
+            threading.Thread(target=self.run_catch_up, daemon=True).start()
+        return durable
+
+    # caller holds the write lock
+    def buffer_order(self, transaction_num, details):
+        if not self.order_logs:
+            self.buffered_since = time.time()
+        self.order_logs[transaction_num] = details
+
+    #write the buffered orders to the order log without holding the servicer lock during the I/O
+    #only the swap to an empty buffer happens under the lock, trades and lookups continue meanwhile
+    def flush_order_logs(self):
+        with self.write_lock:
+            if not self.order_logs:
+                return
+            #backlog and age of the oldest order when the flush starts
+            backlog = len(self.order_logs)
+            age = time.time() - self.buffered_since
+            self.flushing = self.order_logs
+            self.order_logs = {}
+            self.buffered_since = None
+            #orders logged from now on go to a new write-ahead log file, the swapped out ones stay in the rotated file
+            #only the rotation point is queued here, the committer thread switches files
+            rotated = self.wal.rotate() if self.wal else None
+
+        start = time.perf_counter()
+        #replicated entries can arrive out of order, the log is kept in transaction order
+        self.store.append({txn_id: self.flushing[txn_id] for txn_id in sorted(self.flushing)})
+        #the old write-ahead log file can go once its orders are synced to the order log
+        if self.wal:
+            self.store.sync()
+            if rotated.wait() is None:
+                self.wal.drop_rotated()
+        duration = time.perf_counter() - start
+
+        #the orders are in the store now, lookups find them through the index
+        with self.write_lock:
+            flushed = len(self.flushing)
+            self.flushing = {}
+        self.last_flush = (flushed, duration)
+        self.max_flush_duration = max(self.max_flush_duration, duration)
+        self.max_flush_backlog = max(self.max_flush_backlog, backlog)
+        self.max_flush_age = max(self.max_flush_age, age)
+        self.flushes += 1
+        #only flushes that fall behind are logged, the rest are counted
+        if duration * 1000 > FLUSH_WARN_MS or backlog > FLUSH_WARN_BACKLOG or age > 2 * FLUSH_INTERVAL:
+            self.slow_flushes += 1
+            pending, oldest = self.flush_lag()
+            print(f"[WARN] {flushed} orders written to CSV in {duration * 1000:.1f}ms, oldest waited {age:.3f}s, {pending} orders still buffered, oldest for {oldest:.3f}s")
+
+    #(orders not yet in the order log, seconds the oldest of them has been waiting)
+    def flush_lag(self):
         with self.read_lock:
-            with open(filepath, newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    txn_id = int(row["TransactionNumber"])
-                    if txn_id > replica_transaction_num:
-                        log_entry = order_pb2.OrderDetails(
-                            transaction_num=txn_id,
-                            name=row["Name"],
-                            type=row["Type"],
-                            volume_traded=int(row["VolumeTraded"])
-                        )
-                        missing_logs.append(log_entry)
-
+            pending = len(self.order_logs) + len(self.flushing) + len(self.syncing)
+            age = time.time() - self.buffered_since if self.buffered_since else 0.0
+        return pending, age
+
+    # caller holds the write lock
+    def advance_watermark(self, transaction_num):
+        if transaction_num <= self.contiguous_txn:
+            return
+        self.out_of_order_txns.add(transaction_num)
+        #entries above the watermark may also already be on disk
+        while self.contiguous_txn + 1 in self.out_of_order_txns or self.contiguous_txn + 1 in self.store:
+            self.contiguous_txn += 1
+            self.out_of_order_txns.discard(self.contiguous_txn)
+
+    #recovery after a restart: pull only the missing range, from the most up to date peer, until this replica reaches the leader's tip
+    def sync_with_replica(self):
+        with self.write_lock:
+            if self.catching_up:
+                return
+            self.catching_up = True
+        self.run_catch_up()
+
+    def run_catch_up(self):
+        try:
+            while True:
+                rid, peer_tip = self.most_up_to_date_peer()
+                if rid is None:
+                    print(f"Sync Up of {SERVICE_ID} failed as no replicas are responding")
+                    return
+
+                with self.read_lock:
+                    watermark = self.contiguous_txn
+                if watermark >= peer_tip:
+                    print(f"(Order {SERVICE_ID}): Syncup Done, up to date at transaction {watermark}")
+                    return
+
+                print(f"(Order {SERVICE_ID}): Catching up transactions {watermark + 1}..{peer_tip} from replica {rid}")
+                syncup_req = order_pb2.SyncUpRequest(transaction_num = watermark, service_id = SERVICE_ID)
+                applied = 0
+                try:
+                    for chunk in self.connections.peer_stub(rid).SyncUpStream(syncup_req, timeout=SYNCUP_TIMEOUT):
+                        applied += self.apply_synced(chunk.orders)
+                    self.connections.report_success(rid)
+                except grpc.RpcError as e:
+                    self.connections.report_failure(rid, e)
+                    print(f"[WARN] Failed to syncup from {rid} due to {e}")
+
+                with self.read_lock:
+                    progressed = self.contiguous_txn > watermark
+                print(f"(Order {SERVICE_ID}): Syncup wrote {applied} orders to disk, watermark now {self.contiguous_txn}")
+                #the peer did not have the missing entries either, nothing more to pull
+                if not progressed:
+                    print(f"(Order {SERVICE_ID}): Syncup made no progress past transaction {watermark}")
+                    return
+        finally:
+            with self.write_lock:
+                self.catching_up = False
 
-        print("received last transaction num", request.transaction_num)
-        # print(missing_logs)
-        return order_pb2.SyncUpResponse(orders=missing_logs)
+    #(rid, latest transaction number) of the responding peer that is furthest ahead
+    def most_up_to_date_peer(self):
+        best_rid, best_tip = None, -1
+        for rid in self.connections.peer_ids():
+            try:
+                reply = self.connections.peer_stub(rid).Heartbeat(Empty(), timeout=1)
+                self.connections.report_success(rid)
+            except grpc.RpcError as e:
+                self.connections.report_failure(rid, e)
+                continue
+            if reply.transaction_num > best_tip:
+                best_rid, best_tip = rid, reply.transaction_num
+        return best_rid, best_tip
+
+    #write synced entries that are neither on disk nor waiting to be flushed, then fold them into the in-memory state
+    #like the flusher the lock only covers handing the entries to self.syncing, the append runs outside it
+    def apply_synced(self, orders):
+        with self.write_lock:
+            new_orders = {}
+            for order in sorted(orders, key=lambda x: x.transaction_num):
+                if order.transaction_num not in self.order_logs and order.transaction_num not in self.flushing \
+                        and order.transaction_num not in self.syncing and order.transaction_num not in self.store:
+                    new_orders[order.transaction_num] = {
+                        'Name': order.name,
+                        'Type': order.type,
+                        'VolumeTraded': order.volume_traded
+                    }
+            self.syncing.update(new_orders)
+            for order in orders:
+                self.transaction_num = max(self.transaction_num, order.transaction_num)
+                self.advance_watermark(order.transaction_num)
+
+        try:
+            self.store.append(new_orders)
+        finally:
+            with self.write_lock:
+                for txn_id in new_orders:
+                    del self.syncing[txn_id]
+        return len(new_orders)
     
-        #END AI CODE: ChatGPT 4o. Prompt: Return all order log entries with transaction number greater than a given value via gRPC.
-
-
-        
-
+    #entries after transaction_num: flushed ones straight from the store by index, then the ones still in memory
+    #no servicer lock is held while reading the disk so trades and flushes keep going during a long catch-up
+    def missing_orders(self, transaction_num):
+        with self.read_lock:
+            disk_tip = self.store.last_transaction_num
 
-#BEGIN AI CODE: ChatGPT 4o. Prompt: Read the last transaction number from a CSV file, defaulting to 0 if the file is missing or empty.
+        last_sent = transaction_num
+        for txn_id, name, trade_type, volume in self.store.iter_range(transaction_num, disk_tip):
+            last_sent = max(last_sent, txn_id)
+            yield order_pb2.OrderDetails(transaction_num=txn_id, name=name, type=trade_type, volume_traded=volume)
 
-def read_from_disk(filepath):
+        with self.read_lock:
+            #an entry can be both in the swapped out buffer and already in the store, it is sent once
+            buffered = {**self.syncing, **self.flushing, **self.order_logs}
+            flushed_tip = self.store.last_transaction_num
+        #a flush that finished during the scan moved entries out of the buffers into the store
+        if flushed_tip > disk_tip:
+            for txn_id, name, trade_type, volume in self.store.iter_range(last_sent, flushed_tip):
+                buffered.setdefault(txn_id, {"Name": name, "Type": trade_type, "VolumeTraded": volume})
+        unflushed = sorted((txn_id, details) for txn_id, details in buffered.items() if txn_id > last_sent)
+        for txn_id, details in unflushed:
+            yield order_pb2.OrderDetails(transaction_num=txn_id, name=details["Name"], type=details["Type"], volume_traded=details["VolumeTraded"])
 
+    def SyncUp(self, request, context):
 
-    transaction_num = 0
-    with open(filepath, newline='') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-        if len(rows) == 0:
-            return 0
-        last_row = rows[-1]
-        print(last_row)
-        return int(last_row["TransactionNumber"])
-    
-    return transaction_num
+        print(f"(Order {SERVICE_ID}): Syncup Request received from {request.service_id}")
 
-#END AI CODE: ChatGPT 4o. Prompt: Read the last transaction number from a CSV file, defaulting to 0 if the file is missing or empty.
+        #find all entries after request.transaction_num
+        missing_logs = list(self.missing_orders(request.transaction_num))
 
+        print("received last transaction num", request.transaction_num)
+        return order_pb2.SyncUpResponse(orders=missing_logs)
 
-def write_to_disk(lock, filepath, order_logs):
+    #same entries as SyncUp sent as a stream of chunks, so large gaps are not limited by the grpc message size
+    #grpc only pulls the next chunk once the previous one was sent, the optional delay throttles the transfer further
+    def SyncUpStream(self, request, context):
+
+        print(f"(Order {SERVICE_ID}): Streaming syncup request received from {request.service_id} after {request.transaction_num}")
+
+        chunk = []
+        sent = 0
+        for log_entry in self.missing_orders(request.transaction_num):
+            chunk.append(log_entry)
+            if len(chunk) >= SYNCUP_CHUNK_SIZE:
+                yield order_pb2.SyncUpResponse(orders=chunk)
+                sent += len(chunk)
+                chunk = []
+                if not context.is_active():
+                    return
+                if SYNCUP_CHUNK_DELAY:
+                    time.sleep(SYNCUP_CHUNK_DELAY)
+        if chunk:
+            yield order_pb2.SyncUpResponse(orders=chunk)
+            sent += len(chunk)
+
+        print(f"(Order {SERVICE_ID}): Streamed {sent} orders to {request.service_id}")
+
+    def FlushStats(self, request, context):
+        pending, age = self.flush_lag()
+        orders, duration = self.last_flush
+        return order_pb2.FlushStatsResponse(flushes=self.flushes, last_flush_orders=orders, last_flush_ms=duration * 1000,
+                                            max_flush_ms=self.max_flush_duration * 1000, backlog=pending, oldest_age_ms=age * 1000,
+                                            max_backlog=self.max_flush_backlog, max_oldest_age_ms=self.max_flush_age * 1000,
+                                            slow_flushes=self.slow_flushes)
+
+
+#error message for an order that cannot be placed, None if it can be sent to the catalog
+def validate_order(request):
+    # if stock name is wrong
+    if request.name not in ["GameStart", "RottenFishCo", "BoarCo", "MenhirCo","AAPL","AMZN","GOOGL","META","NVDA","NFLX"]:
+        return "invalid stock name"
+
+    #if type is not buy/sell 
+    if request.type not in ["buy", "sell"]:
+        return "invalid transaction type"
+
+    #if quantity is negative
+    if request.number_of_items < 0:
+        return "num stocks traded should be non negative"
+    return None
+
+
+#last transaction number in the log, found by reading backwards from the end of the file
+#so startup cost does not depend on how many orders the log holds, 0 if the file is missing or empty
+def read_from_disk(filepath, block_size=4096):
+
+    try:
+        f = open(filepath, 'rb')
+    except FileNotFoundError:
+        return 0
+
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            lines = tail.splitlines()
+            #the first line may be cut in the middle unless the start of the file was reached
+            if position > 0:
+                lines = lines[1:]
+            for line in reversed(lines):
+                #skip the header and blank lines
+                if line[:1].isdigit():
+                    return int(line.split(b",", 1)[0])
+    return 0
+
+
+#time spent in each startup phase, printed once the server is serving
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        total = self.last - self.start
+        phases = ", ".join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in self.phases)
+        print(f"(Order {SERVICE_ID}): Startup took {total * 1000:.1f}ms: {phases}")
+
+
+def write_to_disk(servicer, interval=2):
 
     while True:
         #sleep for 2 mins
-        time.sleep(2)
+        time.sleep(interval)
         #only write to disk if order_logs is not empty
-        with lock.gen_wlock():
-            if order_logs:
-                #prevent writing to order_logs when writing to disk
-                with open(filepath, mode='a', newline='') as csvfile:
-                    fieldnames = ['TransactionNumber', 'Name', 'Type', 'VolumeTraded']
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    for num, data in order_logs.items():
-                        writer.writerow({
-                            'TransactionNumber': num,
-                            'Name': data['Name'],
-                            'Type': data['Type'],
-                            'VolumeTraded': data['VolumeTraded']
-                        })
-
-                print(f"[{threading.current_thread().name}] order written to CSV.")
-                #clear order_logs so that same entries are not rewritten next time
-                order_logs.clear()
-
-def sync_with_replica(lock, replicas, latest_transaction_num):
-
-    sync_done = False
-
-    for (rid, host, port) in replicas:
-
-        with grpc.insecure_channel(f'{host}:{port}') as channel:
-            stub = order_pb2_grpc.OrderServiceStub(channel)
-            syncup_req = order_pb2.SyncUpRequest(transaction_num = latest_transaction_num, service_id = SERVICE_ID)
-            try:
-                syncup_reply = stub.SyncUp(syncup_req, timeout=2)
-                # print("reply", syncup_reply.orders)
-                sync_done = True
-            except grpc.RpcError as e:
-                print(f"[WARN] Failed to syncup from {rid} due to {e}")
+        servicer.flush_order_logs()
 
-    
-    if not sync_done:
-        print(f"Sync Up of {SERVICE_ID} failed as no replicas are responding")
-    else:
-        #suppose the last transaction_num is 38 but before sync up new request come and are logged to the file 
-        #but while writing it checks if current transaction > last_transaction due to this entries get rewritten so need to filter entries 
-        existing_txns = set()
-        filepath = f"order/order_log_{SERVICE_ID}.csv"
-
-        with lock.gen_wlock():
-            #not the same as class order logs so no need to acquire lock
-            with open(filepath, newline='') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    existing_txns.add(int(row["TransactionNumber"]))
-
-            new_orders = []
-
-            for order in syncup_reply.orders:
-                if order.transaction_num not in existing_txns:
-                    new_orders.append(order)
-            
-            if new_orders:
-                with open(filepath, mode='a', newline='') as csvfile:
-                    fieldnames = ['TransactionNumber', 'Name', 'Type', 'VolumeTraded']
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    for order in sorted(new_orders, key=lambda x: x.transaction_num):
-                        writer.writerow({
-                            'TransactionNumber': order.transaction_num,
-                            'Name': order.name,
-                            'Type': order.type,
-                            'VolumeTraded': order.volume_traded
-                        })
-
-                print(f"(Order {SERVICE_ID}): Syncup Done and completed writing changes to disk")
-            else:
-                print(f"(Order {SERVICE_ID}): In Syncup No new entries to write")
 
 if __name__ == "__main__":
 
+    startup = StartupTimer()
     load_dotenv()
     PORT = int(os.getenv("ORDER_PORT", 8093))
     SERVICE_ID = int(os.getenv("ORDER_ID"))
@@ -284,30 +581,92 @@ if __name__ == "__main__":
             replicas.append((rid, host, port))
 
     print(f"Replicas of (Order {SERVICE_ID}): are {replicas}")
+    startup.mark("config")
+
+    #order log with its offset index, serves GetOrderDetails for orders already flushed to disk
+    #opening it reads the index size and the last indexed row, plus any rows written after them
+    STORE_CACHE_SIZE = int(os.getenv("ORDER_STORE_CACHE_SIZE", 10000))
+    #csv | binary, binary keeps length prefixed records in order_log_N.bin (python -m order.binlog converts to csv)
+    LOG_FORMAT = os.getenv("ORDER_LOG_FORMAT", "csv")
+    store_class = BinaryOrderStore if LOG_FORMAT == "binary" else OrderStore
+    #with ORDER_LOG_SEGMENT_SIZE > 0 the log is split into segments of that many transactions under order/order_log_N/
+    SEGMENT_SIZE = int(os.getenv("ORDER_LOG_SEGMENT_SIZE", 0))
+    if SEGMENT_SIZE > 0:
+        COMPRESS_SEGMENTS = os.getenv("ORDER_LOG_COMPRESS_SEGMENTS", "0") == "1"
+        store = SegmentedOrderStore(f"order/order_log_{SERVICE_ID}", SEGMENT_SIZE, STORE_CACHE_SIZE, COMPRESS_SEGMENTS,
+                                    legacy_csv=f"order/order_log_{SERVICE_ID}.csv", store_class=store_class)
+    else:
+        log_path = f"order/order_log_{SERVICE_ID}{store_class.EXTENSION}"
+        #switching an existing replica to the binary format starts from its csv log
+        if store_class is BinaryOrderStore and not os.path.exists(log_path) and os.path.exists(f"order/order_log_{SERVICE_ID}.csv"):
+            print(f"(Order {SERVICE_ID}): Converted {csv_to_binary(f'order/order_log_{SERVICE_ID}.csv', log_path)} orders to {log_path}")
+        store = store_class(log_path, STORE_CACHE_SIZE)
+    startup.mark("open order store")
+
+    #with ORDER_WAL=1 orders are acknowledged only after a group commit fsync of the write-ahead log
+    WAL_ENABLED = os.getenv("ORDER_WAL", "0") == "1"
+    WAL_PATH = f"order/order_log_{SERVICE_ID}.wal"
+    if WAL_ENABLED:
+        replayed = replay_wal(WAL_PATH, store)
+        print(f"(Order {SERVICE_ID}): Replayed {replayed} orders from the write-ahead log")
+        WAL_MAX_BATCH = int(os.getenv("ORDER_WAL_MAX_BATCH", 256))
+        WAL_MAX_DELAY = float(os.getenv("ORDER_WAL_MAX_DELAY_MS", 1)) / 1000
+        #seconds an order waits for its commit before it is answered with code 500
+        WAL_TIMEOUT = float(os.getenv("ORDER_WAL_TIMEOUT", 5))
+        wal = GroupCommitLog(WAL_PATH, WAL_MAX_BATCH, WAL_MAX_DELAY, WAL_TIMEOUT)
+    else:
+        wal = None
+    startup.mark("replay write-ahead log")
 
-
-    #read latest transaction number from file
-    transaction_num = read_from_disk(filepath = f"./order/order_log_{SERVICE_ID}.csv")
+    #read latest transaction number from the tail of the file, the index covers rows synced in out of order
+    transaction_num = max(read_from_disk(filepath = f"./order/order_log_{SERVICE_ID}.csv"), store.last_transaction_num)
     print(f"(Order {SERVICE_ID}): This is the starting transaction num: {transaction_num}")
+    startup.mark("read last transaction")
     CATALOG_HOST = os.getenv("CATALOG_HOST", "localhost")
     CATALOG_PORT = int(os.getenv("CATALOG_PORT", 8092))
     # print(transaction_num)
-    servicer = OrderServicer(replicas, transaction_num)
-
-    write_to_disk_thread = threading.Thread(target=write_to_disk, args=(servicer.lock,f"order/order_log_{SERVICE_ID}.csv", servicer.order_logs))
+    #open the channels to the catalog and the other replicas once, they are reused by every request
+    connections = ConnectionRegistry(f"{CATALOG_HOST}:{CATALOG_PORT}", replicas)
+    #async | one | majority | all
+    REPLICATION_ACK = os.getenv("ORDER_REPLICATION_ACK", "majority")
+    REPLICATION_TIMEOUT = float(os.getenv("ORDER_REPLICATION_TIMEOUT", 2))
+    #entries per ReplicateBatch call (1 = one ReplicateOrder per trade) and how long a batch may wait to fill
+    REPLICATION_BATCH_SIZE = int(os.getenv("ORDER_REPLICATION_BATCH_SIZE", 64))
+    REPLICATION_BATCH_DELAY = float(os.getenv("ORDER_REPLICATION_BATCH_DELAY_MS", 0)) / 1000
+    replicator = Replicator(connections, SERVICE_ID, REPLICATION_ACK, REPLICATION_TIMEOUT, REPLICATION_BATCH_SIZE, REPLICATION_BATCH_DELAY)
+    servicer = OrderServicer(replicas, transaction_num, connections, replicator, store, wal)
+    startup.mark("connections and servicer")
+
+    #orders per SyncUpStream message, pause between messages and the deadline for a whole catch-up stream
+    SYNCUP_CHUNK_SIZE = int(os.getenv("ORDER_SYNCUP_CHUNK_SIZE", 500))
+    SYNCUP_CHUNK_DELAY = float(os.getenv("ORDER_SYNCUP_CHUNK_DELAY_MS", 0)) / 1000
+    SYNCUP_TIMEOUT = float(os.getenv("ORDER_SYNCUP_TIMEOUT", 300))
+
+    #seconds between flushes of the buffered orders to the order log
+    FLUSH_INTERVAL = float(os.getenv("ORDER_FLUSH_INTERVAL", 2))
+    #a flush is logged when it takes longer than this, starts with more buffered orders, or its oldest order waited over two intervals
+    FLUSH_WARN_MS = float(os.getenv("ORDER_FLUSH_WARN_MS", 500))
+    FLUSH_WARN_BACKLOG = int(os.getenv("ORDER_FLUSH_WARN_BACKLOG", 10000))
+    write_to_disk_thread = threading.Thread(target=write_to_disk, args=(servicer, FLUSH_INTERVAL))
     # run a separate thread in background to log the current state of catalog to disk
     write_to_disk_thread.start()
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=3))
+    #accept the keepalive pings clients send on their long lived channels
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=3), options=[
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.min_recv_ping_interval_without_data_ms", 20000),
+    ])
     order_pb2_grpc.add_OrderServiceServicer_to_server(servicer, server)
     server.add_insecure_port(f'[::]:{PORT}')
     server.start()
+    startup.mark("bind grpc server")
     print(f"(Order {SERVICE_ID}): Started")
+    startup.report()
     time.sleep(3)  # delay before syncing with replicas
 
     #do sync up after order server has started start a thread to do sync up if needed in case this replica came back from crash 
     print("Starting syncup")
-    syncup_thread = threading.Thread(target=sync_with_replica, args = (servicer.lock, replicas, transaction_num))
+    syncup_thread = threading.Thread(target=servicer.sync_with_replica)
     syncup_thread.start()
     server.wait_for_termination()
 
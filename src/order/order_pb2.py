@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0border.proto\x1a\x1bgoogle/protobuf/empty.proto\"C\n\x0cOrderRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x17\n\x0fnumber_of_items\x18\x02 \x01(\x05\x12\x0c\n\x04type\x18\x03 \x01(\t\"G\n\rOrderResponse\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x0c\n\x04\x63ode\x18\x02 \x01(\x05\x12\x0f\n\x07message\x18\x03 \x01(\t\"1\n\x16GetOrderDetailsRequest\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\"\x84\x01\n\x17GetOrderDetailsResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x17\n\x0ftransaction_num\x18\x03 \x01(\x05\x12\x0c\n\x04name\x18\x04 \x01(\t\x12\x15\n\rvolume_traded\x18\x05 \x01(\x05\x12\x0c\n\x04type\x18\x06 \x01(\t\"!\n\x11HeartbeatResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\")\n\x14NotifyReplicaRequest\x12\x11\n\tleader_id\x18\x01 \x01(\x05\"%\n\x15NotifyReplicaResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\"x\n\x15ReplicateOrderRequest\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x17\n\x0fnumber_of_items\x18\x03 \x01(\x05\x12\x0c\n\x04type\x18\x04 \x01(\t\x12\x11\n\tleader_id\x18\x05 \x01(\x05\"&\n\x16ReplicateOrderResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\"<\n\rSyncUpRequest\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x12\n\nservice_id\x18\x02 \x01(\x05\"Z\n\x0cOrderDetails\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0c\n\x04type\x18\x03 \x01(\t\x12\x15\n\rvolume_traded\x18\x04 \x01(\x05\"/\n\x0eSyncUpResponse\x12\x1d\n\x06orders\x18\x01 \x03(\x0b\x32\r.OrderDetails2\xe3\x02\n\x0cOrderService\x12&\n\x05Order\x12\r.OrderRequest\x1a\x0e.OrderResponse\x12\x44\n\x0fGetOrderDetails\x12\x17.GetOrderDetailsRequest\x1a\x18.GetOrderDetailsResponse\x12\x37\n\tHeartbeat\x12\x16.google.protobuf.Empty\x1a\x12.HeartbeatResponse\x12>\n\rNotifyReplica\x12\x15.NotifyReplicaRequest\x1a\x16.NotifyReplicaResponse\x12\x41\n\x0eReplicateOrder\x12\x16.ReplicateOrderRequest\x1a\x17.ReplicateOrderResponse\x12)\n\x06SyncUp\x12\x0e.SyncUpRequest\x1a\x0f.SyncUpResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0border.proto\x1a\x1bgoogle/protobuf/empty.proto\"C\n\x0cOrderRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x17\n\x0fnumber_of_items\x18\x02 \x01(\x05\x12\x0c\n\x04type\x18\x03 \x01(\t\"G\n\rOrderResponse\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x0c\n\x04\x63ode\x18\x02 \x01(\x05\x12\x0f\n\x07message\x18\x03 \x01(\t\"2\n\x11OrderBatchRequest\x12\x1d\n\x06orders\x18\x01 \x03(\x0b\x32\r.OrderRequest\"5\n\x12OrderBatchResponse\x12\x1f\n\x07results\x18\x01 \x03(\x0b\x32\x0e.OrderResponse\"1\n\x16GetOrderDetailsRequest\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\"\x84\x01\n\x17GetOrderDetailsResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x17\n\x0ftransaction_num\x18\x03 \x01(\x05\x12\x0c\n\x04name\x18\x04 \x01(\t\x12\x15\n\rvolume_traded\x18\x05 \x01(\x05\x12\x0c\n\x04type\x18\x06 \x01(\t\":\n\x11HeartbeatResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x17\n\x0ftransaction_num\x18\x02 \x01(\x05\")\n\x14NotifyReplicaRequest\x12\x11\n\tleader_id\x18\x01 \x01(\x05\"%\n\x15NotifyReplicaResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\"x\n\x15ReplicateOrderRequest\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x17\n\x0fnumber_of_items\x18\x03 \x01(\x05\x12\x0c\n\x04type\x18\x04 \x01(\t\x12\x11\n\tleader_id\x18\x05 \x01(\x05\"&\n\x16ReplicateOrderResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\"I\n\x15ReplicateBatchRequest\x12\x1d\n\x06orders\x18\x01 \x03(\x0b\x32\r.OrderDetails\x12\x11\n\tleader_id\x18\x02 \x01(\x05\"D\n\x16ReplicateBatchResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x1c\n\x14last_transaction_num\x18\x02 \x01(\x05\"<\n\rSyncUpRequest\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x12\n\nservice_id\x18\x02 \x01(\x05\"Z\n\x0cOrderDetails\x12\x17\n\x0ftransaction_num\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0c\n\x04type\x18\x03 \x01(\t\x12\x15\n\rvolume_traded\x18\x04 \x01(\x05\"/\n\x0eSyncUpResponse\x12\x1d\n\x06orders\x18\x01 \x03(\x0b\x32\r.OrderDetails\"\xdb\x01\n\x12\x46lushStatsResponse\x12\x0f\n\x07\x66lushes\x18\x01 \x01(\x05\x12\x19\n\x11last_flush_orders\x18\x02 \x01(\x05\x12\x15\n\rlast_flush_ms\x18\x03 \x01(\x01\x12\x14\n\x0cmax_flush_ms\x18\x04 \x01(\x01\x12\x0f\n\x07\x62\x61\x63klog\x18\x05 \x01(\x05\x12\x15\n\roldest_age_ms\x18\x06 \x01(\x01\x12\x13\n\x0bmax_backlog\x18\x07 \x01(\x05\x12\x19\n\x11max_oldest_age_ms\x18\x08 \x01(\x01\x12\x14\n\x0cslow_flushes\x18\t \x01(\x05\x32\xcb\x04\n\x0cOrderService\x12&\n\x05Order\x12\r.OrderRequest\x1a\x0e.OrderResponse\x12\x35\n\nOrderBatch\x12\x12.OrderBatchRequest\x1a\x13.OrderBatchResponse\x12\x44\n\x0fGetOrderDetails\x12\x17.GetOrderDetailsRequest\x1a\x18.GetOrderDetailsResponse\x12\x37\n\tHeartbeat\x12\x16.google.protobuf.Empty\x1a\x12.HeartbeatResponse\x12>\n\rNotifyReplica\x12\x15.NotifyReplicaRequest\x1a\x16.NotifyReplicaResponse\x12\x41\n\x0eReplicateOrder\x12\x16.ReplicateOrderRequest\x1a\x17.ReplicateOrderResponse\x12\x41\n\x0eReplicateBatch\x12\x16.ReplicateBatchRequest\x1a\x17.ReplicateBatchResponse\x12)\n\x06SyncUp\x12\x0e.SyncUpRequest\x1a\x0f.SyncUpResponse\x12\x31\n\x0cSyncUpStream\x12\x0e.SyncUpRequest\x1a\x0f.SyncUpResponse0\x01\x12\x39\n\nFlushStats\x12\x16.google.protobuf.Empty\x1a\x13.FlushStatsResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -36,26 +36,36 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_ORDERREQUEST']._serialized_end=111
   _globals['_ORDERRESPONSE']._serialized_start=113
   _globals['_ORDERRESPONSE']._serialized_end=184
-  _globals['_GETORDERDETAILSREQUEST']._serialized_start=186
-  _globals['_GETORDERDETAILSREQUEST']._serialized_end=235
-  _globals['_GETORDERDETAILSRESPONSE']._serialized_start=238
-  _globals['_GETORDERDETAILSRESPONSE']._serialized_end=370
-  _globals['_HEARTBEATRESPONSE']._serialized_start=372
-  _globals['_HEARTBEATRESPONSE']._serialized_end=405
-  _globals['_NOTIFYREPLICAREQUEST']._serialized_start=407
-  _globals['_NOTIFYREPLICAREQUEST']._serialized_end=448
-  _globals['_NOTIFYREPLICARESPONSE']._serialized_start=450
-  _globals['_NOTIFYREPLICARESPONSE']._serialized_end=487
-  _globals['_REPLICATEORDERREQUEST']._serialized_start=489
-  _globals['_REPLICATEORDERREQUEST']._serialized_end=609
-  _globals['_REPLICATEORDERRESPONSE']._serialized_start=611
-  _globals['_REPLICATEORDERRESPONSE']._serialized_end=649
-  _globals['_SYNCUPREQUEST']._serialized_start=651
-  _globals['_SYNCUPREQUEST']._serialized_end=711
-  _globals['_ORDERDETAILS']._serialized_start=713
-  _globals['_ORDERDETAILS']._serialized_end=803
-  _globals['_SYNCUPRESPONSE']._serialized_start=805
-  _globals['_SYNCUPRESPONSE']._serialized_end=852
-  _globals['_ORDERSERVICE']._serialized_start=855
-  _globals['_ORDERSERVICE']._serialized_end=1210
+  _globals['_ORDERBATCHREQUEST']._serialized_start=186
+  _globals['_ORDERBATCHREQUEST']._serialized_end=236
+  _globals['_ORDERBATCHRESPONSE']._serialized_start=238
+  _globals['_ORDERBATCHRESPONSE']._serialized_end=291
+  _globals['_GETORDERDETAILSREQUEST']._serialized_start=293
+  _globals['_GETORDERDETAILSREQUEST']._serialized_end=342
+  _globals['_GETORDERDETAILSRESPONSE']._serialized_start=345
+  _globals['_GETORDERDETAILSRESPONSE']._serialized_end=477
+  _globals['_HEARTBEATRESPONSE']._serialized_start=479
+  _globals['_HEARTBEATRESPONSE']._serialized_end=537
+  _globals['_NOTIFYREPLICAREQUEST']._serialized_start=539
+  _globals['_NOTIFYREPLICAREQUEST']._serialized_end=580
+  _globals['_NOTIFYREPLICARESPONSE']._serialized_start=582
+  _globals['_NOTIFYREPLICARESPONSE']._serialized_end=619
+  _globals['_REPLICATEORDERREQUEST']._serialized_start=621
+  _globals['_REPLICATEORDERREQUEST']._serialized_end=741
+  _globals['_REPLICATEORDERRESPONSE']._serialized_start=743
+  _globals['_REPLICATEORDERRESPONSE']._serialized_end=781
+  _globals['_REPLICATEBATCHREQUEST']._serialized_start=783
+  _globals['_REPLICATEBATCHREQUEST']._serialized_end=856
+  _globals['_REPLICATEBATCHRESPONSE']._serialized_start=858
+  _globals['_REPLICATEBATCHRESPONSE']._serialized_end=926
+  _globals['_SYNCUPREQUEST']._serialized_start=928
+  _globals['_SYNCUPREQUEST']._serialized_end=988
+  _globals['_ORDERDETAILS']._serialized_start=990
+  _globals['_ORDERDETAILS']._serialized_end=1080
+  _globals['_SYNCUPRESPONSE']._serialized_start=1082
+  _globals['_SYNCUPRESPONSE']._serialized_end=1129
+  _globals['_FLUSHSTATSRESPONSE']._serialized_start=1132
+  _globals['_FLUSHSTATSRESPONSE']._serialized_end=1351
+  _globals['_ORDERSERVICE']._serialized_start=1354
+  _globals['_ORDERSERVICE']._serialized_end=1941
 # @@protoc_insertion_point(module_scope)
@@ -40,6 +40,11 @@ class OrderServiceStub(object):
                 request_serializer=order__pb2.OrderRequest.SerializeToString,
                 response_deserializer=order__pb2.OrderResponse.FromString,
                 _registered_method=True)
+        self.OrderBatch = channel.unary_unary(
+                '/OrderService/OrderBatch',
+                request_serializer=order__pb2.OrderBatchRequest.SerializeToString,
+                response_deserializer=order__pb2.OrderBatchResponse.FromString,
+                _registered_method=True)
         self.GetOrderDetails = channel.unary_unary(
                 '/OrderService/GetOrderDetails',
                 request_serializer=order__pb2.GetOrderDetailsRequest.SerializeToString,
@@ -60,11 +65,26 @@ class OrderServiceStub(object):
                 request_serializer=order__pb2.ReplicateOrderRequest.SerializeToString,
                 response_deserializer=order__pb2.ReplicateOrderResponse.FromString,
                 _registered_method=True)
+        self.ReplicateBatch = channel.unary_unary(
+                '/OrderService/ReplicateBatch',
+                request_serializer=order__pb2.ReplicateBatchRequest.SerializeToString,
+                response_deserializer=order__pb2.ReplicateBatchResponse.FromString,
+                _registered_method=True)
         self.SyncUp = channel.unary_unary(
                 '/OrderService/SyncUp',
                 request_serializer=order__pb2.SyncUpRequest.SerializeToString,
                 response_deserializer=order__pb2.SyncUpResponse.FromString,
                 _registered_method=True)
+        self.SyncUpStream = channel.unary_stream(
+                '/OrderService/SyncUpStream',
+                request_serializer=order__pb2.SyncUpRequest.SerializeToString,
+                response_deserializer=order__pb2.SyncUpResponse.FromString,
+                _registered_method=True)
+        self.FlushStats = channel.unary_unary(
+                '/OrderService/FlushStats',
+                request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+                response_deserializer=order__pb2.FlushStatsResponse.FromString,
+                _registered_method=True)
 
 
 class OrderServiceServicer(object):
@@ -76,6 +96,12 @@ class OrderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def OrderBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetOrderDetails(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -100,12 +126,30 @@ class OrderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ReplicateBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SyncUp(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SyncUpStream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FlushStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_OrderServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -114,6 +158,11 @@ def add_OrderServiceServicer_to_server(servicer, server):
                     request_deserializer=order__pb2.OrderRequest.FromString,
                     response_serializer=order__pb2.OrderResponse.SerializeToString,
             ),
+            'OrderBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.OrderBatch,
+                    request_deserializer=order__pb2.OrderBatchRequest.FromString,
+                    response_serializer=order__pb2.OrderBatchResponse.SerializeToString,
+            ),
             'GetOrderDetails': grpc.unary_unary_rpc_method_handler(
                     servicer.GetOrderDetails,
                     request_deserializer=order__pb2.GetOrderDetailsRequest.FromString,
@@ -134,11 +183,26 @@ def add_OrderServiceServicer_to_server(servicer, server):
                     request_deserializer=order__pb2.ReplicateOrderRequest.FromString,
                     response_serializer=order__pb2.ReplicateOrderResponse.SerializeToString,
             ),
+            'ReplicateBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReplicateBatch,
+                    request_deserializer=order__pb2.ReplicateBatchRequest.FromString,
+                    response_serializer=order__pb2.ReplicateBatchResponse.SerializeToString,
+            ),
             'SyncUp': grpc.unary_unary_rpc_method_handler(
                     servicer.SyncUp,
                     request_deserializer=order__pb2.SyncUpRequest.FromString,
                     response_serializer=order__pb2.SyncUpResponse.SerializeToString,
             ),
+            'SyncUpStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.SyncUpStream,
+                    request_deserializer=order__pb2.SyncUpRequest.FromString,
+                    response_serializer=order__pb2.SyncUpResponse.SerializeToString,
+            ),
+            'FlushStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.FlushStats,
+                    request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+                    response_serializer=order__pb2.FlushStatsResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'OrderService', rpc_method_handlers)
@@ -177,6 +241,33 @@ class OrderService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def OrderBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/OrderService/OrderBatch',
+            order__pb2.OrderBatchRequest.SerializeToString,
+            order__pb2.OrderBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetOrderDetails(request,
             target,
@@ -285,6 +376,33 @@ class OrderService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ReplicateBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/OrderService/ReplicateBatch',
+            order__pb2.ReplicateBatchRequest.SerializeToString,
+            order__pb2.ReplicateBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def SyncUp(request,
             target,
@@ -311,3 +429,57 @@ class OrderService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def SyncUpStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/OrderService/SyncUpStream',
+            order__pb2.SyncUpRequest.SerializeToString,
+            order__pb2.SyncUpResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def FlushStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/OrderService/FlushStats',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            order__pb2.FlushStatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
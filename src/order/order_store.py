@@ -0,0 +1,281 @@
+import csv
+import io
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+
+FIELDNAMES = ['TransactionNumber', 'Name', 'Type', 'VolumeTraded']
+HEADER = (",".join(FIELDNAMES) + "\r\n").encode("utf-8")
+
+#index slot of transaction t is the 8 byte file offset of its csv row, stored at position (t-base_txn-1)*8
+#missing transactions read back as 0 (never a valid row offset because the header comes first)
+SLOT = struct.Struct("<q")
+
+#bytes read per record lookup, rows are far shorter so one read is enough in practice
+READ_SIZE = 256
+
+#index slots fetched per read when scanning a range of transactions
+SCAN_SLOTS = 4096
+#largest csv span read in one go while scanning, rows further apart are read one by one
+SCAN_SPAN = 4 * 1024 * 1024
+
+
+def parse_row(line):
+    #only quoted fields need the csv module, plain rows are split directly
+    if b'"' in line:
+        txn, name, trade_type, volume = next(csv.reader([line.decode("utf-8")]))
+    else:
+        txn, name, trade_type, volume = line.rstrip(b"\r\n").decode("utf-8").split(",")
+    return int(txn), name, trade_type, int(volume)
+
+
+#csv rows for {txn: {"Name", "Type", "VolumeTraded"}} as [(txn, row bytes)]
+def encode_rows(order_logs):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = []
+    for num, data in order_logs.items():
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([num, data['Name'], data['Type'], data['VolumeTraded']])
+        rows.append((num, buffer.getvalue().encode("utf-8")))
+    return rows
+
+
+#order log csv plus a direct addressed offset index (order_log_N.idx)
+#lookups of any transaction cost one index read and at most one csv read, hot records are kept in an LRU
+#base_txn is the transaction number before the first one the file can hold (0 for a whole log, the start of a segment's range otherwise)
+#subclasses store the rows in another record format by overriding HEADER, encode, read_row, rows_at and index_tail
+class OrderStore:
+    EXTENSION = ".csv"
+    HEADER = HEADER
+
+    def __init__(self, csv_path, cache_size=10000, base_txn=0):
+        self.csv_path = csv_path
+        self.base_txn = base_txn
+        self.index_path = self.companion_path(".idx")
+        #persisted high watermark: every transaction up to it is on disk
+        self.watermark_path = self.companion_path(".hwm")
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        #serializes appends, readers use pread and never take it
+        self.lock = threading.Lock()
+
+        self.csv_fd = os.open(csv_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self.index_fd = os.open(self.index_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.size = os.fstat(self.csv_fd).st_size
+        if self.size == 0:
+            os.write(self.csv_fd, self.HEADER)
+            self.size = len(self.HEADER)
+        self.last_transaction_num = base_txn + os.fstat(self.index_fd).st_size // SLOT.size
+        rebuilt = self.recover_index()
+
+        self.watermark_fd = os.open(self.watermark_path, os.O_RDWR | os.O_CREAT, 0o644)
+        data = os.pread(self.watermark_fd, SLOT.size, 0)
+        self.watermark = max(base_txn, min(SLOT.unpack(data)[0], self.last_transaction_num)) if len(data) == SLOT.size and not rebuilt else base_txn
+        self.advance_watermark()
+
+    #index and watermark files next to the log, order_log_N.idx for order_log_N.csv
+    def companion_path(self, suffix):
+        return os.path.splitext(self.csv_path)[0] + suffix
+
+    def close(self):
+        os.close(self.csv_fd)
+        os.close(self.index_fd)
+        os.close(self.watermark_fd)
+
+    #force appended rows and their index slots to stable storage
+    def sync(self):
+        with self.lock:
+            os.fsync(self.csv_fd)
+            os.fsync(self.index_fd)
+
+    #move the watermark over the transactions now present after it, only the slots past it are read
+    def advance_watermark(self):
+        watermark = self.watermark
+        while watermark < self.last_transaction_num:
+            count = min(SCAN_SLOTS, self.last_transaction_num - watermark)
+            data = os.pread(self.index_fd, count * SLOT.size, self.slot_position(watermark + 1))
+            present = 0
+            for (offset,) in SLOT.iter_unpack(data[:len(data) - len(data) % SLOT.size]):
+                if offset == 0:
+                    break
+                present += 1
+            watermark += present
+            if present < count:
+                break
+        if watermark != self.watermark:
+            self.watermark = watermark
+            #written after the index slots so it never claims a transaction that is not on disk
+            os.pwrite(self.watermark_fd, SLOT.pack(watermark), 0)
+
+    #make the index agree with the csv: index rows appended after the last indexed one (crash between the two writes)
+    #and rebuild from scratch if the index does not match the csv at all (missing index, replaced csv)
+    def recover_index(self):
+        rebuilt = False
+        scan_from = 0
+        if self.last_transaction_num > self.base_txn:
+            offset = self.offset_of(self.last_transaction_num)
+            row = self.read_row(offset) if 0 < offset < self.size else None
+            if row is not None and row[0][0] == self.last_transaction_num:
+                scan_from = offset + row[1]
+            else:
+                print(f"Order index {self.index_path} does not match {self.csv_path}, rebuilding")
+                os.ftruncate(self.index_fd, 0)
+                self.last_transaction_num = self.base_txn
+                rebuilt = True
+        if scan_from < self.size:
+            self.index_tail(scan_from)
+        return rebuilt
+
+    def index_tail(self, offset):
+        indexed = 0
+        with open(self.csv_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                #header and blank lines
+                if not line[:1].isdigit():
+                    offset += len(line)
+                    continue
+                txn = parse_row(line)[0]
+                self.write_slot(txn, offset)
+                offset += len(line)
+                indexed += 1
+        print(f"Indexed {indexed} order log rows from {self.csv_path}")
+
+    def slot_position(self, txn):
+        return (txn - self.base_txn - 1) * SLOT.size
+
+    def write_slot(self, txn, offset):
+        os.pwrite(self.index_fd, SLOT.pack(offset), self.slot_position(txn))
+        self.last_transaction_num = max(self.last_transaction_num, txn)
+
+    def write_slots(self, first_txn, offsets):
+        data = b"".join(SLOT.pack(offset) for offset in offsets)
+        os.pwrite(self.index_fd, data, self.slot_position(first_txn))
+        self.last_transaction_num = max(self.last_transaction_num, first_txn + len(offsets) - 1)
+
+    #csv offset of a transaction's row, 0 if it is not on disk
+    def offset_of(self, txn):
+        if txn <= self.base_txn or txn > self.last_transaction_num:
+            return 0
+        data = os.pread(self.index_fd, SLOT.size, self.slot_position(txn))
+        if len(data) < SLOT.size:
+            return 0
+        return SLOT.unpack(data)[0]
+
+    def __contains__(self, txn):
+        return self.offset_of(txn) != 0
+
+    #returns ((txn, name, type, volume), row length in bytes) or None
+    def read_row(self, offset):
+        data = os.pread(self.csv_fd, READ_SIZE, offset)
+        end = data.find(b"\n")
+        while end == -1 and len(data) == READ_SIZE:
+            more = os.pread(self.csv_fd, READ_SIZE, offset + len(data))
+            data += more
+            end = data.find(b"\n")
+            if not more:
+                break
+        if end == -1:
+            return None
+        return parse_row(data[:end + 1]), end + 1
+
+    #yields (txn, name, type, volume) for every transaction on disk in (after_txn, upto_txn], in transaction order
+    #the index takes the scan straight to after_txn + 1, slots and rows are read in blocks without any lock
+    def iter_range(self, after_txn, upto_txn):
+        txn = max(after_txn, self.base_txn) + 1
+        upto_txn = min(upto_txn, self.last_transaction_num)
+        while txn <= upto_txn:
+            count = min(SCAN_SLOTS, upto_txn - txn + 1)
+            data = os.pread(self.index_fd, count * SLOT.size, self.slot_position(txn))
+            offsets = [offset for (offset,) in SLOT.iter_unpack(data[:len(data) - len(data) % SLOT.size]) if offset]
+            txn += count
+            if offsets:
+                yield from self.rows_at(offsets)
+
+    #rows at the given offsets, nearby rows are parsed out of one block read
+    def rows_at(self, offsets):
+        low = min(offsets)
+        high = max(offsets)
+        if high - low > SCAN_SPAN:
+            for offset in offsets:
+                row = self.read_row(offset)
+                if row is not None:
+                    yield row[0]
+            return
+
+        block = os.pread(self.csv_fd, high - low + READ_SIZE, low)
+        for offset in offsets:
+            start = offset - low
+            end = block.find(b"\n", start)
+            if end == -1:
+                row = self.read_row(offset)
+                if row is not None:
+                    yield row[0]
+                continue
+            yield parse_row(block[start:end + 1])
+
+    #order details dict in the same shape as OrderServicer.order_logs, or None
+    def get(self, txn):
+        with self.cache_lock:
+            details = self.cache.get(txn)
+            if details is not None:
+                self.cache.move_to_end(txn)
+                return details
+
+        offset = self.offset_of(txn)
+        if offset == 0:
+            return None
+        row = self.read_row(offset)
+        if row is None:
+            return None
+        _, name, trade_type, volume = row[0]
+        details = {"Name": name, "Type": trade_type, "VolumeTraded": volume}
+        self.remember(txn, details)
+        return details
+
+    def remember(self, txn, details):
+        if self.cache_size <= 0:
+            return
+        with self.cache_lock:
+            self.cache[txn] = details
+            self.cache.move_to_end(txn)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    #[(txn, record bytes)] in the store's format
+    def encode(self, order_logs):
+        return encode_rows(order_logs)
+
+    #append rows {txn: {"Name", "Type", "VolumeTraded"}} to the csv and index them
+    def append(self, order_logs):
+        if not order_logs:
+            return
+        rows = self.encode(order_logs)
+        payload = b"".join(row for _, row in rows)
+
+        with self.lock:
+            offset = self.size
+            os.write(self.csv_fd, payload)
+            self.size += len(payload)
+            #index after the rows are written so a reader never sees an offset past the end of the csv
+            #consecutive transaction numbers share one index write
+            run_start, run_slots = None, []
+            for num, row in rows:
+                if run_slots and num != run_start + len(run_slots):
+                    self.write_slots(run_start, run_slots)
+                    run_slots = []
+                if not run_slots:
+                    run_start = num
+                run_slots.append(offset)
+                offset += len(row)
+            self.write_slots(run_start, run_slots)
+            self.advance_watermark()
+
+        #only the newest rows can stay in the hot record cache
+        for num, data in list(order_logs.items())[-self.cache_size:] if self.cache_size > 0 else []:
+            self.remember(num, dict(data))
@@ -0,0 +1,218 @@
+import threading
+import time
+from collections import deque
+import grpc
+import order.order_pb2 as order_pb2
+
+
+#how many follower acks a trade waits for before the leader answers the client
+#async: none, one: first follower, majority: enough followers to form a majority with the leader, all: every follower
+ACK_POLICIES = ("async", "one", "majority", "all")
+
+
+#acknowledgement state of one replicated transaction
+class PendingAck:
+    def __init__(self, transaction_num, required, followers):
+        self.transaction_num = transaction_num
+        self.required = required
+        self.followers = followers
+        self.acks = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        if required == 0:
+            self.done.set()
+
+    def ack(self):
+        with self.lock:
+            self.acks += 1
+            if self.acks >= self.required:
+                self.done.set()
+
+    #stop waiting once enough followers failed that the policy can no longer be met
+    def fail(self):
+        with self.lock:
+            self.failures += 1
+            if self.followers - self.failures < self.required:
+                self.done.set()
+
+    def wait(self, timeout):
+        self.done.wait(timeout)
+        with self.lock:
+            return self.acks >= self.required
+
+
+#sender for one follower, a single thread keeps the follower's entries in transaction order
+#the queue holds blocks of consecutive entries, each with the PendingAck of the whole block
+class FollowerLink:
+    def __init__(self, rid, replicator):
+        self.rid = rid
+        self.replicator = replicator
+        self.queue = deque()
+        #entries in all queued blocks
+        self.queued = 0
+        self.cond = threading.Condition()
+        #send with ReplicateBatch, turned off if the follower does not implement it
+        self.batching = replicator.batch_size > 1
+        #highest transaction number this follower acknowledged, with batches this is its contiguous watermark
+        self.acked_txn = 0
+        self.failures = 0
+        self.last_ack_time = None
+        self.thread = threading.Thread(target=self.run, name=f"replicate-{rid}", daemon=True)
+
+    def enqueue(self, entries, pending):
+        with self.cond:
+            self.queue.append((entries, pending))
+            self.queued += len(entries)
+            #a follower that cannot keep up drops its oldest entries, it catches up through SyncUp
+            while self.queued > self.replicator.max_backlog and len(self.queue) > 1:
+                dropped, dropped_pending = self.queue.popleft()
+                self.queued -= len(dropped)
+                dropped_pending.fail()
+            self.cond.notify()
+
+    def backlog(self):
+        with self.cond:
+            return self.queued
+
+    #take queued blocks up to batch_size entries, waiting at most batch_delay for a burst to fill the batch
+    #a block is never split, the first one is taken even when it alone is larger than batch_size
+    def next_batch(self):
+        batch_size = self.replicator.batch_size if self.batching else 1
+        with self.cond:
+            while not self.queue:
+                self.cond.wait()
+            deadline = time.time() + self.replicator.batch_delay
+            while self.queued < batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            batch = [self.queue.popleft()]
+            taken = len(batch[0][0])
+            while self.queue and taken + len(self.queue[0][0]) <= batch_size:
+                batch.append(self.queue.popleft())
+                taken += len(batch[-1][0])
+            self.queued -= taken
+            return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            if self.batching:
+                self.send_batch(batch)
+            else:
+                for entries, pending in batch:
+                    self.send_each(entries, pending)
+
+    #one ReplicateOrder per entry, the block is acknowledged once all of them are
+    def send_each(self, entries, pending):
+        for entry in entries:
+            if not self.send_one(entry):
+                pending.fail()
+                return
+        pending.ack()
+
+    def send_one(self, entry):
+        connections = self.replicator.connections
+        transaction_num, name, trade_type, volume = entry
+        replicate_req = order_pb2.ReplicateOrderRequest(transaction_num = transaction_num, name = name, number_of_items = volume, type = trade_type, leader_id = self.replicator.service_id)
+        try:
+            replicate_reply = connections.peer_stub(self.rid).ReplicateOrder(replicate_req, timeout=self.replicator.timeout)
+            connections.report_success(self.rid)
+            #the follower received the entry but could not make it durable
+            if replicate_reply.code != 200:
+                self.failures += 1
+                print(f"[WARN] Replica {self.rid} could not persist {transaction_num}, code {replicate_reply.code}")
+                return False
+            self.acked_txn = max(self.acked_txn, transaction_num)
+            self.last_ack_time = time.time()
+            return True
+        except grpc.RpcError as e:
+            connections.report_failure(self.rid, e)
+            self.failures += 1
+            print(f"[WARN] Failed to replicate {transaction_num} to {self.rid}: {e.code()}")
+            return False
+
+    def send_batch(self, batch):
+        connections = self.replicator.connections
+        orders = [
+            order_pb2.OrderDetails(transaction_num=transaction_num, name=name, type=trade_type, volume_traded=volume)
+            for entries, _ in batch for transaction_num, name, trade_type, volume in entries
+        ]
+        batch_req = order_pb2.ReplicateBatchRequest(orders=orders, leader_id=self.replicator.service_id)
+        try:
+            batch_reply = connections.peer_stub(self.rid).ReplicateBatch(batch_req, timeout=self.replicator.timeout)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                #older follower, fall back to one ReplicateOrder per transaction
+                print(f"(Order {self.replicator.service_id}): Replica {self.rid} does not support ReplicateBatch, sending orders one by one")
+                self.batching = False
+                for entries, pending in batch:
+                    self.send_each(entries, pending)
+                return
+            connections.report_failure(self.rid, e)
+            self.failures += 1
+            for _, pending in batch:
+                pending.fail()
+            print(f"[WARN] Failed to replicate {orders[0].transaction_num}..{orders[-1].transaction_num} to {self.rid}: {e.code()}")
+            return
+
+        connections.report_success(self.rid)
+        if batch_reply.code != 200:
+            self.failures += 1
+            for _, pending in batch:
+                pending.fail()
+            print(f"[WARN] Replica {self.rid} could not persist {orders[0].transaction_num}..{orders[-1].transaction_num}, code {batch_reply.code}")
+            return
+        self.acked_txn = max(self.acked_txn, batch_reply.last_transaction_num)
+        self.last_ack_time = time.time()
+        for _, pending in batch:
+            pending.ack()
+
+
+#fans every committed trade out to all followers in parallel and waits only as long as the ack policy requires
+class Replicator:
+    def __init__(self, connections, service_id, ack_policy="majority", timeout=2, batch_size=64, batch_delay=0.0, max_backlog=10000):
+        if ack_policy not in ACK_POLICIES:
+            raise ValueError(f"unknown replication ack policy {ack_policy}, expected one of {ACK_POLICIES}")
+        self.connections = connections
+        self.service_id = service_id
+        self.ack_policy = ack_policy
+        self.timeout = timeout
+        #batch_size 1 sends one ReplicateOrder per transaction
+        self.batch_size = max(1, batch_size)
+        self.batch_delay = batch_delay
+        self.max_backlog = max_backlog
+        self.tip = 0
+        self.links = {rid: FollowerLink(rid, self) for rid in connections.peer_ids()}
+        for link in self.links.values():
+            link.thread.start()
+
+    def required_acks(self):
+        followers = len(self.links)
+        if self.ack_policy == "async":
+            return 0
+        if self.ack_policy == "one":
+            return min(1, followers)
+        if self.ack_policy == "majority":
+            #the leader counts towards the majority of the followers + 1 node cluster
+            return (followers + 1) // 2
+        return followers
+
+    #queue the entry for every follower, call while holding the lock that assigned the transaction number
+    #so that each follower receives entries in the same order as the leader's log
+    def replicate(self, entry):
+        return self.replicate_block([entry])
+
+    #queue consecutive entries as one unit: each follower gets them in the same ReplicateBatch and they are acknowledged together
+    def replicate_block(self, entries):
+        pending = PendingAck(entries[-1][0], self.required_acks(), len(self.links))
+        self.tip = max(self.tip, entries[-1][0])
+        for link in self.links.values():
+            link.enqueue(entries, pending)
+        return pending
+
+    #per follower {rid: (transactions behind the leader, queued entries, failures)}
+    def lag(self):
+        return {rid: (max(0, self.tip - link.acked_txn), link.backlog(), link.failures) for rid, link in self.links.items()}
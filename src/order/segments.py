@@ -0,0 +1,404 @@
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from order.order_store import OrderStore, HEADER, SLOT, parse_row, encode_rows
+
+
+#rows imported per append when an existing single file order log is split into segments
+IMPORT_CHUNK = 10000
+#rows per gzip member of a compressed segment, a point lookup decompresses only the member holding the row
+MEMBER_ROWS = 256
+
+
+#order log split into segments of segment_size consecutive transaction numbers, kept in order/order_log_N/
+#manifest.json records every segment's transaction range and state, so a lookup opens only the segment covering it
+#states: active (may still receive rows), sealed (every transaction present, read only), compressed (sealed and gzipped)
+#each uncompressed segment is a store_class instance (csv or binary records) with its own offset index and watermark
+class SegmentedOrderStore:
+    def __init__(self, directory, segment_size, cache_size=10000, compress=False, keep_uncompressed=1, legacy_csv=None, store_class=OrderStore):
+        self.directory = directory
+        self.store_class = store_class
+        self.segment_size = segment_size
+        self.compress = compress
+        #newest sealed segments left uncompressed, a catch-up is most likely to stream from them
+        self.keep_uncompressed = keep_uncompressed
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        #guards the manifest and the open segment stores, appends hold it for their whole write
+        self.lock = threading.RLock()
+        #{segment number: OrderStore}, opened on first use
+        self.stores = {}
+        #{segment number: readers using its store}, a compressed segment's store is closed once its last reader is done
+        self.readers = {}
+        #{segment number: store} of compressed segments still being read
+        self.retired = {}
+        #{segment number: byte offsets of the gzip members of a compressed segment, plus its end}
+        self.members = {}
+        #one compression at a time, held while segments are gzipped but never while self.lock is wanted by appends and reads
+        self.compress_lock = threading.Lock()
+        #set when a segment was sealed, the compressor thread then gzips the ones due
+        self.compress_pending = threading.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        created = not os.path.exists(self.manifest_path)
+        #{segment number: {"first_txn", "last_txn", "max_txn", "file", "state"}}
+        self.segments = {} if created else self.load_manifest()
+        self.watermark = 0
+        self.last_transaction_num = 0
+        #only segments that can still change are opened, their index recovery covers a crash in the middle of an append
+        for number, entry in self.segments.items():
+            if entry["state"] == "active":
+                store = self.segment_store(number)
+                entry["max_txn"] = store.last_transaction_num if store.last_transaction_num > store.base_txn else 0
+            self.last_transaction_num = max(self.last_transaction_num, entry["max_txn"])
+        self.advance_watermark()
+
+        if created and legacy_csv and os.path.exists(legacy_csv):
+            self.import_csv(legacy_csv)
+        self.save_manifest()
+        if compress:
+            #also picks up segments sealed before a restart that were not compressed yet
+            self.compress_pending.set()
+            threading.Thread(target=self.run_compressor, name="segment-compress", daemon=True).start()
+
+    def load_manifest(self):
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["segment_size"] != self.segment_size:
+            raise ValueError(f"{self.directory} was written with segments of {manifest['segment_size']} transactions, not {self.segment_size}")
+        return {self.segment_of(entry["first_txn"]): entry for entry in manifest["segments"]}
+
+    #written to a temporary file and renamed so a crash leaves either the old or the new manifest
+    def save_manifest(self):
+        with self.lock:
+            manifest = {"segment_size": self.segment_size, "segments": [self.segments[number] for number in sorted(self.segments)]}
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.manifest_path)
+
+    def segment_of(self, txn):
+        return (txn - 1) // self.segment_size
+
+    def segment_path(self, number, suffix=None):
+        return os.path.join(self.directory, f"segment_{number * self.segment_size + 1:012d}{suffix or self.store_class.EXTENSION}")
+
+    #the segment is registered in the manifest before its files are created
+    def ensure_segment(self, number):
+        entry = self.segments.get(number)
+        if entry is None:
+            entry = {
+                "first_txn": number * self.segment_size + 1,
+                "last_txn": (number + 1) * self.segment_size,
+                "max_txn": 0,
+                "file": os.path.basename(self.segment_path(number)),
+                "state": "active",
+            }
+            self.segments[number] = entry
+            self.save_manifest()
+        return entry
+
+    def segment_store(self, number):
+        with self.lock:
+            store = self.stores.get(number)
+            if store is None:
+                #records are cached once for the whole log, not per segment
+                store = self.store_class(self.segment_path(number), cache_size=0, base_txn=number * self.segment_size)
+                self.stores[number] = store
+            return store
+
+    def close(self):
+        with self.lock:
+            for store in self.stores.values():
+                store.close()
+            self.stores.clear()
+
+    #store of an uncompressed segment, held open for the caller until release(), None if the segment is compressed
+    def acquire(self, number):
+        with self.lock:
+            if self.segments[number]["state"] == "compressed":
+                return None
+            store = self.segment_store(number)
+            self.readers[number] = self.readers.get(number, 0) + 1
+            return store
+
+    def release(self, number):
+        with self.lock:
+            self.readers[number] -= 1
+            if self.readers[number]:
+                return
+            del self.readers[number]
+            store = self.retired.pop(number, None)
+        if store is not None:
+            self.remove_store(store)
+
+    #close a store whose segment was compressed and delete its uncompressed files
+    def remove_store(self, store):
+        store.close()
+        for path in (store.csv_path, store.index_path, store.watermark_path):
+            os.remove(path)
+
+    def sync(self):
+        with self.lock:
+            numbers = [number for number, entry in self.segments.items() if entry["state"] == "active" and number in self.stores]
+        for number in numbers:
+            store = self.acquire(number)
+            if store is None:
+                continue
+            try:
+                store.sync()
+            finally:
+                self.release(number)
+
+    #move the watermark across complete segments, sealing (and compressing) each one it passes
+    def advance_watermark(self):
+        with self.lock:
+            number = self.segment_of(self.watermark + 1)
+            sealed = False
+            while number in self.segments:
+                entry = self.segments[number]
+                if entry["state"] == "active":
+                    store = self.segment_store(number)
+                    store.advance_watermark()
+                    if store.watermark < entry["last_txn"]:
+                        self.watermark = max(self.watermark, store.watermark)
+                        break
+                    self.seal(number)
+                    sealed = True
+                self.watermark = entry["last_txn"]
+                number += 1
+            if sealed:
+                self.save_manifest()
+                if self.compress:
+                    self.compress_pending.set()
+
+    # caller holds the lock
+    def seal(self, number):
+        self.segments[number]["state"] = "sealed"
+        self.stores[number].sync()
+        print(f"Sealed order log segment {self.segments[number]['file']} ({self.segments[number]['first_txn']}..{self.segments[number]['last_txn']})")
+
+    def run_compressor(self):
+        while True:
+            self.compress_pending.wait()
+            self.compress_pending.clear()
+            try:
+                self.compress_sealed()
+            except OSError as e:
+                #the segments stay sealed and readable uncompressed, the next seal retries them
+                print(f"[ERROR] Compressing order log segments in {self.directory} failed: {e}")
+
+    #gzip every sealed segment except the newest keep_uncompressed ones, runs on the compressor thread
+    #rows are read from the segment's store while appends and lookups go on, self.lock is only taken to pick
+    #the segments and to switch each one's manifest entry to the compressed file
+    def compress_sealed(self):
+        with self.compress_lock:
+            with self.lock:
+                sealed = sorted(number for number, entry in self.segments.items() if entry["state"] == "sealed")
+                due = sealed[:max(0, len(sealed) - self.keep_uncompressed)]
+            for number in due:
+                store = self.acquire(number)
+                try:
+                    self.compress_segment(number, store)
+                    with self.lock:
+                        entry = self.segments[number]
+                        entry["state"] = "compressed"
+                        entry["file"] = os.path.basename(self.segment_path(number, ".csv.gz"))
+                        #the manifest points at the compressed file before the uncompressed one goes away
+                        self.save_manifest()
+                        #readers that acquired the store before the switch keep it open, the last one removes it
+                        self.retired[number] = self.stores.pop(number)
+                finally:
+                    self.release(number)
+                print(f"Compressed order log segment {entry['file']}")
+
+    #write segment_N.csv.gz and segment_N.gz.idx from a sealed segment's store, rows in transaction order
+    #the header and every MEMBER_ROWS rows are separate gzip members, their offsets go to segment_N.gz.idx
+    def compress_segment(self, number, store):
+        first_txn, last_txn = self.segments[number]["first_txn"], self.segments[number]["last_txn"]
+        gz_path = self.segment_path(number, ".csv.gz")
+        rows = [row for _, row in encode_rows({txn: {"Name": name, "Type": trade_type, "VolumeTraded": volume}
+                                               for txn, name, trade_type, volume in store.iter_range(first_txn - 1, last_txn)})]
+        offsets = []
+        with open(gz_path + ".tmp", "wb") as f:
+            f.write(gzip.compress(HEADER, mtime=0))
+            for start in range(0, len(rows), MEMBER_ROWS):
+                offsets.append(f.tell())
+                f.write(gzip.compress(b"".join(rows[start:start + MEMBER_ROWS]), mtime=0))
+            offsets.append(f.tell())
+            f.flush()
+            os.fsync(f.fileno())
+        members_path = self.segment_path(number, ".gz.idx")
+        with open(members_path + ".tmp", "wb") as f:
+            f.write(b"".join(SLOT.pack(offset) for offset in offsets))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(members_path + ".tmp", members_path)
+        os.replace(gz_path + ".tmp", gz_path)
+        self.members[number] = offsets
+
+    #gzip member offsets of a compressed segment, None for a segment compressed as a single member
+    def member_offsets(self, number):
+        offsets = self.members.get(number)
+        if offsets is None:
+            try:
+                with open(self.segment_path(number, ".gz.idx"), "rb") as f:
+                    offsets = [offset for (offset,) in SLOT.iter_unpack(f.read())]
+            except FileNotFoundError:
+                return None
+            self.members[number] = offsets
+        return offsets
+
+    #rows of a compressed segment in transaction order, read sequentially from the member holding after_txn + 1
+    def scan_compressed(self, number, after_txn, upto_txn):
+        offsets = self.member_offsets(number)
+        start = 0
+        if offsets is not None:
+            member = max(0, after_txn + 1 - self.segments[number]["first_txn"]) // MEMBER_ROWS
+            start = offsets[min(member, len(offsets) - 1)]
+        with open(self.segment_path(number, ".csv.gz"), "rb") as raw:
+            raw.seek(start)
+            with gzip.GzipFile(fileobj=raw, mode="rb") as f:
+                for line in f:
+                    if not line[:1].isdigit():
+                        continue
+                    row = parse_row(line)
+                    if row[0] > upto_txn:
+                        return
+                    if row[0] > after_txn:
+                        yield row
+
+    #one row of a compressed segment, only the gzip member holding it is read and decompressed
+    def read_compressed(self, number, txn):
+        offsets = self.member_offsets(number)
+        if offsets is None:
+            return next(self.scan_compressed(number, txn - 1, txn), None)
+        member = (txn - self.segments[number]["first_txn"]) // MEMBER_ROWS
+        if member + 1 >= len(offsets):
+            return None
+        with open(self.segment_path(number, ".csv.gz"), "rb") as f:
+            data = os.pread(f.fileno(), offsets[member + 1] - offsets[member], offsets[member])
+        for line in gzip.decompress(data).splitlines():
+            row = parse_row(line)
+            if row[0] == txn:
+                return row
+        return None
+
+    def __contains__(self, txn):
+        entry = self.segments.get(self.segment_of(txn)) if txn >= 1 else None
+        if entry is None:
+            return False
+        #a sealed segment holds every transaction of its range
+        if entry["state"] != "active":
+            return True
+        number = self.segment_of(txn)
+        store = self.acquire(number)
+        if store is None:
+            return True
+        try:
+            return txn in store
+        finally:
+            self.release(number)
+
+    #order details dict in the same shape as OrderServicer.order_logs, or None
+    def get(self, txn):
+        with self.cache_lock:
+            details = self.cache.get(txn)
+            if details is not None:
+                self.cache.move_to_end(txn)
+                return details
+
+        number = self.segment_of(txn) if txn >= 1 else None
+        entry = self.segments.get(number)
+        if entry is None:
+            return None
+        store = self.acquire(number)
+        if store is None:
+            row = self.read_compressed(number, txn)
+        else:
+            try:
+                offset = store.offset_of(txn)
+                row = store.read_row(offset)[0] if offset else None
+            finally:
+                self.release(number)
+        if row is None:
+            return None
+        _, name, trade_type, volume = row
+        details = {"Name": name, "Type": trade_type, "VolumeTraded": volume}
+        self.remember(txn, details)
+        return details
+
+    def remember(self, txn, details):
+        if self.cache_size <= 0:
+            return
+        with self.cache_lock:
+            self.cache[txn] = details
+            self.cache.move_to_end(txn)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    #yields (txn, name, type, volume) for every transaction on disk in (after_txn, upto_txn], touching only the segments in that range
+    def iter_range(self, after_txn, upto_txn):
+        after_txn = max(after_txn, 0)
+        upto_txn = min(upto_txn, self.last_transaction_num)
+        if upto_txn <= after_txn:
+            return
+        for number in range(self.segment_of(after_txn + 1), self.segment_of(upto_txn) + 1):
+            entry = self.segments.get(number)
+            if entry is None:
+                continue
+            store = self.acquire(number)
+            if store is None:
+                yield from self.scan_compressed(number, after_txn, upto_txn)
+                continue
+            try:
+                yield from store.iter_range(max(after_txn, entry["first_txn"] - 1), min(upto_txn, entry["last_txn"]))
+            finally:
+                self.release(number)
+
+    #append rows {txn: {"Name", "Type", "VolumeTraded"}} to the segments covering them
+    def append(self, order_logs):
+        if not order_logs:
+            return
+        groups = {}
+        for num, data in order_logs.items():
+            groups.setdefault(self.segment_of(num), {})[num] = data
+
+        with self.lock:
+            for number, rows in groups.items():
+                entry = self.ensure_segment(number)
+                #a sealed segment already holds every transaction of its range
+                if entry["state"] != "active":
+                    continue
+                self.segment_store(number).append(rows)
+                entry["max_txn"] = max(entry["max_txn"], max(rows))
+                self.last_transaction_num = max(self.last_transaction_num, entry["max_txn"])
+            self.advance_watermark()
+
+        for num, data in list(order_logs.items())[-self.cache_size:] if self.cache_size > 0 else []:
+            self.remember(num, dict(data))
+
+    #split an existing order_log_N.csv into segments, the file itself is left in place
+    def import_csv(self, csv_path):
+        imported = 0
+        chunk = {}
+        with open(csv_path, "rb") as f:
+            for line in f:
+                if not line[:1].isdigit():
+                    continue
+                txn, name, trade_type, volume = parse_row(line)
+                chunk[txn] = {"Name": name, "Type": trade_type, "VolumeTraded": volume}
+                if len(chunk) >= IMPORT_CHUNK:
+                    self.append(chunk)
+                    imported += len(chunk)
+                    chunk = {}
+        self.append(chunk)
+        imported += len(chunk)
+        self.sync()
+        print(f"Imported {imported} orders from {csv_path} into segments of {self.segment_size} transactions")
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from order.order_store import encode_rows, parse_row
+
+
+#rows queued by one append, done is set once they are durable or the log failed (error says why)
+class Commit:
+    def __init__(self, timeout):
+        self.done = threading.Event()
+        self.error = None
+        self.timeout = timeout
+
+    #None once durable, else the reason the rows may not survive a crash
+    def wait(self):
+        if not self.done.wait(self.timeout):
+            return f"write-ahead log commit timed out after {self.timeout}s"
+        return self.error
+
+
+#write-ahead log for orders that are acknowledged before the periodic flush reaches the order log
+#concurrent appends are grouped into one write + fsync (group commit) by a single committer thread
+#records use the same csv row format as the order log, a torn last row is ignored on replay
+#rotation is queued like an append and done by the committer, so callers never wait on the log's I/O
+class GroupCommitLog:
+    def __init__(self, path, max_batch=256, max_delay=0.001, timeout=5.0):
+        self.path = path
+        #previous generation, kept until the orders it covers are synced to the order log
+        self.rotated_path = path + ".1"
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        #how long an order waits for its commit before it is answered with an error
+        self.timeout = timeout
+        #first write or fsync error, the log accepts no rows after it since a torn write would hide later ones on replay
+        self.error = None
+        self.cond = threading.Condition()
+        self.pending = []
+        #held around file writes, fsyncs and rotation
+        #queued (payload, Commit), a None payload asks for a rotation once everything queued before it is written
+        self.io_lock = threading.Lock()
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.commits = 0
+        self.records = 0
+        self.thread = threading.Thread(target=self.run, name="wal-commit", daemon=True)
+        self.thread.start()
+
+    #queue rows {txn: {"Name", "Type", "VolumeTraded"}}, returns the Commit to wait on
+    def append(self, order_logs):
+        durable = Commit(self.timeout)
+        payload = b"".join(row for _, row in encode_rows(order_logs))
+        with self.cond:
+            if self.error is not None:
+                durable.error = self.error
+                durable.done.set()
+                return durable
+            self.pending.append((payload, durable))
+            self.cond.notify()
+        return durable
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                #let more concurrent orders join this fsync, bounded by max_delay and max_batch
+                deadline = time.time() + self.max_delay
+                while len(self.pending) < self.max_batch:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                #a rotation closes the batch, rows queued after it belong to the new file
+                batch = []
+                while self.pending and len(batch) < self.max_batch:
+                    batch.append(self.pending.pop(0))
+                    if batch[-1][0] is None:
+                        break
+
+            records = [payload for payload, _ in batch if payload is not None]
+            try:
+                with self.io_lock:
+                    if records:
+                        os.write(self.fd, b"".join(records))
+                        os.fsync(self.fd)
+                    if batch[-1][0] is None:
+                        self.switch_files()
+            except OSError as e:
+                self.fail(batch, e)
+                return
+            if records:
+                self.commits += 1
+                self.records += len(records)
+            for _, durable in batch:
+                durable.done.set()
+
+    #a failed write or fsync (ENOSPC, EIO) fails the batch, everything queued behind it and every later append
+    def fail(self, batch, e):
+        print(f"[ERROR] Write-ahead log {self.path} failed: {e}")
+        with self.cond:
+            self.error = f"write-ahead log failed: {e}"
+            batch = batch + self.pending
+            self.pending = []
+        for _, durable in batch:
+            durable.error = self.error
+            durable.done.set()
+
+    #start a new log file after the rows queued so far, they stay in the rotated one
+    #called while the orders logged so far are swapped out for flushing, it only queues the rotation
+    #returns the Commit that is done once the committer switched files
+    def rotate(self):
+        rotated = Commit(self.timeout)
+        with self.cond:
+            if self.error is not None:
+                rotated.error = self.error
+                rotated.done.set()
+                return rotated
+            self.pending.append((None, rotated))
+            self.cond.notify()
+        return rotated
+
+    # caller holds io_lock
+    def switch_files(self):
+        os.close(self.fd)
+        if os.path.exists(self.rotated_path):
+            #the last flush did not finish, keep its records and add the new ones after them
+            with open(self.path, "rb") as current, open(self.rotated_path, "ab") as rotated:
+                rotated.write(current.read())
+                rotated.flush()
+                os.fsync(rotated.fileno())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    #the orders in the rotated file are now synced to the order log
+    def drop_rotated(self):
+        with self.io_lock:
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+
+    def stats(self):
+        return self.records, self.commits
+
+
+#orders found in the write-ahead log files as {txn: {"Name", "Type", "VolumeTraded"}}
+def read_wal(path):
+    order_logs = {}
+    for file_path in (path + ".1", path):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "rb") as f:
+            for line in f:
+                #a row without its line ending was cut short by a crash and was never acknowledged
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    txn, name, trade_type, volume = parse_row(line)
+                except ValueError:
+                    break
+                order_logs[txn] = {"Name": name, "Type": trade_type, "VolumeTraded": volume}
+    return order_logs
+
+
+#apply orders left in the write-ahead log to the order store after a crash, then start from an empty log
+def replay_wal(path, store):
+    logged = read_wal(path)
+    missing = {txn: logged[txn] for txn in sorted(logged) if txn not in store}
+    if missing:
+        store.append(missing)
+        store.sync()
+    for file_path in (path + ".1", path):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    return len(missing)
@@ -10,8 +10,8 @@ fi
 ORDER_ID=$1
 ORDER_PORT=$((8092 + ORDER_ID))
 
-# Kill any process using this port
-PIDS=$(lsof -ti tcp:$ORDER_PORT)
+# Kill the process listening on this port (not the peers holding long lived connections to it)
+PIDS=$(lsof -ti tcp:$ORDER_PORT -sTCP:LISTEN)
 if [[ -n "$PIDS" ]]; then
   echo "Crashing Order Replica $ORDER_ID on port $ORDER_PORT (PIDs: $PIDS)"
   for pid in $PIDS; do
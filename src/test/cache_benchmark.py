@@ -0,0 +1,73 @@
+import argparse
+import itertools
+import random
+import time
+from frontend.cache import ShardedCache, POLICIES
+
+
+#hit ratio of each cache policy on synthetic lookup traces, run from src/: python -m test.cache_benchmark
+#every miss is followed by a put, the way handle_get_stock fills the cache after a catalog Lookup
+
+
+def zipf_trace(universe, length, skew, rng):
+    weights = [1 / (rank ** skew) for rank in range(1, universe + 1)]
+    cum_weights = list(itertools.accumulate(weights))
+    names = [f"STOCK{i}" for i in range(universe)]
+    #popular stocks are not the lowest numbered ones
+    rng.shuffle(names)
+    return rng.choices(names, cum_weights=cum_weights, k=length)
+
+
+#what load_testing.py does: random.choice over every symbol
+def uniform_trace(universe, length, rng):
+    names = [f"STOCK{i}" for i in range(universe)]
+    return [rng.choice(names) for _ in range(length)]
+
+
+#skewed traffic interrupted by clients sweeping through every symbol once
+def zipf_with_scans_trace(universe, length, skew, rng, scan_every=20000):
+    trace = zipf_trace(universe, length, skew, rng)
+    sweep = [f"STOCK{i}" for i in range(universe)]
+    with_scans = []
+    for start in range(0, len(trace), scan_every):
+        with_scans.extend(trace[start:start + scan_every])
+        with_scans.extend(sweep)
+    return with_scans
+
+
+def replay(trace, capacity, policy, shards):
+    cache = ShardedCache(capacity, shards, policy=policy)
+    value = {"price": 1.0, "quantity": 1}
+    hits = 0
+    start = time.perf_counter()
+    for name in trace:
+        if cache.get(name) is not None:
+            hits += 1
+        else:
+            cache.put(name, value, 0)
+    elapsed = time.perf_counter() - start
+    return hits / len(trace), elapsed / len(trace) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay Zipfian and uniform lookup traces against the frontend cache policies")
+    parser.add_argument("--universe", type=int, default=10000, help="number of distinct stock symbols")
+    parser.add_argument("--length", type=int, default=200000, help="lookups per trace")
+    parser.add_argument("--skew", type=float, default=0.9, help="Zipf exponent")
+    parser.add_argument("--capacities", default="50,200,1000", help="comma separated cache sizes")
+    parser.add_argument("--shards", type=int, default=0, help="cache shards, 0 derives them from the size")
+    parser.add_argument("--seed", type=int, default=677)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    traces = {
+        f"zipf({args.skew})": zipf_trace(args.universe, args.length, args.skew, rng),
+        f"zipf({args.skew})+scans": zipf_with_scans_trace(args.universe, args.length, args.skew, rng),
+        "uniform": uniform_trace(args.universe, args.length, rng),
+    }
+
+    print(f"{'trace':<18} {'capacity':>8} " + " ".join(f"{policy + ' hit%':>12} {'us/op':>6}" for policy in POLICIES))
+    for trace_name, trace in traces.items():
+        for capacity in (int(c) for c in args.capacities.split(",")):
+            results = [replay(trace, capacity, policy, args.shards) for policy in POLICIES]
+            print(f"{trace_name:<18} {capacity:>8} " + " ".join(f"{ratio * 100:>12.2f} {us:>6.2f}" for ratio, us in results))
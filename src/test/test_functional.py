@@ -3,8 +3,13 @@ import catalog.catalog_pb2 as catalog_pb2
 import catalog.catalog_pb2_grpc as catalog_pb2_grpc
 import order.order_pb2 as order_pb2
 import order.order_pb2_grpc as order_pb2_grpc
+from order.wal import GroupCommitLog
+from order.segments import SegmentedOrderStore
+from frontend.shm_cache import SharedMemoryCache
+from google.protobuf.empty_pb2 import Empty
 import csv
 import time
+import threading
 import grpc
 import io
 import sys
@@ -78,6 +83,19 @@ def test_lookup_invalid():
         assert response.message == "stock not found"
 
 
+def test_batch_lookup():
+    names = ["GameStart", "WrongName", "AAPL"]
+    with grpc.insecure_channel(f"{CATALOGHOST}:{CATALOGPORT}") as channel:
+        stub = catalog_pb2_grpc.CatalogServiceStub(channel)
+        response = stub.BatchLookup(catalog_pb2.BatchLookupRequest(stock_names=names))
+
+    #one reply per name, in request order
+    assert [stock.name for stock in response.stocks] == names
+    assert [stock.code for stock in response.stocks] == [200, 404, 200]
+    assert response.stocks[1].message == "stock not found"
+    assert response.stocks[0].version > 0
+
+
 def test_trade_buy_valid():
 
     stock = "GameStart"
@@ -151,6 +169,31 @@ def test_trade_sell_valid():
     assert new_volume == old_volume + sell_amount
 
 
+#a trade is pushed to catalog watchers with a newer version
+def test_watch_catalog_update():
+    stock = "BoarCo"
+
+    with grpc.insecure_channel(f"{CATALOGHOST}:{CATALOGPORT}") as channel:
+        stub = catalog_pb2_grpc.CatalogServiceStub(channel)
+        stream = stub.WatchCatalog(catalog_pb2.WatchRequest(subscriber="test"), timeout=10)
+
+        snapshot = next(stream)
+        assert snapshot.snapshot
+        before = {update.name: update for update in snapshot.updates}[stock]
+
+        trade_res = stub.Trade(catalog_pb2.TradeRequest(name=stock, type="sell", number_of_items=1))
+        assert trade_res.code == 200
+
+        for message in stream:
+            updates = [update for update in message.updates if update.name == stock]
+            if updates:
+                break
+        stream.cancel()
+
+    assert updates[-1].version > before.version
+    assert updates[-1].quantity == before.quantity + 1
+    assert updates[-1].volume == before.volume + 1
+
 
 #Testing Frontend 
 
@@ -232,6 +275,251 @@ def test_frontend_cache_eviction():
     assert f"Could not find {stocks[0]} in cache calling catalog microservice" in logs
 
 
+#catalog sends invalidations in batches to POST /invalidate
+def test_frontend_batch_invalidation():
+    stocks = ["GOOGL", "META"]
+
+    for stock in stocks:
+        requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}")
+
+    response = requests.post(f"http://{FRONTENDHOST}:{FRONTENDPORT}/invalidate", json={"names": stocks})
+    assert response.status_code == 200
+
+    with open(frontend_log, "r", encoding="utf-8") as f:
+        offset = len(f.read())
+
+    for stock in stocks:
+        requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}")
+    time.sleep(0.5)
+
+    with open(frontend_log, "r", encoding="utf-8") as f:
+        logs = f.read()[offset:]
+
+    #both entries were dropped so both lookups go to the catalog
+    for stock in stocks:
+        assert f"Could not find {stock} in cache calling catalog microservice" in logs
+
+def test_frontend_invalidation_malformed():
+    url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/invalidate"
+    #versions must map names to versions, a list is rejected instead of dropping the connection
+    for body in ({"names": ["GameStart"], "versions": [1]}, {"names": ["GameStart"], "versions": "1"}, {"versions": {}}):
+        response = requests.post(url, json=body)
+        assert response.status_code == 400
+        assert response.json() == {"code": 400, "message": "Invalid invalidation request"}
+    assert requests.post(url, json={"names": ["GameStart"], "versions": {"GameStart": 1}}).status_code == 200
+
+
+#an invalidation older than the cached version keeps the entry, a trade never leaves a stale value cached
+def test_frontend_versioned_invalidation():
+    stock = "MenhirCo"
+    url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}"
+
+    requests.delete(f"http://{FRONTENDHOST}:{FRONTENDPORT}/delete/{stock}")
+    quantity = requests.get(url).json()["data"]["quantity"]
+
+    requests.delete(f"http://{FRONTENDHOST}:{FRONTENDPORT}/delete/{stock}", params={"version": 1})
+    with open(frontend_log, "r", encoding="utf-8") as f:
+        offset = len(f.read())
+    requests.get(url)
+    time.sleep(0.5)
+    with open(frontend_log, "r", encoding="utf-8") as f:
+        logs = f.read()[offset:]
+    assert f"Fetched {stock} from cache" in logs
+
+    response = requests.post(f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/", json={"name": stock, "quantity": 1, "type": "sell"})
+    assert response.status_code == 200
+    time.sleep(0.5)
+
+    assert requests.get(url).json()["data"]["quantity"] == quantity + 1
+
+    #a malformed version is rejected and the connection still answers
+    response = requests.delete(f"http://{FRONTENDHOST}:{FRONTENDPORT}/delete/{stock}", params={"version": "abc"})
+    assert response.status_code == 400
+    assert response.json() == {"code": 400, "message": "Invalid version"}
+
+
+def test_frontend_cache_stats():
+    stock = "AAPL"
+    requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}")
+    requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}")
+
+    response = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/cache/stats")
+    assert response.status_code == 200
+    shards = response.json()["data"]["shards"]
+    #the default 5 entry cache is a single shard
+    assert sum(shard["capacity"] for shard in shards) == 5
+    assert sum(shard["hits"] for shard in shards) >= 1
+
+
+def test_frontend_cached_reply_matches():
+    stock = "RottenFishCo"
+    requests.delete(f"http://{FRONTENDHOST}:{FRONTENDPORT}/delete/{stock}")
+    miss = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}")
+    hit = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}")
+    #the pre-encoded cache hit reply is the same as the one built on a miss
+    assert hit.status_code == miss.status_code == 200
+    assert hit.content == miss.content
+    for header in ("Content-type", "Content-Length", "Server"):
+        assert hit.headers[header] == miss.headers[header]
+    assert "Date" in hit.headers
+
+
+def test_frontend_concurrent_misses():
+    from concurrent.futures import ThreadPoolExecutor
+    stock = "BoarCo"
+    #make sure the next lookups miss
+    requests.delete(f"http://{FRONTENDHOST}:{FRONTENDPORT}/delete/{stock}")
+    before = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/cache/stats").json()["data"]["lookups"]
+
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(pool.map(lambda _: requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock}"), range(8)))
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json()["data"]["name"] == stock for response in responses)
+
+    after = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/cache/stats").json()["data"]["lookups"]
+    assert after["in_flight"] == 0
+    assert after["timeouts"] == before["timeouts"]
+    assert after["executed"] > before["executed"]
+
+
+def test_frontend_batch_lookup():
+    #AMZN is cached, GOOGL and META are not
+    requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/AMZN")
+    for stock in ("GOOGL", "META"):
+        requests.delete(f"http://{FRONTENDHOST}:{FRONTENDPORT}/delete/{stock}")
+
+    response = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks?names=AMZN,GOOGL,WrongName,META,AMZN")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [stock["name"] for stock in data["stocks"]] == ["AMZN", "GOOGL", "META"]
+    assert data["not_found"] == ["WrongName"]
+    for stock in data["stocks"]:
+        single = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/{stock['name']}").json()["data"]
+        assert stock == single
+
+    with open(frontend_log) as f:
+        log = f.read()
+    assert "Could not find ['GOOGL', 'WrongName', 'META'] in cache calling catalog microservice" in log
+
+    assert requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks?names=").status_code == 400
+
+
+def test_shared_cache_refuses_fill_after_dropped_version():
+    cache = SharedMemoryCache(capacity=2)
+    try:
+        #a lookup of A is in flight when A changes to version 10
+        assert cache.get("A") is None
+        cache.invalidate("A", 10)
+        #fills of other stocks reuse the slot remembering version 10
+        for name in ("B", "C"):
+            assert cache.get(name) is None
+            assert cache.put(name, {"price": 1.0, "quantity": 1}, 1)
+        #the in-flight reply carries the older version and must not be cached
+        assert not cache.put("A", {"price": 1.0, "quantity": 5}, 5)
+        assert cache.get("A") is None
+        #a lookup that started after the drop is cached
+        assert cache.put("A", {"price": 1.0, "quantity": 10}, 10)
+        assert cache.get("A") == {"price": 1.0, "quantity": 10}
+    finally:
+        cache.unlink()
+
+
+def test_shared_cache_counts_from_many_threads():
+    cache = SharedMemoryCache(capacity=2)
+    #switch threads as often as possible so unlocked increments would be lost
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        def miss():
+            for _ in range(5000):
+                cache.get("A")
+        threads = [threading.Thread(target=miss) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert cache.stats()[0]["misses"] == 8 * 5000
+    finally:
+        sys.setswitchinterval(interval)
+        cache.unlink()
+
+
+#a second frontend with FRONTEND_WORKERS=3 next to the one under test, on its own port
+def test_frontend_prefork_workers_serve(tmp_path):
+    import signal
+    import subprocess
+    port = 8191
+    env = dict(os.environ, FRONTEND_PORT=str(port), FRONTEND_WORKERS="3")
+    with open(tmp_path / "frontend.log", "w") as log:
+        frontend = subprocess.Popen([sys.executable, "-u", "-m", "frontend.http_frontend"], env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        url = f"http://{FRONTENDHOST}:{port}"
+        deadline = time.time() + 15
+        while True:
+            try:
+                requests.get(f"{url}/cache/stats", timeout=1)
+                break
+            except requests.ConnectionError:
+                assert time.time() < deadline and frontend.poll() is None
+                time.sleep(0.2)
+
+        #every new connection goes to one of the workers sharing the port
+        pids = set()
+        for _ in range(60):
+            response = requests.get(f"{url}/stocks/GameStart", headers={"Connection": "close"})
+            assert response.status_code == 200
+            assert response.json()["data"]["name"] == "GameStart"
+            pids.add(requests.get(f"{url}/cache/stats", headers={"Connection": "close"}).json()["data"]["pid"])
+        assert len(pids) == 3
+        assert frontend.pid not in pids
+    finally:
+        #the parent stops its workers
+        frontend.send_signal(signal.SIGTERM)
+        frontend.wait(10)
+
+
+PREFORK_LEADER_SCRIPT = """
+import multiprocessing
+from frontend.prefork import SharedLeader
+from frontend.channels import ChannelManager
+
+def worker(worker_id, shared_leader, barrier, results):
+    #channels are opened after the fork, like in the frontend workers
+    channels = ChannelManager("localhost:1", {1: "localhost:1", 2: "localhost:2", 3: "localhost:3"}, 1, shared_leader)
+    seen = [channels.current_leader()]
+    #worker 0 elects replica 3, then worker 1 replaces it with replica 2, the others only read
+    for electing, leader_id in ((0, 3), (1, 2)):
+        barrier.wait()
+        if worker_id == electing:
+            with shared_leader.lock:
+                channels.set_leader(leader_id)
+        barrier.wait()
+        seen.append(channels.leader()[0])
+    channels.close()
+    results.put((worker_id, seen))
+
+if __name__ == "__main__":
+    shared_leader = SharedLeader()
+    barrier = multiprocessing.Barrier(3)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(i, shared_leader, barrier, results)) for i in range(3)]
+    for process in workers:
+        process.start()
+    print(sorted(results.get(timeout=10) for _ in workers))
+    for process in workers:
+        process.join()
+"""
+
+def test_prefork_shared_leader_seen_by_all_workers(tmp_path):
+    import subprocess
+    #a fresh interpreter forks before any grpc channel exists, as the frontend does
+    script = tmp_path / "prefork_leader.py"
+    script.write_text(PREFORK_LEADER_SCRIPT)
+    result = subprocess.run([sys.executable, str(script)], env=dict(os.environ, PYTHONPATH=os.getcwd()), capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == str([(0, [None, 3, 2]), (1, [None, 3, 2]), (2, [None, 3, 2])])
+
+
 def test_get_wrong_stockname():
     get_url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/"
     response = requests.get(f"{get_url}WrongName")
@@ -311,6 +599,33 @@ def test_post_transaction_increments():
     assert transaction_number2 > transaction_number1
 
 
+def test_post_order_batch():
+    batch_url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/batch"
+    orders = [
+        {"name": "NVDA", "quantity": 1, "type": "sell"},
+        {"name": "NVDA", "quantity": 1, "type": "hold"},
+        {"name": "META", "quantity": 2, "type": "sell"},
+        {"name": "NVDA", "quantity": 1000000, "type": "buy"},
+        {"name": "NVDA", "quantity": 1, "type": "buy"},
+    ]
+    response = requests.post(batch_url, json={"orders": orders})
+    assert response.status_code == 200
+    results = response.json()["data"]["results"]
+    assert len(results) == len(orders)
+    assert results[1]["error"]["message"] == "invalid transaction type"
+    assert results[3]["error"]["message"] == "not enough stocks left to buy"
+
+    #the accepted orders get one contiguous block of transaction numbers, in request order
+    accepted = [0, 2, 4]
+    txn_ids = [results[i]["transaction_number"] for i in accepted]
+    assert txn_ids == list(range(txn_ids[0], txn_ids[0] + len(accepted)))
+    for i, txn_id in zip(accepted, txn_ids):
+        details = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/{txn_id}").json()["data"]
+        assert (details["name"], details["type"], details["quantity"]) == (orders[i]["name"], orders[i]["type"], orders[i]["quantity"])
+
+    assert requests.post(batch_url, json={"orders": []}).status_code == 400
+
+
 def test_get_order_valid():
     post_url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/"
     order = {"name": "RottenFishCo", "quantity": 1, "type": "sell"}
@@ -331,9 +646,57 @@ def test_get_order_valid():
     assert get_data["data"]["quantity"] == 1
 
 
+def test_get_order_out_of_range():
+    #a transaction number beyond int32 cannot be sent to the order service, the client still gets a reply
+    with requests.Session() as session:
+        response = session.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/99999999999")
+        assert response.status_code in (404, 500)
+        assert "error" in response.json()
+        #and the kept-alive connection keeps serving
+        assert session.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/stocks/GameStart").status_code == 200
+
+
+def test_get_order_after_flush():
+    post_url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/"
+    order = {"name": "BoarCo", "quantity": 3, "type": "sell"}
+
+    post_response = requests.post(post_url, json=order)
+    assert post_response.status_code == 200
+    txn_id = post_response.json()["data"]["transaction_number"]
+
+    #order logs are written to disk and cleared from memory every 2 seconds
+    time.sleep(3)
+
+    get_response = requests.get(f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/{txn_id}")
+    assert get_response.status_code == 200
+    get_data = get_response.json()
+    assert get_data["data"]["order_num"] == txn_id
+    assert get_data["data"]["name"] == "BoarCo"
+    assert get_data["data"]["type"] == "sell"
+    assert get_data["data"]["quantity"] == 3
+
 
 #test order services 
 
+def test_syncup_stream_spans_store_and_buffer():
+    post_url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/"
+    first = requests.post(post_url, json={"name": "GameStart", "quantity": 1, "type": "sell"}).json()["data"]["transaction_number"]
+    #flushed to the order log
+    time.sleep(3)
+    #still buffered in memory when the stream runs
+    last = requests.post(post_url, json={"name": "BoarCo", "quantity": 1, "type": "sell"}).json()["data"]["transaction_number"]
+    last = requests.post(post_url, json={"name": "BoarCo", "quantity": 1, "type": "sell"}).json()["data"]["transaction_number"]
+
+    with grpc.insecure_channel(f"localhost:{order_services[1]['port']}") as channel:
+        stub = order_pb2_grpc.OrderServiceStub(channel)
+        chunks = stub.SyncUpStream(order_pb2.SyncUpRequest(transaction_num=first - 1, service_id=0), timeout=10)
+        streamed = [order for chunk in chunks for order in chunk.orders]
+
+    #every transaction exactly once and in order
+    assert [order.transaction_num for order in streamed] == list(range(first, last + 1))
+    assert streamed[0].name == "GameStart"
+    assert streamed[-1].name == "BoarCo"
+
 def test_leader_logs_trade_replicates_followers():
 
     def read_csv(path):
@@ -359,6 +722,175 @@ def test_leader_logs_trade_replicates_followers():
 
     assert len(is_present) == 3
 
+def test_replicate_batch_skips_flushed():
+
+    def read_csv(path):
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+
+    #resend an entry follower 1 already flushed, as a retried batch would
+    entry = read_csv(order_services[1]["csv_path"])[-1]
+    transaction_num = int(entry["TransactionNumber"])
+    with grpc.insecure_channel(f"localhost:{order_services[1]['port']}") as channel:
+        stub = order_pb2_grpc.OrderServiceStub(channel)
+        reply = stub.ReplicateBatch(order_pb2.ReplicateBatchRequest(leader_id=3, orders=[
+            order_pb2.OrderDetails(transaction_num=transaction_num, name=entry["Name"], type=entry["Type"], volume_traded=int(entry["VolumeTraded"]))
+        ]))
+    assert reply.code == 200
+
+    time.sleep(3)
+
+    rows = [row for row in read_csv(order_services[1]["csv_path"]) if int(row["TransactionNumber"]) == transaction_num]
+    assert len(rows) == 1
+
+def test_wal_write_error_fails_commits():
+    #every write to /dev/full fails with ENOSPC
+    wal = GroupCommitLog("/dev/full", timeout=2)
+    first = wal.append({1: {"Name": "GameStart", "Type": "buy", "VolumeTraded": 1}})
+    assert "No space left" in first.wait()
+    #the log stays failed, later orders are answered right away instead of waiting forever
+    second = wal.append({2: {"Name": "GameStart", "Type": "buy", "VolumeTraded": 1}})
+    assert second.done.is_set()
+    assert second.wait() == first.wait()
+
+def test_wal_rotate_does_not_wait_for_io(tmp_path):
+    path = str(tmp_path / "order_log.wal")
+    wal = GroupCommitLog(path, timeout=2)
+    assert wal.append({1: {"Name": "GameStart", "Type": "buy", "VolumeTraded": 1}}).wait() is None
+    #the committer holds io_lock across its fsyncs, the flusher only queues the rotation meanwhile
+    with wal.io_lock:
+        start = time.time()
+        rotated = wal.rotate()
+        assert time.time() - start < 0.5
+        later = wal.append({2: {"Name": "GameStart", "Type": "sell", "VolumeTraded": 2}})
+    assert rotated.wait() is None
+    assert later.wait() is None
+    #rows queued before the rotation stay in the rotated file, later ones go to the new file
+    with open(path + ".1") as f:
+        assert [line.split(",")[0] for line in f] == ["1"]
+    with open(path) as f:
+        assert [line.split(",")[0] for line in f] == ["2"]
+    wal.drop_rotated()
+    assert not os.path.exists(path + ".1")
+
+def test_flush_stats():
+    post_url = f"http://{FRONTENDHOST}:{FRONTENDPORT}/orders/"
+    response = requests.post(post_url, json={"name": "MenhirCo", "quantity": 1, "type": "sell"})
+    assert response.status_code == 200
+
+    time.sleep(3)
+
+    with grpc.insecure_channel(f"localhost:{order_services[1]['port']}") as channel:
+        stats = order_pb2_grpc.OrderServiceStub(channel).FlushStats(Empty())
+
+    assert stats.flushes >= 1
+    assert stats.last_flush_orders >= 1
+    assert stats.max_flush_ms >= stats.last_flush_ms
+    assert stats.max_backlog >= stats.last_flush_orders
+    assert stats.max_oldest_age_ms > 0
+
+    #flushes are only logged when they cross a threshold
+    with open("logs/order_1.log", encoding="utf-8") as f:
+        logged = f.read().count("orders written to CSV")
+    assert logged == stats.slow_flushes
+
+def test_segment_compressed_while_read(tmp_path):
+    #larger than the 4096 index slots a scan reads at once, so the scan goes back to the segment's files
+    store = SegmentedOrderStore(str(tmp_path / "order_log"), 5000, compress=True, keep_uncompressed=0)
+    store.append({txn: {"Name": "GameStart", "Type": "buy", "VolumeTraded": txn} for txn in range(1, 5000)})
+    scan = store.iter_range(0, 4999)
+    assert next(scan)[0] == 1
+
+    #completing the segment seals it, it is compressed while the scan is still reading its store
+    store.append({txn: {"Name": "BoarCo", "Type": "sell", "VolumeTraded": txn} for txn in range(5000, 5002)})
+    #returns once the compressor thread is done with the segment
+    store.compress_sealed()
+    assert store.segments[0]["state"] == "compressed"
+    assert [row[0] for row in scan] == list(range(2, 5000))
+    assert not os.path.exists(tmp_path / "order_log" / "segment_000000000001.csv")
+
+    #point lookups in the compressed segment read one gzip member
+    store.cache.clear()
+    assert store.get(4321) == {"Name": "GameStart", "Type": "buy", "VolumeTraded": 4321}
+    assert store.get(5000) == {"Name": "BoarCo", "Type": "sell", "VolumeTraded": 5000}
+
+def test_segment_compression_does_not_block_appends(tmp_path, monkeypatch):
+    import gzip
+    import order.segments
+    store = SegmentedOrderStore(str(tmp_path / "order_log"), 1000, compress=True, keep_uncompressed=0)
+    #hold the compressor thread in the middle of gzipping the sealed segment
+    started, gate = threading.Event(), threading.Event()
+    compress = gzip.compress
+    def slow_compress(data, mtime=None):
+        started.set()
+        gate.wait(10)
+        return compress(data, mtime=mtime)
+    monkeypatch.setattr(order.segments.gzip, "compress", slow_compress)
+    store.append({txn: {"Name": "GameStart", "Type": "buy", "VolumeTraded": txn} for txn in range(1, 1001)})
+    assert started.wait(5)
+
+    #the next segment keeps taking rows and serving lookups meanwhile
+    start = time.time()
+    store.append({1001: {"Name": "BoarCo", "Type": "sell", "VolumeTraded": 3}})
+    store.cache.clear()
+    assert store.get(1001) == {"Name": "BoarCo", "Type": "sell", "VolumeTraded": 3}
+    assert store.get(500) == {"Name": "GameStart", "Type": "buy", "VolumeTraded": 500}
+    assert time.time() - start < 2
+    assert store.segments[0]["state"] == "sealed"
+
+    gate.set()
+    store.compress_sealed()
+    assert store.segments[0]["state"] == "compressed"
+    assert store.get(999) == {"Name": "GameStart", "Type": "buy", "VolumeTraded": 999}
+
+def test_binary_order_log_round_trip(tmp_path, monkeypatch):
+    import order.order as order_service
+    from order.binlog import BinaryOrderStore, binary_to_csv
+    from order.order_store import OrderStore
+    from concurrent import futures
+    #a replica with ORDER_LOG_FORMAT=binary, served in process on a free port
+    #settings order.py reads from the environment in __main__
+    for name, value in (("SERVICE_ID", 9), ("FLUSH_INTERVAL", 2), ("FLUSH_WARN_MS", 500), ("FLUSH_WARN_BACKLOG", 10000)):
+        monkeypatch.setattr(order_service, name, value, raising=False)
+    store = BinaryOrderStore(str(tmp_path / "order_log_9.bin"))
+    servicer = order_service.OrderServicer([], 0, None, None, store)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    order_pb2_grpc.add_OrderServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+
+    orders = {1: ("GameStart", "buy", 3), 2: ("BoarCo", "sell", 1), 3: ("MenhirCo", "buy", 12), 4: ("GameStart", "sell", 7)}
+    def replicate(txns):
+        batch = [order_pb2.OrderDetails(transaction_num=txn, name=orders[txn][0], type=orders[txn][1], volume_traded=orders[txn][2]) for txn in txns]
+        return stub.ReplicateBatch(order_pb2.ReplicateBatchRequest(orders=batch, leader_id=1), timeout=5)
+    try:
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            stub = order_pb2_grpc.OrderServiceStub(channel)
+            assert replicate([1, 2, 3]).code == 200
+            #what the flusher thread does every ORDER_FLUSH_INTERVAL
+            servicer.flush_order_logs()
+            assert replicate([4]).code == 200
+
+            #flushed orders come from the binary log, the last one from the buffer
+            for txn, (name, trade_type, volume) in orders.items():
+                response = stub.GetOrderDetails(order_pb2.GetOrderDetailsRequest(transaction_num=txn), timeout=5)
+                assert (response.code, response.name, response.type, response.volume_traded) == (200, name, trade_type, volume)
+            servicer.flush_order_logs()
+    finally:
+        server.stop(None)
+
+    #python -m order.binlog to-csv gives the rows a csv replica writes for the same orders
+    assert binary_to_csv(str(tmp_path / "order_log_9.bin"), str(tmp_path / "converted.csv")) == 4
+    csv_store = OrderStore(str(tmp_path / "order_log_9.csv"))
+    csv_store.append({txn: {"Name": name, "Type": trade_type, "VolumeTraded": volume} for txn, (name, trade_type, volume) in orders.items()})
+    csv_store.close()
+    with open(tmp_path / "converted.csv", newline="") as f:
+        converted = list(csv.DictReader(f))
+    with open(tmp_path / "order_log_9.csv", newline="") as f:
+        assert converted == list(csv.DictReader(f))
+    assert [(int(row["TransactionNumber"]), row["Name"], row["Type"], int(row["VolumeTraded"])) for row in converted] == \
+        [(txn, *details) for txn, details in orders.items()]
+
 def test_order_csvs_same():
 
     time.sleep(1)